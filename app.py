@@ -1,12 +1,17 @@
 import os
-import logging
 from flask import Flask
 from flask_cors import CORS
 from flask_restful import Api
 from werkzeug.middleware.proxy_fix import ProxyFix
+from utils.responses import output_json
+from utils.logs import configure_logging
+from utils.auth import init_auth
+from utils.metrics import init_metrics
+from utils.profiling import init_profiling
+from data.storage import storage
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG)
+configure_logging()
 
 # Create Flask app
 app = Flask(__name__)
@@ -18,6 +23,10 @@ CORS(app, origins=["http://localhost:3000", "http://localhost:5000"], supports_c
 
 # Initialize Flask-RESTful API
 api = Api(app)
+api.representation('application/json')(output_json)
+init_metrics(app, storage)
+init_profiling(app)
+init_auth(app)
 
 # Import and register routes
 from routes.auth import register_auth_routes
@@ -25,6 +34,8 @@ from routes.courses import register_course_routes
 from routes.users import register_user_routes
 from routes.progress import register_progress_routes
 from routes.access import register_access_routes
+from routes.media import register_media_routes
+from routes.admin import register_admin_routes
 
 # Register all routes
 register_auth_routes(api)
@@ -32,6 +43,8 @@ register_course_routes(api)
 register_user_routes(api)
 register_progress_routes(api)
 register_access_routes(api)
+register_media_routes(api)
+register_admin_routes(api)
 
 # Health check endpoint
 @app.route('/health')
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Render the access outline of a 300-lesson course the old way (one
+subsection access request per lesson) and with the single access tree
+request, for a guest, an enrolled student and a non-enrolled student in a
+course with many enrollments.
+
+Usage: python benchmarks/access_tree.py
+"""
+
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from data.access_policy import access_policies
+from data.storage import storage
+from models import Course, Section, Subsection, User
+
+SECTIONS = 30
+LESSONS_PER_SECTION = 10
+ENROLLED = 20_000
+REPEAT = 5
+
+def build():
+    course = Course('Tafsir', 'Description', 'instructor', 'Quran Studies')
+    course.published = True
+    storage.create_course(course)
+    subsection_ids = []
+    for s in range(SECTIONS):
+        section = storage.create_section(Section(f'Section {s}', 'Description', course.id))
+        for i in range(LESSONS_PER_SECTION):
+            subsection = Subsection(f'Lesson {s}.{i}', 'video', section.id)
+            subsection.duration = 12
+            subsection.is_preview = s == 0
+            subsection_ids.append(storage.create_subsection(subsection).id)
+    storage.update_course(course.id, {'preview_config': {
+        'free_sections': [], 'free_subsections': subsection_ids[-3:], 'preview_duration': 300
+    }})
+    users = [storage.create_user(User(f'user{i}', f'user{i}@example.com', 'x')) for i in range(ENROLLED)]
+    for user in users:
+        storage.enroll(user.id, course.id)
+    outsider = storage.create_user(User('outsider', 'outsider@example.com', 'x'))
+    return course, subsection_ids, users[-1], outsider
+
+def time_outline(client, course_id, subsection_ids, headers):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        for subsection_id in subsection_ids:
+            client.get(f'/api/courses/{course_id}/subsections/{subsection_id}/access', headers=headers)
+    per_subsection = (time.perf_counter() - start) / REPEAT * 1000
+
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        response = client.get(f'/api/courses/{course_id}/access/tree', headers=headers)
+    tree = (time.perf_counter() - start) / REPEAT * 1000
+    assert response.status_code == 200, response.status_code
+    return per_subsection, tree, response.get_json()
+
+def main():
+    logging.disable(logging.CRITICAL)
+    course, subsection_ids, student, outsider = build()
+    client = app.test_client()
+    viewers = [('guest', None), ('enrolled', student), ('not enrolled', outsider)]
+
+    print(f"{len(subsection_ids)} lessons, {ENROLLED:,} enrolled students")
+    print(f"{'viewer':<14} {'300 requests ms':>16} {'tree ms':>9} {'open lessons':>13}")
+    for label, user in viewers:
+        headers = {}
+        if user:
+            token = f'benchmark-{user.id}'
+            storage.create_session(token, user.id)
+            headers['Authorization'] = f'Bearer {token}'
+        per_subsection, tree, data = time_outline(client, course.id, subsection_ids, headers)
+        open_lessons = sum(sub['can_access'] for section in data['sections'] for sub in section['subsections'])
+        print(f"{label:<14} {per_subsection:>16.1f} {tree:>9.2f} {open_lessons:>13}")
+    print(f"policy cache: {access_policies.stats()}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Time auth-heavy endpoints with the previous per-module get_current_user,
+the request-scoped resolver with session tokens, and signed tokens. The
+auth share comes from the Server-Timing header.
+
+Usage: python benchmarks/auth_requests.py
+       STORAGE_BACKEND=sql DATABASE_URL=sqlite:// python benchmarks/auth_requests.py
+(token lookups cost most when they hit the database)
+"""
+
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import request, session
+
+from app import app
+from config import Config
+from data.storage import storage
+from models import Course, User
+from routes import access, auth, courses, progress, users
+from utils import auth as auth_layer
+
+COURSES = 20
+REPEAT = 2_000
+
+def legacy_get_current_user():
+    """The resolver each route module used to define for itself"""
+    user_id = session.get('user_id')
+    if not user_id:
+        token = request.headers.get('Authorization')
+        if token and token.startswith('Bearer '):
+            token = token[7:]
+            user = storage.get_user_by_token(token)
+            return user
+    else:
+        return storage.get_user(user_id)
+    return None
+
+def use_resolver(resolver):
+    for module in (access, auth, courses, progress, users):
+        if hasattr(module, 'get_current_user'):
+            module.get_current_user = resolver
+
+def time_endpoint(client, url, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    auth_ms = 0.0
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        response = client.get(url, headers=headers)
+        timing = response.headers.get('Server-Timing', '')
+        if timing.startswith('auth;dur='):
+            auth_ms += float(timing[len('auth;dur='):])
+    assert response.status_code == 200, response.status_code
+    return (time.perf_counter() - start) / REPEAT * 1000, auth_ms / REPEAT
+
+def main():
+    logging.disable(logging.CRITICAL)
+    user = storage.create_user(User('reader', 'reader@example.com', 'x'))
+    course_ids = []
+    for i in range(COURSES):
+        course = Course(f'Course {i}', 'Description', 'instructor', 'Arabic Language')
+        course.published = True
+        storage.create_course(course)
+        storage.enroll(user.id, course.id)
+        course_ids.append(course.id)
+
+    session_token = 'benchmark-session-token'
+    storage.create_session(session_token, user.id)
+    signed_token = auth_layer.issue_signed_token(user.id)
+    Config.AUTH_TOKENS = 'signed'  # signed tokens are refused in session mode; session tokens work in both
+    endpoints = {
+        'profile': '/api/auth/profile',
+        'user courses': f'/api/users/{user.id}/courses',
+        'course access': f'/api/courses/{course_ids[0]}/access'
+    }
+    runs = [
+        ('legacy resolver', legacy_get_current_user, session_token),
+        ('scoped, session', auth_layer.get_current_user, session_token),
+        ('scoped, signed', auth_layer.get_current_user, signed_token)
+    ]
+
+    client = app.test_client()
+    print(f"{'endpoint':<15} {'resolver':<17} {'ms/request':>11} {'auth ms':>9}")
+    for name, url in endpoints.items():
+        for label, resolver, token in runs:
+            use_resolver(resolver)
+            ms, auth_ms = time_endpoint(client, url, token)
+            auth_column = f"{auth_ms:>9.4f}" if resolver is not legacy_get_current_user else f"{'-':>9}"
+            print(f"{name:<15} {label:<17} {ms:>11.3f} {auth_column}")
+    use_resolver(auth_layer.get_current_user)
+
+if __name__ == '__main__':
+    main()
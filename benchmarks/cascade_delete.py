@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Delete a large course three ways:
+- pop-only, as delete_course used to work, which leaves everything it owned behind
+- an inline cascade
+- a tombstone that the sweeper removes in batches
+
+For each, report how long the delete request holds the caller, how many
+orphans the integrity report finds afterwards, and the worst stall seen by
+a writer in another course while the records are removed.
+
+Usage: python benchmarks/cascade_delete.py
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from data.storage import InMemoryStorage
+from models import Course, Section, Subsection, Quiz, User, Review
+
+SECTIONS = 200
+LESSONS_PER_SECTION = 50
+LEARNERS = 20_000
+REVIEWERS = 2_000
+
+def build():
+    storage = InMemoryStorage()
+    course = storage.create_course(Course('Sahih al-Bukhari', 'Description', 'instructor', 'Hadith & Sunnah'))
+    other = storage.create_course(Course('Arabic I', 'Description', 'instructor', 'Arabic Language'))
+    for s in range(SECTIONS):
+        section = storage.create_section(Section(f'Book {s}', 'Description', course.id))
+        storage.create_quiz(Quiz(f'Quiz {s}', section.id))
+        for i in range(LESSONS_PER_SECTION):
+            storage.create_subsection(Subsection(f'Hadith {s}.{i}', 'video', section.id))
+    for i in range(LEARNERS):
+        user = storage.create_user(User(f'learner{i}', f'learner{i}@example.com', 'x'))
+        storage.enroll(user.id, course.id)
+        if i < REVIEWERS:
+            storage.create_review(Review(user.id, course.id, 5, 'Excellent'))
+    return storage, course.id, other.id
+
+def legacy_delete(storage, course_id):
+    with storage._lock:
+        del storage.courses[course_id]
+        storage.course_stats.pop(course_id, None)
+        storage._outlines.pop(course_id, None)
+        storage.search_index.remove(course_id)
+        storage.facet_index.remove(course_id)
+    return True
+
+def run(name, delete, sweep=False):
+    storage, course_id, other_id = build()
+    reviewer = storage.create_user(User('probe', 'probe@example.com', 'x'))
+    stalls = [0.0]
+    stop = threading.Event()
+
+    def writer():
+        while not stop.is_set():
+            start = time.perf_counter()
+            storage.create_review(Review(reviewer.id, other_id, 4, 'Good'))
+            stalls[0] = max(stalls[0], time.perf_counter() - start)
+            time.sleep(0.0005)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    time.sleep(0.05)
+
+    start = time.perf_counter()
+    delete(storage, course_id)
+    delete_ms = (time.perf_counter() - start) * 1e3
+    sweep_ms = 0.0
+    if sweep:
+        start = time.perf_counter()
+        storage.sweep_tombstones()
+        sweep_ms = (time.perf_counter() - start) * 1e3
+    stop.set()
+    thread.join()
+
+    report = storage.integrity_report()
+    print(f"{name:<18} {delete_ms:>10.1f} {sweep_ms:>9.1f} {report['total_orphans']:>9,} {stalls[0] * 1e3:>14.1f}")
+
+def main():
+    logging.disable(logging.CRITICAL)
+    owned = SECTIONS * (LESSONS_PER_SECTION + 2) + LEARNERS + REVIEWERS
+    print(f"Course owning {owned:,} records ({SECTIONS} sections x {LESSONS_PER_SECTION} lessons, "
+          f"{LEARNERS:,} learners, {REVIEWERS:,} reviews)")
+    print(f"{'mode':<18} {'delete ms':>10} {'sweep ms':>9} {'orphans':>9} {'max stall ms':>14}")
+
+    run('pop only (before)', legacy_delete)
+
+    Config.CASCADE_SYNC_LIMIT = owned + 1
+    run('inline cascade', lambda storage, course_id: storage.delete_course(course_id))
+
+    Config.CASCADE_SYNC_LIMIT = 0
+    run('tombstone + sweep', lambda storage, course_id: storage.delete_course(course_id), sweep=True)
+
+if __name__ == '__main__':
+    main()
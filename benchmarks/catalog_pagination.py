@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Compare the cost of shallow and deep catalog pages, by page number and by
+cursor, through the Flask test client.
+
+Usage: python benchmarks/catalog_pagination.py
+"""
+
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from data.storage import storage
+from models import Course
+
+COURSES = 20_000
+PER_PAGE = 10
+REPEAT = 20
+
+def timed_get(client, url):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        response = client.get(url)
+    return (time.perf_counter() - start) / REPEAT * 1000, response.get_json()
+
+def main():
+    logging.disable(logging.CRITICAL)
+    for i in range(COURSES):
+        course = Course(f'Course {i}', 'A course description', 'instructor', 'Quran Studies')
+        course.published = True
+        storage.create_course(course)
+
+    client = app.test_client()
+    first_ms, first = timed_get(client, f'/api/courses?per_page={PER_PAGE}')
+    deep_ms, deep = timed_get(client, f'/api/courses?per_page={PER_PAGE}&page=500')
+    anchor = deep['courses'][0]['id']
+    cursor_ms, _ = timed_get(client, f'/api/courses?per_page={PER_PAGE}&after={anchor}')
+
+    print(f"{COURSES} courses, {PER_PAGE} per page")
+    print(f"page 1:        {first_ms:.2f}ms")
+    print(f"page 500:      {deep_ms:.2f}ms")
+    print(f"after cursor:  {cursor_ms:.2f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Time a full fetch against an If-None-Match revalidation for the course
+detail, sections, reviews and categories endpoints. The data is a course with
+a large tree and many reviews, and the report includes the bytes sent.
+
+Usage: python benchmarks/conditional_get.py
+       STORAGE_BACKEND=sql DATABASE_URL=sqlite:// python benchmarks/conditional_get.py
+"""
+
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from data.storage import storage
+from models import Course, Section, Subsection, User, Review
+
+SECTIONS = 20
+LESSONS_PER_SECTION = 15
+REVIEWS = 500
+ROUNDS = 200
+
+def setup():
+    course = Course('Riyad as-Salihin', 'Description', 'instructor', 'Hadith & Sunnah')
+    items = [course]
+    for s in range(SECTIONS):
+        section = Section(f'Book {s}', 'Description', course.id)
+        items.append(section)
+        items += [Subsection(f'Chapter {s}.{i}', 'video', section.id) for i in range(LESSONS_PER_SECTION)]
+    reviewers = [User(f'reviewer{i}', f'reviewer{i}@example.com', 'x') for i in range(REVIEWS)]
+    items += reviewers
+    items += [Review(user.id, course.id, 5, 'Beneficial, jazakAllahu khayran') for user in reviewers]
+    storage.bulk_create(items)
+    return course.id
+
+def timed(client, url, headers):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        response = client.get(url, headers=headers)
+    return (time.perf_counter() - start) / ROUNDS * 1e3, response
+
+def main():
+    logging.disable(logging.CRITICAL)
+    course_id = setup()
+    client = app.test_client()
+    print(f"{'endpoint':<20} {'full ms':>8} {'bytes':>8} {'304 ms':>8} {'bytes':>6} {'speedup':>8}")
+    for name, url in [('course detail', f'/api/courses/{course_id}'),
+                      ('sections', f'/api/courses/{course_id}/sections'),
+                      ('reviews', f'/api/courses/{course_id}/reviews'),
+                      ('categories', '/api/courses/categories')]:
+        full_ms, full = timed(client, url, {})
+        cached_ms, cached = timed(client, url, {'If-None-Match': full.headers['ETag']})
+        assert full.status_code == 200 and cached.status_code == 304, (url, full.status_code, cached.status_code)
+        print(f"{name:<20} {full_ms:>8.2f} {len(full.data):>8,} {cached_ms:>8.2f} {len(cached.data):>6} "
+              f"{full_ms / cached_ms:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Time repeated course detail reads with and without the versioned
+serialization cache, and check that a content change invalidates it.
+
+Usage: python benchmarks/course_serialization.py
+"""
+
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from data.course_cache import CourseCache, course_cache
+from data.storage import storage
+from models import Course, Section, Subsection
+
+SECTIONS = 20
+SUBSECTIONS_PER_SECTION = 15
+READS = 500
+
+def build_course():
+    course = Course('Tafsir of Juz Amma', 'Verse by verse commentary', 'instructor', 'Quran Studies')
+    course.published = True
+    storage.create_course(course)
+    for s in range(SECTIONS):
+        section = Section(f'Surah {s}', 'Commentary', course.id)
+        storage.create_section(section)
+        for i in range(SUBSECTIONS_PER_SECTION):
+            subsection = Subsection(f'Verses {i}', 'video', section.id)
+            subsection.content = {'transcript': 'Lorem ipsum dolor sit amet ' * 20, 'notes': ['a', 'b', 'c']}
+            storage.create_subsection(subsection)
+    return course
+
+def time_reads(fn):
+    start = time.perf_counter()
+    for _ in range(READS):
+        fn()
+    return (time.perf_counter() - start) / READS * 1000
+
+def main():
+    logging.disable(logging.CRITICAL)
+    course = build_course()
+    cache = CourseCache()
+
+    uncached_ms = time_reads(lambda: json.dumps(course.to_dict()))
+    cached_ms = time_reads(lambda: cache.get_json(course))
+    print(f"{SECTIONS * SUBSECTIONS_PER_SECTION} subsections, {len(cache.get_json(course))} bytes encoded")
+    print(f"to_dict + json.dumps: {uncached_ms:.3f}ms")
+    print(f"cached JSON:          {cached_ms:.3f}ms")
+
+    client = app.test_client()
+    endpoint_ms = time_reads(lambda: client.get(f'/api/courses/{course.id}'))
+    print(f"GET /api/courses/<id>: {endpoint_ms:.3f}ms")
+
+    # A new subsection must show up on the next read
+    storage.create_subsection(Subsection('Added later', 'text', course.sections[0].id))
+    data = client.get(f'/api/courses/{course.id}').get_json()
+    assert len(data['course']['sections'][0]['subsections']) == SUBSECTIONS_PER_SECTION + 1
+    print(f"Invalidation: OK, cache stats {course_cache.stats()}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Exercise the incremental CourseStats aggregates with a random mix of
+enrollments, progress updates and reviews, verify them against a full
+recomputation, and time catalog statistics reads.
+
+Usage: python benchmarks/course_stats.py
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.storage import InMemoryStorage
+from models import User, Course, Review
+from utils.helpers import get_course_statistics
+
+USERS = 5_000
+COURSES = 200
+OPERATIONS = 50_000
+
+def main():
+    random.seed(7)
+    storage = InMemoryStorage()
+    users = [storage.create_user(User(f'user{i}', f'user{i}@example.com', 'x')) for i in range(USERS)]
+    courses = [storage.create_course(Course(f'Course {i}', 'Description', 'instructor', 'Quran Studies'))
+               for i in range(COURSES)]
+
+    start = time.perf_counter()
+    for _ in range(OPERATIONS):
+        user = random.choice(users)
+        course = random.choice(courses)
+        op = random.random()
+        if op < 0.4:
+            storage.enroll(user.id, course.id)
+        elif op < 0.5:
+            storage.unenroll(user.id, course.id)
+        elif op < 0.9:
+            progress = storage.get_progress(user.id, course.id)
+            if progress:
+                percentage = random.choice([0.0, 25.0, 50.0, 100.0])
+                updates = {'progress_percentage': percentage}
+                if percentage >= 100:
+                    updates['completed_at'] = time.time()
+                storage.update_progress(progress.id, updates)
+        else:
+            storage.create_review(Review(user.id, course.id, random.randint(1, 5), 'comment'))
+    elapsed = time.perf_counter() - start
+    print(f"{OPERATIONS} mutations in {elapsed:.2f}s")
+
+    mismatches = storage.check_course_stats()
+    print(f"Consistency check: {'OK' if not mismatches else mismatches}")
+
+    start = time.perf_counter()
+    for course in courses:
+        get_course_statistics(course, storage)
+    elapsed = time.perf_counter() - start
+    print(f"Statistics for {COURSES} courses in {elapsed * 1000:.2f}ms")
+
+    return 0 if not mismatches else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
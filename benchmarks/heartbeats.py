@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Ingest a burst of watch-time heartbeats two ways: written through to
+storage one by one (as a PUT of total_time_spent did), and recorded in the
+coalescing buffer with periodic batch flushes. Reports heartbeats/s,
+storage writes, and the 503 rate once the buffer is capped.
+
+Usage: python benchmarks/heartbeats.py
+       STORAGE_BACKEND=sql DATABASE_URL=sqlite:// python benchmarks/heartbeats.py
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['HEARTBEAT_FLUSH_INTERVAL'] = '0'  # the benchmark drives flushes itself
+
+from data.heartbeats import HeartbeatBuffer, HeartbeatBufferFull
+from data.storage import storage
+from models import Course, User
+
+VIEWERS = 5_000
+HEARTBEATS_PER_VIEWER = 8  # two minutes of watching at one beat per 15 seconds
+THREADS = 8
+FLUSH_EVERY = 0.25  # seconds
+
+def setup():
+    course = storage.create_course(Course('Seerah', 'Description', 'instructor', 'Islamic History'))
+    viewers = []
+    for i in range(VIEWERS):
+        user = storage.create_user(User(f'viewer{i}', f'viewer{i}@example.com', 'x'))
+        storage.enroll(user.id, course.id)
+        viewers.append(user.id)
+    return course.id, viewers
+
+def write_through(course_id, viewers):
+    def beat(user_id):
+        progress = storage.get_progress(user_id, course_id)
+        storage.update_progress(progress.id, {
+            'total_time_spent': progress.total_time_spent + 1,
+            'current_subsection_id': 'lesson-1',
+            'last_accessed': time.time()
+        })
+    return run_threads(viewers, beat), len(viewers) * HEARTBEATS_PER_VIEWER
+
+def buffered(course_id, viewers, max_keys):
+    buffer = HeartbeatBuffer(storage.add_watch_time, max_keys=max_keys)
+    rejected = [0]
+
+    def beat(user_id):
+        try:
+            buffer.record(user_id, course_id, 'lesson-1', 15)
+        except HeartbeatBufferFull:
+            rejected[0] += 1
+
+    stop = threading.Event()
+
+    def flusher():
+        while not stop.wait(FLUSH_EVERY):
+            buffer.flush()
+
+    thread = threading.Thread(target=flusher)
+    thread.start()
+    elapsed = run_threads(viewers, beat)
+    stop.set()
+    thread.join()
+    buffer.close()
+    return elapsed, buffer.writes, rejected[0]
+
+def run_threads(viewers, beat):
+    chunks = [viewers[i::THREADS] for i in range(THREADS)]
+
+    def work(chunk):
+        for _ in range(HEARTBEATS_PER_VIEWER):
+            for user_id in chunk:
+                beat(user_id)
+
+    threads = [threading.Thread(target=work, args=(chunk,)) for chunk in chunks]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+def main():
+    logging.disable(logging.CRITICAL)
+    course_id, viewers = setup()
+    total = VIEWERS * HEARTBEATS_PER_VIEWER
+    print(f"{VIEWERS:,} viewers x {HEARTBEATS_PER_VIEWER} heartbeats on {THREADS} threads")
+    print(f"{'mode':<24} {'heartbeats/s':>13} {'storage writes':>15} {'503s':>6}")
+
+    elapsed, writes = write_through(course_id, viewers)
+    print(f"{'write-through':<24} {total / elapsed:>13,.0f} {writes:>15,} {0:>6}")
+
+    for max_keys in (VIEWERS * 2, VIEWERS // 4):
+        elapsed, writes, rejected = buffered(course_id, viewers, max_keys)
+        print(f"{f'buffer (max {max_keys:,} keys)':<24} {total / elapsed:>13,.0f} {writes:>15,} {rejected:>6,}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Time the catalog and course detail endpoints with the stdlib and fast JSON
+encoders, with and without the serialization cache, and show the effect of
+response compression on size. First checks that the spliced course detail
+decodes to one object with no repeated keys and a single reviews list.
+
+Usage: python benchmarks/json_responses.py
+"""
+
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from data.course_cache import course_cache
+from data.storage import storage
+from models import Course, Section, Subsection, User, Review
+from utils.responses import ENCODERS, use_encoder
+
+COURSES = 50
+SECTIONS = 10
+SUBSECTIONS_PER_SECTION = 20
+REPEAT = 50
+
+def build_catalog():
+    courses = []
+    for c in range(COURSES):
+        course = Course(f'Course {c}', 'A course description', 'instructor', 'Hadith & Sunnah')
+        course.published = True
+        storage.create_course(course)
+        for s in range(SECTIONS):
+            section = Section(f'Section {s}', 'Section description', course.id)
+            storage.create_section(section)
+            for i in range(SUBSECTIONS_PER_SECTION):
+                subsection = Subsection(f'Lesson {i}', 'text', section.id)
+                subsection.content = {'body': 'Narrated by ' * 30, 'references': list(range(10))}
+                storage.create_subsection(subsection)
+        courses.append(course)
+    return courses
+
+def unique_keys(pairs):
+    keys = [key for key, _ in pairs]
+    assert len(keys) == len(set(keys)), f'repeated keys: {sorted(k for k in set(keys) if keys.count(k) > 1)}'
+    return dict(pairs)
+
+def check_detail(client, course):
+    reviewer = storage.create_user(User('reviewer', 'reviewer@example.com', 'x'))
+    review = storage.create_review(Review(reviewer.id, course.id, 5, 'Beneficial'))
+    for encoder in ENCODERS:
+        use_encoder(encoder)
+        course_cache.clear()
+        for _ in range(2):  # cold, then from the cache
+            body = json.loads(client.get(f'/api/courses/{course.id}').data, object_pairs_hook=unique_keys)
+            assert [r['id'] for r in body['course']['reviews']] == [review.id], body['course']['reviews']
+    use_encoder('auto')
+    print("course detail: one reviews list, no repeated keys")
+
+def timed_get(client, url, cached, headers=None):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        if not cached:
+            course_cache.clear()
+        response = client.get(url, headers=headers or {})
+    return (time.perf_counter() - start) / REPEAT * 1000, response
+
+def main():
+    logging.disable(logging.CRITICAL)
+    courses = build_catalog()
+    client = app.test_client()
+    check_detail(client, courses[0])
+    endpoints = {
+        'catalog (50/page)': '/api/courses?per_page=50',
+        'course detail': f'/api/courses/{courses[0].id}'
+    }
+
+    runs = [('json', False), ('json', True)]
+    if 'orjson' in ENCODERS:
+        runs += [('orjson', False), ('orjson', True)]
+    print(f"{'endpoint':<20} {'encoder':>8} {'cache':>6} {'ms/request':>11}")
+    for name, url in endpoints.items():
+        for encoder, cached in runs:
+            use_encoder(encoder)
+            ms, _ = timed_get(client, url, cached)
+            print(f"{name:<20} {encoder:>8} {'warm' if cached else 'cold':>6} {ms:>11.2f}")
+    use_encoder('auto')
+
+    print()
+    print(f"{'endpoint':<20} {'encoding':>8} {'bytes':>10} {'ms/request':>11}")
+    for name, url in endpoints.items():
+        for encoding in ['identity', 'gzip', 'br']:
+            ms, response = timed_get(client, url, True, {'Accept-Encoding': encoding})
+            if response.headers.get('Content-Encoding', 'identity') != encoding:
+                continue
+            print(f"{name:<20} {encoding:>8} {len(response.data):>10} {ms:>11.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+WSGI entry point for load tests: the API over a freshly seeded store, with
+the seed manifest written to LOADTEST_MANIFEST for the load generator.
+
+    LOADTEST_MANIFEST=/tmp/load.json gunicorn --preload -w 4 -b 127.0.0.1:8000 benchmarks.load_app:app
+
+With --preload the store is seeded once in the gunicorn master before the
+workers fork, so every worker starts from the same data and the manifest's
+tokens are valid in all of them. With the in-memory backend, writes made
+during the run stay in the worker that served them; use STORAGE_BACKEND=sql
+(on a fresh database) when workers must share state.
+
+Environment: LOADTEST_USERS, LOADTEST_COURSES, LOADTEST_TOKENS, LOADTEST_SEED,
+LOADTEST_LOG_LEVEL (default WARNING), and LOADTEST_PORT when run directly
+(werkzeug's threaded server, for local runs without gunicorn).
+"""
+
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from data.storage import storage
+from benchmarks.seed_data import seed
+
+logging.getLogger().setLevel(os.environ.get('LOADTEST_LOG_LEVEL', 'WARNING'))
+logging.getLogger('werkzeug').setLevel(os.environ.get('LOADTEST_LOG_LEVEL', 'WARNING'))
+
+manifest = seed(
+    storage,
+    users=int(os.environ.get('LOADTEST_USERS', 1000)),
+    courses=int(os.environ.get('LOADTEST_COURSES', 50)),
+    tokens=int(os.environ.get('LOADTEST_TOKENS', 200)),
+    rng_seed=int(os.environ.get('LOADTEST_SEED', 7))
+)
+if os.environ.get('LOADTEST_MANIFEST'):
+    # Written to a temporary name first so a poller never reads half a file
+    path = os.environ['LOADTEST_MANIFEST']
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f)
+    os.replace(path + '.tmp', path)
+
+if __name__ == '__main__':
+    app.run(host='127.0.0.1', port=int(os.environ.get('LOADTEST_PORT', 8000)), threaded=True)
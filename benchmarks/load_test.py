@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Concurrent load test over a weighted mix of real endpoints, grown out of the
+test_api.py walkthrough: catalog browse, course detail, access tree,
+progress updates and login.
+
+The data set comes from benchmarks/seed_data.py. Requests are driven either
+in-process through the Flask test client, or over HTTP against gunicorn
+(spawned with benchmarks/load_app.py, or any running server given with
+--url and --manifest). The result is a JSON report with p50/p95/p99
+latency, throughput and errors overall and per scenario, plus RSS, so runs
+can be saved with --output and compared with --baseline.
+
+Usage: python benchmarks/load_test.py [--concurrency 8] [--duration 10]
+       python benchmarks/load_test.py --target http --workers 4 --output run.json
+       python benchmarks/load_test.py --target http --url http://127.0.0.1:8000 --manifest /tmp/load.json
+       python benchmarks/load_test.py --mix browse=60,detail=20,tree=10,progress=10 --baseline run.json
+"""
+
+import argparse
+import bisect
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_MIX = 'browse=40,detail=25,tree=15,progress=15,login=5'
+
+# Request = (method, path, JSON body or None, bearer token or None)
+Request = Tuple[str, str, Optional[dict], Optional[str]]
+
+# Scenarios
+
+def browse(rng: random.Random, manifest: dict) -> Request:
+    page = rng.randint(1, max(1, len(manifest['courses']) // 20))
+    query = f'/api/courses?page={page}&per_page=20'
+    if rng.random() < 0.3:
+        query += '&level=' + rng.choice(['Beginner', 'Intermediate', 'Advanced'])
+    return 'GET', query, None, None
+
+def detail(rng: random.Random, manifest: dict) -> Request:
+    return 'GET', f"/api/courses/{rng.choice(manifest['courses'])['id']}", None, None
+
+def tree(rng: random.Random, manifest: dict) -> Request:
+    session = rng.choice(manifest['sessions'])
+    course_id = rng.choice(session['courses']) if session['courses'] and rng.random() < 0.7 \
+        else rng.choice(manifest['courses'])['id']
+    return 'GET', f'/api/courses/{course_id}/access/tree', None, session['token']
+
+def progress(rng: random.Random, manifest: dict) -> Request:
+    session = rng.choice(manifest['enrolled_sessions'])
+    course_id = rng.choice(session['courses'])
+    subsection_id = rng.choice(manifest['subsections_by_course'][course_id])
+    return ('POST', f"/api/progress/{session['user_id']}/{course_id}/subsections/{subsection_id}/complete",
+            None, session['token'])
+
+def login(rng: random.Random, manifest: dict) -> Request:
+    return 'POST', '/api/auth/login', {'email': rng.choice(manifest['emails']),
+                                       'password': manifest['password']}, None
+
+SCENARIOS: Dict[str, Callable[[random.Random, dict], Request]] = {
+    'browse': browse,
+    'detail': detail,
+    'tree': tree,
+    'progress': progress,
+    'login': login
+}
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+# Clients
+
+class InProcessClient:
+    """Flask test client: the whole request path without sockets"""
+
+    def __init__(self, app):
+        self.client = app.test_client(use_cookies=False)
+
+    def request(self, method: str, path: str, body: Optional[dict], token: Optional[str]) -> int:
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = self.client.open(path, method=method, json=body, headers=headers)
+        response.close()
+        return response.status_code
+
+class HTTPClient:
+    """One keep-alive connection per worker thread"""
+
+    def __init__(self, url: str, timeout: float = 30):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.timeout = timeout
+        self.connection = None
+
+    def request(self, method: str, path: str, body: Optional[dict], token: Optional[str]) -> int:
+        headers = {'Accept-Encoding': 'gzip'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        for attempt in (1, 2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.connection.request(method, path, payload, headers)
+                response = self.connection.getresponse()
+                response.read()
+                if response.getheader('Connection', '').lower() == 'close':
+                    self.connection.close()
+                    self.connection = None
+                return response.status
+            except (http.client.HTTPException, OSError):
+                # The server may close an idle keep-alive connection; retry once on a fresh one
+                self.connection.close()
+                self.connection = None
+                if attempt == 2:
+                    return 0
+
+# Driver
+
+def run_load(make_client: Callable[[], object], manifest: dict, mix: Dict[str, float],
+             concurrency: int, duration: float, warmup: float, rng_seed: int) -> Tuple[Dict[str, list], float]:
+    """Run the mix on concurrency threads; returns per-scenario (latency s, status) samples and the measured seconds"""
+    names = list(mix)
+    cumulative = []
+    total = 0.0
+    for name in names:
+        total += mix[name]
+        cumulative.append(total)
+
+    start = time.perf_counter()
+    measure_from = start + warmup
+    end = measure_from + duration
+    samples: List[Dict[str, list]] = []
+
+    def worker(index: int):
+        rng = random.Random(rng_seed * 1000 + index)
+        client = make_client()
+        local: Dict[str, list] = {name: [] for name in names}
+        samples.append(local)
+        while True:
+            now = time.perf_counter()
+            if now >= end:
+                break
+            name = names[bisect.bisect(cumulative, rng.random() * total)]
+            method, path, body, token = SCENARIOS[name](rng, manifest)
+            began = time.perf_counter()
+            status = client.request(method, path, body, token)
+            finished = time.perf_counter()
+            if began >= measure_from and finished <= end:
+                local[name].append((finished - began, status))
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    merged: Dict[str, list] = {name: [] for name in names}
+    for local in samples:
+        for name, values in local.items():
+            merged[name].extend(values)
+    return merged, duration
+
+# Report
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(q / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(values: List[Tuple[float, int]], seconds: float) -> dict:
+    latencies = sorted(latency * 1e3 for latency, _ in values)
+    statuses: Dict[str, int] = {}
+    for _, status in values:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(count for status, count in statuses.items() if not 200 <= int(status) < 400)
+    return {
+        'requests': len(values),
+        'throughput_rps': round(len(values) / seconds, 1) if seconds else 0.0,
+        'errors': errors,
+        'status': dict(sorted(statuses.items())),
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'max': round(latencies[-1], 3) if latencies else 0.0
+        }
+    }
+
+def rss_bytes(pid: int) -> Optional[int]:
+    """Resident set size of a process from /proc (Linux only)"""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+def process_tree_rss(pid: int) -> Optional[int]:
+    """RSS of a process plus its direct children, such as a gunicorn master and its workers"""
+    total = rss_bytes(pid)
+    if total is None:
+        return None
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The parent pid follows the parenthesised command name
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == pid:
+            total += rss_bytes(int(entry)) or 0
+    return total
+
+def megabytes(value: Optional[int]) -> Optional[float]:
+    return round(value / 2**20, 1) if value is not None else None
+
+def build_report(args, mix: Dict[str, float], manifest: dict, samples: Dict[str, list], seconds: float,
+                 server_pid: Optional[int]) -> dict:
+    everything = [sample for values in samples.values() for sample in values]
+    report = {
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'target': args.url or args.target,
+        'server': args.server if args.target == 'http' and not args.url else None,
+        'workers': args.workers if args.target == 'http' and not args.url else None,
+        'concurrency': args.concurrency,
+        'duration_s': seconds,
+        'mix': mix,
+        'dataset': manifest.get('counts', {}),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        **summarize(everything, seconds),
+        'scenarios': {name: summarize(values, seconds) for name, values in samples.items()},
+        'rss_mb': {
+            'driver': megabytes(rss_bytes(os.getpid())),
+            # ru_maxrss is in kilobytes on Linux
+            'driver_peak': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'server': megabytes(process_tree_rss(server_pid)) if server_pid else None
+        }
+    }
+    if args.target == 'inprocess':
+        report['rss_mb']['server'] = report['rss_mb']['driver']
+    return report
+
+def compare(report: dict, baseline: dict):
+    """Print the change of the headline numbers against an earlier report"""
+    rows = [('throughput_rps', report['throughput_rps'], baseline.get('throughput_rps'))]
+    for key in ('p50', 'p95', 'p99'):
+        rows.append((f'{key} ms', report['latency_ms'][key], baseline.get('latency_ms', {}).get(key)))
+    for name, scenario in report['scenarios'].items():
+        old = baseline.get('scenarios', {}).get(name, {}).get('latency_ms', {})
+        rows.append((f'{name} p95 ms', scenario['latency_ms']['p95'], old.get('p95')))
+    rows.append(('server rss MB', report['rss_mb']['server'], baseline.get('rss_mb', {}).get('server')))
+    print(f"{'metric':<20} {'baseline':>10} {'current':>10} {'change':>8}", file=sys.stderr)
+    for name, current, old in rows:
+        change = f'{(current - old) / old:+.1%}' if old and current is not None else 'n/a'
+        print(f"{name:<20} {old if old is not None else '-':>10} {current if current is not None else '-':>10} "
+              f"{change:>8}", file=sys.stderr)
+
+# Targets
+
+def index_manifest(manifest: dict) -> dict:
+    manifest['subsections_by_course'] = {course['id']: course['subsections']
+                                         for course in manifest['courses'] if course['subsections']}
+    manifest['enrolled_sessions'] = [session for session in manifest['sessions'] if session['courses']]
+    return manifest
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def spawn_server(args, manifest_path: str) -> Tuple[subprocess.Popen, str]:
+    port = free_port()
+    env = dict(os.environ, LOADTEST_MANIFEST=manifest_path, LOADTEST_USERS=str(args.users),
+               LOADTEST_COURSES=str(args.courses), LOADTEST_TOKENS=str(args.tokens),
+               LOADTEST_SEED=str(args.seed), LOADTEST_PORT=str(port), LOADTEST_LOG_LEVEL=args.log_level)
+    if args.server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '--preload', '--workers', str(args.workers),
+                   '--bind', f'127.0.0.1:{port}', '--chdir', ROOT, 'benchmarks.load_app:app']
+    else:
+        command = [sys.executable, os.path.join(ROOT, 'benchmarks', 'load_app.py')]
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL,
+                               stderr=None if args.verbose else subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + args.startup_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"{args.server} exited with code {process.returncode} (rerun with --verbose)")
+        if os.path.exists(manifest_path):
+            try:
+                if HTTPClient(url, timeout=1).request('GET', '/health', None, None) == 200:
+                    return process, url
+            except OSError:
+                pass
+        time.sleep(0.1)
+    process.terminate()
+    raise SystemExit(f"{args.server} did not become ready within {args.startup_timeout}s")
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent load test over a weighted endpoint mix')
+    parser.add_argument('--target', choices=['inprocess', 'http'], default='inprocess')
+    parser.add_argument('--url', help='running server to load (http target); needs --manifest')
+    parser.add_argument('--manifest', help='seed manifest written by the server (see benchmarks/load_app.py)')
+    parser.add_argument('--server', choices=['gunicorn', 'werkzeug'], default='gunicorn',
+                        help='server to spawn for the http target when no --url is given')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='gunicorn worker processes')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads')
+    parser.add_argument('--duration', type=float, default=10, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=1, help='unmeasured seconds first')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='scenario weights, e.g. browse=40,login=5')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--courses', type=int, default=50)
+    parser.add_argument('--tokens', type=int, default=200, help='seeded users with a bearer token')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--log-level', default='WARNING', help='application log level during the run')
+    parser.add_argument('--startup-timeout', type=float, default=120)
+    parser.add_argument('--output', help='write the JSON report here as well as to stdout')
+    parser.add_argument('--baseline', help='earlier JSON report to compare against')
+    parser.add_argument('--verbose', action='store_true', help="show the spawned server's stderr")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    process = None
+    server_pid = None
+    if args.target == 'inprocess':
+        from app import app
+        from data.storage import storage
+        from benchmarks.seed_data import seed
+        logging.getLogger().setLevel(args.log_level)
+        manifest = seed(storage, args.users, args.courses, tokens=args.tokens, rng_seed=args.seed)
+        make_client = lambda: InProcessClient(app)
+    elif args.url:
+        if not args.manifest:
+            parser.error('--url needs the --manifest written when that server was seeded')
+        with open(args.manifest) as f:
+            manifest = json.load(f)
+        make_client = lambda: HTTPClient(args.url)
+    else:
+        manifest_path = os.path.join(tempfile.mkdtemp(prefix='loadtest-'), 'manifest.json')
+        process, url = spawn_server(args, manifest_path)
+        server_pid = process.pid
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        make_client = lambda: HTTPClient(url)
+    index_manifest(manifest)
+
+    try:
+        samples, seconds = run_load(make_client, manifest, mix, args.concurrency, args.duration,
+                                    args.warmup, args.seed)
+        report = build_report(args, mix, manifest, samples, seconds, server_pid)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+if __name__ == '__main__':
+    main()
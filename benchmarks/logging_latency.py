@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Progress-update request latency under four logging setups, each in a fresh
+interpreter whose stderr is drained either as fast as possible or slowly
+(like a backed-up log shipper):
+- before: logging.basicConfig(level=DEBUG), written inline as text
+- inline json: the JSON formatter with LOG_ASYNC=0
+- queued json: the default queue and listener thread
+- queued + sampled: the same with LOG_SAMPLING=routes.progress=0.01
+
+Usage: python benchmarks/logging_latency.py [--requests 3000]
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = [
+    ('before', {'LOG_ASYNC': '0', 'LOG_FORMAT': 'text'}),
+    ('inline json', {'LOG_ASYNC': '0'}),
+    ('queued json', {}),
+    ('queued + sampled', {'LOG_SAMPLING': 'routes.progress=0.01'})
+]
+
+def child(requests: int, legacy: bool):
+    from app import app
+    from data.storage import storage
+    from models import Course, Section, Subsection, User
+    from utils.auth import issue_token
+    if legacy:
+        logging.basicConfig(level=logging.DEBUG, force=True)
+
+    course = storage.create_course(Course('Seerah', 'Description', 'instructor', 'Islamic History'))
+    section = storage.create_section(Section('Makkah', 'Description', course.id))
+    lessons = [storage.create_subsection(Subsection(f'Lesson {i}', 'video', section.id)).id for i in range(20)]
+    user = storage.create_user(User('learner', 'learner@example.com', 'x'))
+    storage.enroll(user.id, course.id)
+    headers = {'Authorization': f'Bearer {issue_token(user.id)}'}
+    client = app.test_client()
+
+    latencies = []
+    start = time.perf_counter()
+    for i in range(requests):
+        began = time.perf_counter()
+        response = client.put(f'/api/progress/{user.id}/{course.id}', headers=headers,
+                              json={'current_subsection_id': lessons[i % len(lessons)], 'total_time_spent': i})
+        latencies.append(time.perf_counter() - began)
+        assert response.status_code == 200, response.status_code
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(json.dumps({
+        'p50_ms': latencies[len(latencies) // 2] * 1e3,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1e3,
+        'max_ms': latencies[-1] * 1e3,
+        'rps': requests / elapsed
+    }), flush=True)
+
+def run(requests: int, mode: str, env: dict, slow: bool) -> dict:
+    command = [sys.executable, __file__, '--child', '--requests', str(requests)]
+    if mode == 'before':
+        command.append('--legacy')
+    process = subprocess.Popen(command, env=dict(os.environ, **env), cwd=ROOT,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    logged = [0]
+
+    def drain():
+        while True:
+            chunk = process.stderr.read1(4096) if slow else process.stderr.read1(1 << 20)
+            if not chunk:
+                return
+            logged[0] += chunk.count(b'\n')
+            if slow:
+                time.sleep(0.05)  # about 80KB/s
+
+    reader = threading.Thread(target=drain, daemon=True)
+    reader.start()
+    result = json.loads(process.stdout.read().strip().splitlines()[-1])
+    process.wait()
+    reader.join()
+    result['lines'] = logged[0]
+    return result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--child', action='store_true')
+    parser.add_argument('--legacy', action='store_true')
+    args = parser.parse_args()
+    if args.child:
+        child(args.requests, args.legacy)
+        return
+
+    print(f"{args.requests} PUT /api/progress requests per run")
+    print(f"{'stderr':<6} {'logging':<18} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'req/s':>8} {'log lines':>10}")
+    for slow in (False, True):
+        for mode, env in MODES:
+            result = run(args.requests, mode, env, slow)
+            print(f"{'slow' if slow else 'fast':<6} {mode:<18} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+                  f"{result['max_ms']:>8.1f} {result['rps']:>8.0f} {result['lines']:>10,}")
+
+if __name__ == '__main__':
+    main()
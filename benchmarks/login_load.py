@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Measure catalog request latency while many threads log in at once, with
+password hashing inline (the old behaviour) and on the bounded pool.
+
+Usage: python benchmarks/login_load.py
+"""
+
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from data.storage import storage
+from models import Course, User
+from routes import auth
+from utils.hashing import PasswordHashingPool
+from utils.helpers import hash_password
+
+LOGIN_THREADS = 16
+CATALOG_REQUESTS = 200
+ACCOUNTS = 16
+BACKOFF = 0.1  # seconds
+
+def run(pool, users):
+    auth.password_pool = pool
+    stop = threading.Event()
+    outcomes = {'ok': 0, 'busy': 0}
+    lock = threading.Lock()
+
+    def login_loop(i):
+        client = app.test_client()
+        email = users[i % len(users)].email
+        while not stop.is_set():
+            status = client.post('/api/auth/login', json={'email': email, 'password': 'SecurePass123'}).status_code
+            with lock:
+                outcomes['ok' if status == 200 else 'busy'] += 1
+            if status == 503:
+                stop.wait(BACKOFF)  # a well-behaved client waits before retrying
+
+    threads = [threading.Thread(target=login_loop, args=(i,), daemon=True) for i in range(LOGIN_THREADS)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.5)
+
+    client = app.test_client()
+    latencies = []
+    with lock:
+        outcomes['ok'] = outcomes['busy'] = 0
+    started = time.perf_counter()
+    for _ in range(CATALOG_REQUESTS):
+        start = time.perf_counter()
+        client.get('/api/courses?per_page=10')
+        latencies.append((time.perf_counter() - start) * 1000)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in threads:
+        thread.join()
+    pool.shutdown()
+    latencies.sort()
+    return {
+        'p50': statistics.median(latencies),
+        'p99': latencies[int(len(latencies) * 0.99) - 1],
+        'logins/s': outcomes['ok'] / elapsed,
+        '503/s': outcomes['busy'] / elapsed
+    }
+
+def main():
+    logging.disable(logging.CRITICAL)
+    for i in range(50):
+        course = Course(f'Course {i}', 'Description', 'instructor', 'Islamic Ethics')
+        course.published = True
+        storage.create_course(course)
+    password_hash = hash_password('SecurePass123')
+    users = [storage.create_user(User(f'user{i}', f'user{i}@example.com', password_hash)) for i in range(ACCOUNTS)]
+
+    workers = os.cpu_count() or 1
+    print(f"{LOGIN_THREADS} threads logging in continuously, {workers} CPU(s)")
+    print(f"{'hashing':<22} {'catalog p50 ms':>15} {'p99 ms':>9} {'logins/s':>9} {'503/s':>7}")
+    for label, pool in [('inline', PasswordHashingPool(0, 0)),
+                        (f'pool ({workers} workers)', PasswordHashingPool(workers, 4))]:
+        result = run(pool, users)
+        print(f"{label:<22} {result['p50']:>15.2f} {result['p99']:>9.2f} "
+              f"{result['logins/s']:>9.1f} {result['503/s']:>7.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Throughput of concurrent byte-range requests against the signed media
+stream endpoint, next to flask.send_file on the same file, over a real
+threaded HTTP server. Each client asks for random 256 KiB ranges, as a
+seeking video player does.
+
+Usage: python benchmarks/media_ranges.py
+(under gunicorn the stream endpoint hands the file to sendfile(); the
+development server used here exercises the mmap path)
+"""
+
+import http.client
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='media-bench-')
+os.environ['MEDIA_ROOT'] = MEDIA_ROOT
+
+from flask import send_file
+from werkzeug.serving import make_server
+
+from app import app
+from utils.media import issue_stream_token, stream_url
+
+FILE_BYTES = 64 * 1024 * 1024
+RANGE_BYTES = 256 * 1024
+REQUESTS_PER_CLIENT = 200
+CLIENT_COUNTS = (1, 4, 16)
+
+def make_media() -> str:
+    path = os.path.join(MEDIA_ROOT, 'lesson.mp4')
+    with open(path, 'wb') as f:
+        f.write(os.urandom(FILE_BYTES))
+    return path
+
+def client_loop(port: int, url: str, seed: int, results: list):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    received = 0
+    for _ in range(REQUESTS_PER_CLIENT):
+        start = rng.randrange(0, FILE_BYTES - RANGE_BYTES)
+        conn.request('GET', url, headers={'Range': f'bytes={start}-{start + RANGE_BYTES - 1}'})
+        response = conn.getresponse()
+        body = response.read()
+        assert response.status == 206 and len(body) == RANGE_BYTES, response.status
+        received += len(body)
+    conn.close()
+    results.append(received)
+
+def run(port: int, url: str, clients: int):
+    results = []
+    threads = [threading.Thread(target=client_loop, args=(port, url, i, results)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return clients * REQUESTS_PER_CLIENT / elapsed, sum(results) / elapsed / 1024 / 1024
+
+def main():
+    logging.disable(logging.CRITICAL)
+    path = make_media()
+
+    @app.route('/bench/send-file')
+    def bench_send_file():
+        return send_file(path, mimetype='video/mp4', conditional=True)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    stream = stream_url(issue_stream_token('bench', 'full', 'lesson.mp4', 0))
+    endpoints = [('signed stream', stream), ('flask.send_file', '/bench/send-file')]
+
+    print(f"{FILE_BYTES // 1024 // 1024} MiB file, {RANGE_BYTES // 1024} KiB ranges, "
+          f"{REQUESTS_PER_CLIENT} requests per client")
+    print(f"{'endpoint':<16} {'clients':>7} {'req/s':>8} {'MiB/s':>8}")
+    for clients in CLIENT_COUNTS:
+        for label, url in endpoints:
+            requests_per_second, mib_per_second = run(port, url, clients)
+            print(f"{label:<16} {clients:>7} {requests_per_second:>8.0f} {mib_per_second:>8.0f}")
+    server.shutdown()
+    os.remove(path)
+    os.rmdir(MEDIA_ROOT)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Cost of the metrics layer: the same requests and storage calls with
+METRICS_ENABLED off and on, each in a fresh interpreter because the setting
+is read when the app is built. Also checks that a threaded run loses no
+counts.
+
+Usage: python benchmarks/metrics_overhead.py
+"""
+
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+REQUESTS = 3000
+CALLS = 200_000
+THREADS = 8
+
+def child():
+    logging.disable(logging.CRITICAL)
+    from app import app
+    from data.storage import storage
+    from models import Course, User
+
+    course = storage.create_course(Course('Fiqh of Salah', 'Description', 'instructor', 'Fiqh'))
+    storage.update_course(course.id, {'published': True})
+    user = storage.create_user(User('learner', 'learner@example.com', 'x'))
+    storage.enroll(user.id, course.id)
+    client = app.test_client()
+
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        client.get(f'/api/courses/{course.id}')
+    request_us = (time.perf_counter() - start) / REQUESTS * 1e6
+
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        storage.get_course(course.id)
+    call_ns = (time.perf_counter() - start) / CALLS * 1e9
+
+    def work():
+        for _ in range(CALLS // THREADS // 10):
+            storage.update_user(user.id, {'bio': 'x'})
+    threads = [threading.Thread(target=work) for _ in range(THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    threaded_us = (time.perf_counter() - start) / (CALLS // 10) * 1e6
+
+    counted = None
+    if os.environ['METRICS_ENABLED'] == '1':
+        from utils.metrics import storage_seconds
+        series = storage_seconds.labels('update_user')
+        series.fold()
+        counted = sum(series.counts)
+    print(json.dumps({'request_us': request_us, 'call_ns': call_ns, 'threaded_us': threaded_us,
+                      'update_user_count': counted}))
+
+def run(enabled):
+    env = dict(os.environ, METRICS_ENABLED='1' if enabled else '0')
+    out = subprocess.run([sys.executable, __file__, '--child'], env=env, cwd=ROOT,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    off, on = run(False), run(True)
+    print(f"{'measure':<32} {'disabled':>10} {'enabled':>10} {'overhead':>9}")
+    for key, label in [('request_us', 'GET /api/courses/<id> (us)'),
+                       ('call_ns', 'storage.get_course (ns)'),
+                       ('threaded_us', f'update_user, {THREADS} threads (us)')]:
+        print(f"{label:<32} {off[key]:>10.1f} {on[key]:>10.1f} {(on[key] / off[key] - 1) * 100:>8.1f}%")
+    expected = CALLS // THREADS // 10 * THREADS
+    print(f"update_user calls counted: {on['update_user_count']} of {expected}")
+
+if __name__ == '__main__':
+    if '--child' in sys.argv:
+        child()
+    else:
+        main()
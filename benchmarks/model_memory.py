@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Measure the memory held by 1M Progress records with tracemalloc, comparing the
+previous dict-backed class (datetime timestamps, list completion sets) with the
+current slotted one (epoch float timestamps, frozenset completion sets).
+
+Usage: python benchmarks/model_memory.py [count]
+"""
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Progress
+
+COUNT = 1_000_000
+COMPLETED_PER_RECORD = 3
+
+class LegacyProgress:
+    """Progress as it was before slots: instance __dict__ and datetime fields"""
+
+    def __init__(self, user_id: str, course_id: str):
+        self.id = str(uuid.uuid4())
+        self.user_id = user_id
+        self.course_id = course_id
+        self.completed_sections = []
+        self.completed_subsections = []
+        self.quiz_attempts = {}
+        self.current_section_id = None
+        self.current_subsection_id = None
+        self.progress_percentage = 0.0
+        self.total_time_spent = 0
+        self.started_at = datetime.utcnow()
+        self.last_accessed = datetime.utcnow()
+        self.completed_at = None
+
+def measure(cls, count, user_ids, course_ids, subsection_ids):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    records = []
+    for i in range(count):
+        progress = cls(user_ids[i % len(user_ids)], course_ids[i % len(course_ids)])
+        # Half the records have completed some subsections, the rest none yet
+        if i % 2:
+            progress.completed_subsections = type(progress.completed_subsections)(subsection_ids)
+        records.append(progress)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    gc.collect()
+    return current, elapsed
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else COUNT
+    # Shared ids, as real records reference the same users, courses and subsections
+    user_ids = [str(uuid.uuid4()) for _ in range(10_000)]
+    course_ids = [str(uuid.uuid4()) for _ in range(100)]
+    subsection_ids = [str(uuid.uuid4()) for _ in range(COMPLETED_PER_RECORD)]
+    print(f"{count} Progress records, half with {COMPLETED_PER_RECORD} completed subsections")
+    print(f"{'model':>10} {'total MB':>10} {'bytes/record':>14} {'build s':>10}")
+    results = {}
+    for name, cls in [('legacy', LegacyProgress), ('slotted', Progress)]:
+        current, elapsed = measure(cls, count, user_ids, course_ids, subsection_ids)
+        results[name] = current
+        print(f"{name:>10} {current / 1e6:>10.1f} {current / count:>14.0f} {elapsed:>10.2f}")
+    print(f"Saved {1 - results['slotted'] / results['legacy']:.0%}")
+
+if __name__ == '__main__':
+    main()
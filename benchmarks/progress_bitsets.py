@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Complete every lesson of a large course for a set of learners, in random
+order, and read progress back. This compares the previous computation
+(summing subsections over course.sections, then checking the whole section
+with all()) against the cached course outline with completion bitsets.
+
+Usage: python benchmarks/progress_bitsets.py
+"""
+
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.storage import InMemoryStorage
+from models import Course, Section, Subsection, User
+from utils.helpers import calculate_progress_percentage
+
+SECTIONS = 60
+LESSONS_PER_SECTION = 20
+LEARNERS = 50
+
+def build():
+    storage = InMemoryStorage()
+    course = storage.create_course(Course('Usul al-Fiqh', 'Description', 'instructor', 'Fiqh & Jurisprudence'))
+    lessons = []
+    for s in range(SECTIONS):
+        section = storage.create_section(Section(f'Section {s}', 'Description', course.id))
+        for i in range(LESSONS_PER_SECTION):
+            lessons.append(storage.create_subsection(Subsection(f'Lesson {s}.{i}', 'video', section.id)).id)
+    learners = [storage.create_user(User(f'learner{i}', f'learner{i}@example.com', 'x')).id for i in range(LEARNERS)]
+    for user_id in learners:
+        storage.enroll(user_id, course.id)
+    return storage, course.id, lessons, learners
+
+def legacy_complete_subsection(storage, user_id, course_id, subsection_id):
+    """The route logic before outlines, on top of the atomic update"""
+    progress = storage.get_progress(user_id, course_id)
+    subsection = storage.get_subsection(subsection_id)
+    section = storage.get_section(subsection.section_id)
+    if subsection_id in progress.completed_subsections:
+        return progress
+    completed_subsections = progress.completed_subsections | {subsection_id}
+    updates = {'completed_subsections': completed_subsections, 'last_accessed': time.time()}
+    if all(sub.id in completed_subsections for sub in section.subsections):
+        updates['completed_sections'] = progress.completed_sections | {section.id}
+    course = storage.get_course(course_id)
+    total_subsections = sum(len(s.subsections) for s in course.sections)
+    updates['progress_percentage'] = calculate_progress_percentage(completed_subsections, total_subsections)
+    return storage.update_progress(progress.id, updates)
+
+def legacy_percentage(storage, user_id, course_id):
+    progress = storage.get_progress(user_id, course_id)
+    course = storage.get_course(course_id)
+    total_subsections = sum(len(section.subsections) for section in course.sections)
+    return calculate_progress_percentage(progress.completed_subsections, total_subsections)
+
+def outline_percentage(storage, user_id, course_id):
+    progress = storage.get_progress(user_id, course_id)
+    outline = storage.course_outline(course_id)
+    return outline.percentage(storage.completion_mask(progress, outline))
+
+def run(complete, percentage):
+    storage, course_id, lessons, learners = build()
+    orders = []
+    rng = random.Random(7)
+    for _ in learners:
+        order = list(lessons)
+        rng.shuffle(order)
+        orders.append(order)
+
+    start = time.perf_counter()
+    for user_id, order in zip(learners, orders):
+        for subsection_id in order:
+            complete(storage, user_id, course_id, subsection_id)
+    complete_us = (time.perf_counter() - start) / (len(learners) * len(lessons)) * 1e6
+
+    start = time.perf_counter()
+    for _ in range(20):
+        for user_id in learners:
+            assert percentage(storage, user_id, course_id) == 100.0
+    percentage_us = (time.perf_counter() - start) / (20 * len(learners)) * 1e6
+
+    for user_id in learners:
+        progress = storage.get_progress(user_id, course_id)
+        assert len(progress.completed_sections) == SECTIONS
+    return complete_us, percentage_us
+
+def main():
+    logging.disable(logging.CRITICAL)
+    print(f"{SECTIONS} sections x {LESSONS_PER_SECTION} lessons, {LEARNERS} learners")
+    print(f"{'':<10} {'complete lesson us':>19} {'progress % us':>14}")
+    legacy = run(legacy_complete_subsection, legacy_percentage)
+    print(f"{'legacy':<10} {legacy[0]:>19.2f} {legacy[1]:>14.2f}")
+    current = run(lambda storage, *args: storage.complete_subsection(*args), outline_percentage)
+    print(f"{'bitsets':<10} {current[0]:>19.2f} {current[1]:>14.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Replay 500 offline progress events (lesson completions, positions, watch
+time and quiz attempts) through the API two ways: one request per event on
+the individual endpoints, and a single request to the batched sync
+endpoint. Then resend the batch to show that a retry applies nothing twice.
+
+Usage: python benchmarks/progress_sync.py
+       STORAGE_BACKEND=sql DATABASE_URL=sqlite:// python benchmarks/progress_sync.py
+"""
+
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['HEARTBEAT_FLUSH_INTERVAL'] = '0'
+
+from app import app
+from data.storage import storage
+from models import Course, Section, Subsection, Quiz, User
+from utils.auth import issue_token
+
+EVENTS = 500
+SECTIONS = 10
+LESSONS_PER_SECTION = 20
+
+def setup(name):
+    course = storage.create_course(Course(f'Tafsir {name}', 'Description', 'instructor', 'Quran Studies'))
+    lessons = []
+    for s in range(SECTIONS):
+        section = storage.create_section(Section(f'Section {s}', 'Description', course.id))
+        for i in range(LESSONS_PER_SECTION):
+            lessons.append(storage.create_subsection(Subsection(f'Lesson {s}.{i}', 'video', section.id)).id)
+    quiz = storage.create_quiz(Quiz('Review', section.id))
+    user = storage.create_user(User(f'learner-{name}', f'{name}@example.com', 'x'))
+    storage.enroll(user.id, course.id)
+    # Enrolled before going offline, so every queued event is newer
+    progress = storage.get_progress(user.id, course.id)
+    storage.update_progress(progress.id, {'last_accessed': time.time() - 2 * EVENTS})
+    return course.id, lessons, quiz.id, user.id, issue_token(user.id)
+
+def events(course_id, lessons, quiz_id):
+    """A learner's offline queue: mostly completions and positions, some time and quizzes"""
+    now = time.time() - EVENTS
+    queue = []
+    for n in range(EVENTS):
+        lesson = lessons[n // 2 % len(lessons)]
+        kind = ('complete_subsection', 'position', 'time_spent', 'position', 'quiz_attempt')[n % 5]
+        event = {'id': f'evt-{n}', 'type': kind, 'course_id': course_id, 'at': now + n}
+        if kind in ('complete_subsection', 'position'):
+            event['subsection_id'] = lesson
+        elif kind == 'time_spent':
+            event['seconds'] = 60
+        else:
+            event.update(quiz_id=quiz_id, score=80, answers=[1, 2, 3])
+        queue.append(event)
+    return queue
+
+def individually(client, user_id, token, queue):
+    headers = {'Authorization': f'Bearer {token}'}
+    base = f"/api/progress/{user_id}/{queue[0]['course_id']}"
+    minutes = 0
+    for event in queue:
+        kind = event['type']
+        if kind == 'complete_subsection':
+            response = client.post(f"{base}/subsections/{event['subsection_id']}/complete", headers=headers)
+        elif kind == 'position':
+            response = client.put(base, json={'current_subsection_id': event['subsection_id']}, headers=headers)
+        elif kind == 'time_spent':
+            minutes += 1
+            response = client.put(base, json={'total_time_spent': minutes}, headers=headers)
+        else:
+            response = client.post(f"{base}/quizzes/{event['quiz_id']}/attempt",
+                                   json={'score': event['score'], 'answers': event['answers']}, headers=headers)
+        assert response.status_code == 200, response.get_json()
+
+def batched(client, user_id, token, queue):
+    response = client.post(f'/api/progress/{user_id}/sync', json={'events': queue},
+                           headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+def main():
+    logging.disable(logging.CRITICAL)
+    client = app.test_client(use_cookies=False)
+    print(f"{EVENTS} events, {SECTIONS * LESSONS_PER_SECTION} lessons")
+    print(f"{'mode':<22} {'requests':>9} {'total ms':>10} {'us/event':>10}")
+
+    course_id, lessons, quiz_id, user_id, token = setup('single')
+    queue = events(course_id, lessons, quiz_id)
+    start = time.perf_counter()
+    individually(client, user_id, token, queue)
+    elapsed = time.perf_counter() - start
+    print(f"{'one request per event':<22} {EVENTS:>9} {elapsed * 1e3:>10.1f} {elapsed / EVENTS * 1e6:>10.1f}")
+    single = storage.get_progress(user_id, course_id)
+    single_attempts = len(single.quiz_attempts[quiz_id])
+
+    course_id, lessons, quiz_id, user_id, token = setup('batch')
+    queue = events(course_id, lessons, quiz_id)
+    start = time.perf_counter()
+    body = batched(client, user_id, token, queue)
+    elapsed = time.perf_counter() - start
+    print(f"{'one sync request':<22} {1:>9} {elapsed * 1e3:>10.1f} {elapsed / EVENTS * 1e6:>10.1f}")
+
+    start = time.perf_counter()
+    retry = batched(client, user_id, token, queue)
+    elapsed = time.perf_counter() - start
+    print(f"{'sync retry':<22} {1:>9} {elapsed * 1e3:>10.1f} {elapsed / EVENTS * 1e6:>10.1f}")
+
+    merged = storage.get_progress(user_id, course_id)
+    assert all(result['status'] == 'applied' for result in body['results'])
+    assert all(result['status'] == 'duplicate' for result in retry['results'])
+    assert len(merged.completed_subsections) == len(single.completed_subsections)
+    assert merged.progress_percentage == single.progress_percentage
+    assert merged.total_time_spent == single.total_time_spent
+    assert len(merged.quiz_attempts[quiz_id]) == single_attempts
+    assert merged.current_subsection_id == lessons[(EVENTS - 2) // 2 % len(lessons)]
+
+if __name__ == '__main__':
+    main()
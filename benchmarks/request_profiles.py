@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Profile the catalog and progress endpoints over a seeded store. Each request
+is run plain, with a token that does not verify, and with a profile token.
+Then print, per route, the functions most often on top of the stack in the
+kept profiles.
+
+Usage: python benchmarks/request_profiles.py [--threshold-ms 0]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['PROFILE_KEEP'] = '1000'
+
+from app import app
+from config import Config
+from data.storage import storage
+from utils.profiling import PROFILE_HEADER, issue_profile_token, profiles
+from benchmarks.seed_data import seed
+
+ROUNDS = 50
+
+def timed(client, url, headers):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200, (url, response.status_code)
+    return (time.perf_counter() - start) / ROUNDS * 1e3
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threshold-ms', type=float, default=0, help='keep profiles at least this slow')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    Config.PROFILE_THRESHOLD_MS = args.threshold_ms
+
+    manifest = seed(storage, users=500, courses=300, tokens=1)
+    session = manifest['sessions'][0]
+    bearer = {'Authorization': f"Bearer {session['token']}"}
+    client = app.test_client()
+    urls = ['/api/courses?per_page=100', f"/api/progress/{session['user_id']}"]
+
+    print(f"{'endpoint':<48} {'plain ms':>9} {'bad token':>10} {'profiled':>9}")
+    for url in urls:
+        plain = timed(client, url, bearer)
+        rejected = timed(client, url, {**bearer, PROFILE_HEADER: 'p1.bogus.token'})
+        profiled = timed(client, url, {**bearer, PROFILE_HEADER: issue_profile_token(session['user_id'])})
+        print(f"{url[:48]:<48} {plain:>9.2f} {rejected:>10.2f} {profiled:>9.2f}")
+
+    leaves = {}
+    for summary in profiles.list():
+        route_leaves = leaves.setdefault(summary['route'], Counter())
+        for stack, count in profiles.get(summary['id'])['stacks'].items():
+            route_leaves[stack.rsplit(';', 1)[-1]] += count
+    for route, route_leaves in leaves.items():
+        print(f"\n{route}: {sum(route_leaves.values())} samples, top of stack:")
+        for frame, count in route_leaves.most_common(8):
+            print(f"{count:>6}  {frame}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark the inverted search index against a naive substring scan over a
+synthetic 100k-course corpus.
+
+Usage: python benchmarks/search_index.py [courses]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.search import SearchIndex
+from models import Course
+
+WORDS = [
+    "Qur'an", 'Quran', 'Tajweed', 'Recitation', 'Fiqh', 'Salah', 'Zakat', 'Hajj', 'Seerah',
+    'Hadith', 'Sunnah', 'Arabic', 'Grammar', 'Tafsir', 'Aqidah', 'History', 'Ethics',
+    'Finance', 'Sufism', 'Theology', 'Prophet', 'Companions', 'Jurisprudence', 'Beginner',
+    'Advanced', 'Introduction', 'القرآن', 'الفقه', 'السيرة', 'الحديث', 'تجويد', 'العقيدة'
+] + [f'term{i}' for i in range(2000)]
+
+QUERIES = ['quran', 'tajweed recitation', 'القران', 'fiqh salah', 'term42', 'hadith sunnah history']
+
+def synthetic_course(rng):
+    course = Course(
+        ' '.join(rng.choices(WORDS, k=5)),
+        ' '.join(rng.choices(WORDS, k=40)),
+        'instructor',
+        'Quran Studies'
+    )
+    course.tags = rng.choices(WORDS, k=3)
+    return course
+
+def substring_scan(courses, term):
+    term = term.lower()
+    return [c for c in courses if
+            term in c.title.lower() or
+            term in c.description.lower() or
+            any(term in tag.lower() for tag in c.tags)]
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(1)
+    courses = [synthetic_course(rng) for _ in range(size)]
+
+    index = SearchIndex()
+    start = time.perf_counter()
+    for course in courses:
+        index.add(course)
+    print(f"Indexed {size} courses in {time.perf_counter() - start:.2f}s, {len(index.postings)} terms")
+
+    print(f"{'query':<24} {'matches':>8} {'top10 ms':>9} {'all ms':>8} {'scan ms':>8}")
+    for query in QUERIES:
+        start = time.perf_counter()
+        index.search(query, limit=10)
+        top_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        matches = index.search(query)
+        all_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        substring_scan(courses, query)
+        scan_ms = (time.perf_counter() - start) * 1000
+        print(f"{query:<24} {len(matches):>8} {top_ms:>9.2f} {all_ms:>8.2f} {scan_ms:>8.2f}")
+
+    # Incremental maintenance
+    start = time.perf_counter()
+    for course in courses[:1000]:
+        course.title = course.title + ' Updated'
+        index.add(course)
+    for course in courses[1000:2000]:
+        index.remove(course.id)
+    print(f"1000 updates + 1000 deletes in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Seed a storage backend with synthetic platform data for load tests:
+instructors and students, published courses with section/subsection trees,
+enrollments with partial progress, and reviews. Returns (and can write) a
+manifest of the ids and bearer tokens a load generator needs.
+
+The data is reproducible for a given --seed, apart from the uuids.
+
+Usage: python benchmarks/seed_data.py [--users N] [--courses M] [--manifest path]
+       STORAGE_BACKEND=sql DATABASE_URL=sqlite:////tmp/load.db python benchmarks/seed_data.py
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from models import Course, Section, Subsection, User, Review
+from utils.auth import issue_token
+from utils.helpers import hash_password
+
+PASSWORD = 'LoadTest123'
+
+TOPICS = ['Tajweed', 'Seerah', 'Aqeedah', 'Fiqh of Salah', 'Hadith Sciences', 'Tafsir',
+          'Classical Arabic', 'Islamic Finance', 'Adab', 'Usul al-Fiqh']
+
+def seed(storage, users: int = 1000, courses: int = 50, instructors: int = 10,
+         enrollments_per_user: int = 3, review_rate: float = 0.2, tokens: int = 200,
+         rng_seed: int = 7) -> dict:
+    """Create the data set and return its manifest"""
+    rng = random.Random(rng_seed)
+    password_hash = hash_password(PASSWORD)  # one hash: hashing cost belongs to the login scenario
+
+    people = [User(f'instructor{i}', f'instructor{i}@load.test', password_hash, 'instructor')
+              for i in range(instructors)]
+    people += [User(f'student{i}', f'student{i}@load.test', password_hash) for i in range(users)]
+    storage.bulk_create(people)
+    teachers, students = people[:instructors], people[instructors:]
+
+    content = []
+    catalog = []
+    for i in range(courses):
+        topic = TOPICS[i % len(TOPICS)]
+        course = Course(f'{topic} {i}', f'A structured course on {topic.lower()} for students of knowledge.',
+                        teachers[i % len(teachers)].id, rng.choice(Config.COURSE_CATEGORIES))
+        course.level = rng.choice(Config.COURSE_LEVELS)
+        course.tags = rng.sample(TOPICS, 3)
+        course.published = True
+        course.is_free = rng.random() < 0.3
+        course.access_type = 'free' if course.is_free else 'paid'
+        course.price = 0.0 if course.is_free else float(rng.choice([19, 29, 49, 79]))
+        content.append(course)
+        lessons = []
+        for s in range(rng.randint(3, 12)):
+            section = Section(f'Unit {s + 1}', f'Unit {s + 1} of {topic}', course.id)
+            section.order = s
+            content.append(section)
+            for n in range(rng.randint(3, 15)):
+                kind = rng.choices(['video', 'text', 'pdf'], weights=[7, 2, 1])[0]
+                subsection = Subsection(f'Lesson {s + 1}.{n + 1}', kind, section.id)
+                subsection.order = n
+                subsection.duration = rng.randint(5, 45)
+                if kind == 'video':
+                    subsection.video_url = f'https://cdn.load.test/{course.id}/{subsection.id}.mp4'
+                if s == 0 and n < 2:
+                    subsection.is_preview = True
+                    subsection.preview_duration = 300
+                content.append(subsection)
+                lessons.append(subsection.id)
+        catalog.append({'id': course.id, 'subsections': lessons})
+    storage.bulk_create(content)
+
+    now = time.time()
+    reviews = []
+    enrolled = {}
+    for student in students:
+        enrolled[student.id] = []
+        for entry in rng.sample(catalog, min(enrollments_per_user, len(catalog))):
+            progress = storage.enroll(student.id, entry['id'])
+            if not progress:
+                continue
+            enrolled[student.id].append(entry['id'])
+            # Learners are spread from just started to finished
+            done = entry['subsections'][:rng.randint(0, len(entry['subsections']))]
+            if done:
+                outline = storage.course_outline(entry['id'])
+                percentage = outline.percentage(outline.mask(done))
+                storage.update_progress(progress.id, {
+                    'completed_subsections': frozenset(done),
+                    'current_subsection_id': done[-1],
+                    'progress_percentage': percentage,
+                    'total_time_spent': rng.randint(5, 600),
+                    'last_accessed': now - rng.uniform(0, 30 * 86400),
+                    'completed_at': now if percentage >= 100 else None
+                })
+            if rng.random() < review_rate:
+                reviews.append(Review(student.id, entry['id'], rng.choices(range(1, 6), weights=[1, 1, 3, 8, 12])[0],
+                                      'Beneficial and well structured, jazakAllahu khayran.'))
+    storage.bulk_create(reviews)
+
+    # Sessions for the authenticated scenarios; logins are measured separately
+    sessions = [{'user_id': student.id, 'token': issue_token(student.id), 'courses': enrolled[student.id]}
+                for student in students[:tokens]]
+
+    return {
+        'password': PASSWORD,
+        'emails': [student.email for student in students],
+        'courses': catalog,
+        'sessions': sessions,
+        'counts': {
+            'users': len(people),
+            'courses': len(catalog),
+            'subsections': sum(len(entry['subsections']) for entry in catalog),
+            'enrollments': sum(len(course_ids) for course_ids in enrolled.values()),
+            'reviews': len(reviews)
+        }
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--courses', type=int, default=50)
+    parser.add_argument('--enrollments', type=int, default=3, help='courses per student')
+    parser.add_argument('--tokens', type=int, default=200, help='students given a bearer token')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--manifest', help='write the manifest JSON here')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    from data.storage import storage
+    start = time.perf_counter()
+    manifest = seed(storage, args.users, args.courses, enrollments_per_user=args.enrollments,
+                    tokens=args.tokens, rng_seed=args.seed)
+    elapsed = time.perf_counter() - start
+    if args.manifest:
+        with open(args.manifest, 'w') as f:
+            json.dump(manifest, f)
+    print(json.dumps({'seconds': round(elapsed, 2), **manifest['counts']}))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Issue millions of session tokens against the expiring session store, then
+measure memory, lookup latency and the cost of reaping the expired ones.
+The clock is simulated so expiry happens without waiting.
+
+Usage: python benchmarks/session_store.py [tokens]
+"""
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.sessions import SessionStore
+from utils.helpers import generate_token
+
+TOKENS = 5_000_000
+USERS = 500_000
+LOOKUPS = 200_000
+IDLE_TTL = 3600
+ISSUE_WINDOW = 4 * 3600  # logins spread over four hours
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else TOKENS
+    random.seed(3)
+    clock = Clock()
+    store = SessionStore(IDLE_TTL, 30 * 24 * 3600, max_per_user=10, clock=clock)
+    user_ids = [f'user-{i}' for i in range(USERS)]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    tokens = []
+    for i in range(count):
+        clock.now = i * ISSUE_WINDOW / count
+        token = generate_token()
+        store.create(token, user_ids[i % USERS])
+        tokens.append(token)
+    issue_s = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"Issued {count} tokens in {issue_s:.1f}s, {len(store)} live after per-user caps")
+    print(f"Memory: {current / 1e6:.0f} MB ({current / count:.0f} bytes/token, token list included)")
+
+    sample = random.sample(tokens, LOOKUPS)
+    start = time.perf_counter()
+    for token in sample:
+        store.get(token)
+    lookup_us = (time.perf_counter() - start) / LOOKUPS * 1e6
+    print(f"Lookup: {lookup_us:.2f}us")
+
+    # Every reap only touches the sessions that expired since the last one
+    for minutes in [1, 5, 60]:
+        clock.now += minutes * 60
+        start = time.perf_counter()
+        removed = store.reap()
+        print(f"Reap after +{minutes}m: {removed} expired in {(time.perf_counter() - start) * 1000:.1f}ms, "
+              f"{len(store)} live")
+
+if __name__ == '__main__':
+    main()
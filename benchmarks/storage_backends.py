@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Run the same request mix against the in-memory and SQL (SQLite) storage
+backends through the Flask test client and compare latencies.
+
+Usage: python benchmarks/storage_backends.py [requests]
+Each backend runs in its own process because the backend is chosen at import time.
+"""
+
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+COURSES = 200
+SECTIONS = 5
+SUBSECTIONS = 6
+STUDENTS = 50
+
+def seed(storage):
+    """Seed courses with a section tree and some enrolled students, in one batch"""
+    from models import Course, Section, Subsection
+    items, courses, subsections = [], [], {}
+    for i in range(COURSES):
+        course = Course(f'Course {i}', 'Learn the fundamentals', 'instructor', 'Quran Studies')
+        course.published = True
+        items.append(course)
+        courses.append(course)
+        subsections[course.id] = []
+        for j in range(SECTIONS):
+            section = Section(f'Section {j}', 'Section description', course.id)
+            section.order = j
+            items.append(section)
+            for k in range(SUBSECTIONS):
+                subsection = Subsection(f'Lesson {k}', 'video', section.id)
+                subsection.order = k
+                items.append(subsection)
+                subsections[course.id].append(subsection.id)
+    storage.bulk_create(items)
+    return courses, subsections
+
+def run_mix(total_requests):
+    logging.disable(logging.CRITICAL)
+    from app import app
+    from data.storage import storage
+    from utils.helpers import generate_token, hash_password
+    from models import User
+
+    courses, subsections = seed(storage)
+    students = []
+    for i in range(STUDENTS):
+        user = storage.create_user(User(f'student{i}', f'student{i}@example.com', hash_password('x')))
+        token = generate_token()
+        storage.create_session(token, user.id)
+        students.append((user, token))
+        for course in random.sample(courses, 3):
+            storage.enroll(user.id, course.id)
+
+    client = app.test_client(use_cookies=False)
+    rng = random.Random(3)
+    latencies = {}
+    for _ in range(total_requests):
+        user, token = rng.choice(students)
+        headers = {'Authorization': f'Bearer {token}'}
+        course_id = rng.choice(storage.get_user(user.id).enrolled_courses)
+        roll = rng.random()
+        if roll < 0.3:
+            name, call = 'catalog', lambda: client.get('/api/courses')
+        elif roll < 0.6:
+            name, call = 'course_detail', lambda: client.get(f'/api/courses/{course_id}')
+        elif roll < 0.8:
+            name, call = 'progress_get', lambda: client.get(f'/api/progress/{user.id}/{course_id}', headers=headers)
+        else:
+            subsection_id = rng.choice(subsections[course_id])
+            name, call = 'complete', lambda: client.post(
+                f'/api/progress/{user.id}/{course_id}/subsections/{subsection_id}/complete', headers=headers)
+        start = time.perf_counter()
+        call()
+        latencies.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+
+    return {name: {'count': len(values),
+                   'p50_ms': statistics.median(values),
+                   'p95_ms': statistics.quantiles(values, n=20)[-1] if len(values) > 1 else values[0]}
+            for name, values in latencies.items()}
+
+def main():
+    total_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    if os.environ.get('BENCH_CHILD'):
+        print(json.dumps(run_mix(total_requests)))
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend, extra_env in [
+            ('memory', {'STORAGE_BACKEND': 'memory'}),
+            ('sqlite', {'STORAGE_BACKEND': 'sql', 'DATABASE_URL': f'sqlite:///{tmp}/bench.db'})
+        ]:
+            env = dict(os.environ, BENCH_CHILD='1', **extra_env)
+            output = subprocess.run([sys.executable, __file__, str(total_requests)],
+                                    env=env, cwd=ROOT, check=True, capture_output=True, text=True)
+            results[backend] = json.loads(output.stdout.strip().splitlines()[-1])
+
+    print(f"{'endpoint':<16} {'backend':<8} {'count':>6} {'p50 ms':>8} {'p95 ms':>8}")
+    for name in sorted(results['memory']):
+        for backend in results:
+            row = results[backend].get(name)
+            if row:
+                print(f"{name:<16} {backend:<8} {row['count']:>6} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f}")
+
+if __name__ == '__main__':
+    main()
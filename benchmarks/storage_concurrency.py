@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Hammer InMemoryStorage from several threads: quiz attempts and subsection
+completions on shared and distinct progress records, plus enroll/unenroll
+churn. Checks that no update is lost and the course aggregates still match a
+full recount, and reports throughput with striped locks and with one stripe.
+Then runs quiz attempts and completions on one shared progress record against
+SQLStorage on a SQLite file, where FOR UPDATE is not available.
+
+Usage: python benchmarks/storage_concurrency.py
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.locks import LockStripes
+from data.storage import InMemoryStorage
+from data.sql_storage import SQLStorage
+from models import Course, Section, Subsection, User
+
+THREAD_COUNTS = (1, 2, 4, 8)
+OPS_PER_THREAD = 4_000
+SUBSECTIONS = 50
+SQL_THREADS = 4
+SQL_OPS_PER_THREAD = 100
+
+def build(stripes: int):
+    storage = InMemoryStorage()
+    storage._progress_locks = LockStripes(stripes)
+    course = storage.create_course(Course('Course', 'Description', 'instructor', 'Fiqh'))
+    section = storage.create_section(Section('Section', 'Description', course.id))
+    subsection_ids = [
+        storage.create_subsection(Subsection(f'Lesson {i}', 'text', section.id)).id
+        for i in range(SUBSECTIONS)
+    ]
+    shared_user = storage.create_user(User('shared', 'shared@example.com', 'x'))
+    storage.enroll(shared_user.id, course.id)
+    users = [storage.create_user(User(f'user{i}', f'user{i}@example.com', 'x')) for i in range(max(THREAD_COUNTS))]
+    for user in users:
+        storage.enroll(user.id, course.id)
+    return storage, course, subsection_ids, shared_user, users
+
+def run(stripes: int, threads: int):
+    storage, course, subsection_ids, shared_user, users = build(stripes)
+    shared = storage.get_progress(shared_user.id, course.id)
+    churn_user = storage.create_user(User('churn', 'churn@example.com', 'x'))
+    barrier = threading.Barrier(threads)
+
+    def worker(i):
+        own = storage.get_progress(users[i].id, course.id)
+        barrier.wait()
+        for n in range(OPS_PER_THREAD):
+            kind = n % 4
+            if kind == 0:
+                storage.record_quiz_attempt(shared.id, 'quiz', {'thread': i, 'n': n})
+            elif kind == 1:
+                storage.record_quiz_attempt(own.id, 'quiz', {'n': n})
+            elif kind == 2:
+                storage.complete_subsection(users[i].id, course.id, subsection_ids[n // 4 % SUBSECTIONS])
+            elif i == 0:
+                storage.complete_subsection(shared_user.id, course.id, subsection_ids[n // 4 % SUBSECTIONS])
+            else:
+                storage.enroll(churn_user.id, course.id) if n % 8 == 3 else storage.unenroll(churn_user.id, course.id)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    expected_shared = threads * OPS_PER_THREAD // 4
+    shared_attempts = len(storage.get_progress(shared_user.id, course.id).quiz_attempts['quiz'])
+    assert shared_attempts == expected_shared, f'lost {expected_shared - shared_attempts} shared attempts'
+    for user in users[:threads]:
+        progress = storage.get_progress(user.id, course.id)
+        assert len(progress.quiz_attempts['quiz']) == OPS_PER_THREAD // 4, 'lost attempts'
+        assert progress.progress_percentage == 100.0, progress.progress_percentage
+    assert storage.check_course_stats() == {}, storage.check_course_stats()
+    return threads * OPS_PER_THREAD / elapsed
+
+def run_sqlite():
+    with tempfile.TemporaryDirectory() as directory:
+        storage = SQLStorage(f"sqlite:///{os.path.join(directory, 'concurrency.db')}")
+        course = storage.create_course(Course('Course', 'Description', 'instructor', 'Fiqh'))
+        section = storage.create_section(Section('Section', 'Description', course.id))
+        subsection_ids = [
+            storage.create_subsection(Subsection(f'Lesson {i}', 'text', section.id)).id
+            for i in range(SQL_THREADS * SQL_OPS_PER_THREAD // 2)
+        ]
+        user = storage.create_user(User('shared', 'shared@example.com', 'x'))
+        shared = storage.enroll(user.id, course.id)
+        barrier = threading.Barrier(SQL_THREADS)
+
+        def worker(i):
+            barrier.wait()
+            for n in range(SQL_OPS_PER_THREAD):
+                storage.record_quiz_attempt(shared.id, 'quiz', {'thread': i, 'n': n})
+                if n % 2:
+                    storage.complete_subsection(user.id, course.id, subsection_ids[i * SQL_OPS_PER_THREAD // 2 + n // 2])
+
+        pool = [threading.Thread(target=worker, args=(i,)) for i in range(SQL_THREADS)]
+        start = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        progress = storage.get_progress(user.id, course.id)
+        expected = SQL_THREADS * SQL_OPS_PER_THREAD
+        attempts = len(progress.quiz_attempts['quiz'])
+        assert attempts == expected, f'lost {expected - attempts} of {expected} attempts'
+        assert len(progress.completed_subsections) == len(subsection_ids), 'lost completions'
+        assert progress.progress_percentage == 100.0, progress.progress_percentage
+        storage.engine.dispose()
+        return expected * 1.5 / elapsed
+
+def main():
+    logging.disable(logging.CRITICAL)
+    print(f"{'threads':>7} {'ops/s (64 stripes)':>19} {'ops/s (1 stripe)':>17}")
+    for threads in THREAD_COUNTS:
+        striped = run(64, threads)
+        single = run(1, threads)
+        print(f"{threads:>7} {striped:>19,.0f} {single:>17,.0f}")
+    print("no lost updates; course stats match a full recount")
+    ops = run_sqlite()
+    print(f"sqlite: {SQL_THREADS} threads, {ops:,.0f} ops/s on one progress record, no lost updates")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for InMemoryStorage secondary-index lookups.
+Lookup time should stay flat as the number of stored records grows.
+
+Usage: python benchmarks/storage_lookups.py
+"""
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.storage import InMemoryStorage
+from models import User, Progress
+
+SIZES = [1_000, 10_000, 100_000]
+COURSES = 50
+LOOKUPS = 10_000
+
+def build_storage(n_users):
+    """Build a storage with n_users users, each enrolled in two courses"""
+    storage = InMemoryStorage()
+    course_ids = [f'course-{i}' for i in range(COURSES)]
+    users = []
+    for i in range(n_users):
+        user = User(f'user{i}', f'user{i}@example.com', 'x')
+        storage.create_user(user)
+        users.append(user)
+        for course_id in random.sample(course_ids, 2):
+            storage.create_progress(Progress(user.id, course_id))
+    return storage, users
+
+def main():
+    random.seed(42)
+    print(f"{'records':>10} {'by_email':>12} {'by_username':>12} {'progress':>12} {'user_progress':>14}")
+    for n in SIZES:
+        storage, users = build_storage(n)
+        sample = [random.choice(users) for _ in range(LOOKUPS)]
+        pairs = [(u.id, storage.get_user_progress(u.id)[0].course_id) for u in sample]
+
+        def per_op(stmt):
+            return timeit.timeit(stmt, number=1) / LOOKUPS * 1e6
+
+        email = per_op(lambda: [storage.get_user_by_email(u.email) for u in sample])
+        username = per_op(lambda: [storage.get_user_by_username(u.username) for u in sample])
+        progress = per_op(lambda: [storage.get_progress(uid, cid) for uid, cid in pairs])
+        user_progress = per_op(lambda: [storage.get_user_progress(u.id) for u in sample])
+        print(f"{n:>10} {email:>10.2f}us {username:>10.2f}us {progress:>10.2f}us {user_progress:>12.2f}us")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Measure how long DurableStorage takes to restore progress records, first by
+replaying the write-ahead log and then from a compacted snapshot.
+
+Usage: python benchmarks/wal_recovery.py [progress_records]
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.persistence import DurableStorage
+from models import Progress
+
+BATCH = 10_000
+COURSES = 1_000
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+def recover(directory):
+    start = time.perf_counter()
+    storage = DurableStorage(directory, fsync='off', snapshot_interval=None)
+    elapsed = time.perf_counter() - start
+    return storage, elapsed
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as directory:
+        storage = DurableStorage(directory, fsync='batch', snapshot_interval=None)
+        start = time.perf_counter()
+        for offset in range(0, total, BATCH):
+            storage.bulk_create(
+                Progress(f'user-{i}', f'course-{i % COURSES}')
+                for i in range(offset, min(offset + BATCH, total))
+            )
+        storage.close()
+        print(f"Wrote {total} progress records in {time.perf_counter() - start:.2f}s "
+              f"({directory_size(directory) / 1e6:.1f} MB of WAL)")
+
+        storage, elapsed = recover(directory)
+        assert len(storage.progress) == total
+        print(f"Recovered from WAL in {elapsed:.2f}s")
+
+        start = time.perf_counter()
+        storage.snapshot()
+        print(f"Snapshot written in {time.perf_counter() - start:.2f}s "
+              f"({directory_size(directory) / 1e6:.1f} MB on disk)")
+        storage.close()
+
+        storage, elapsed = recover(directory)
+        assert len(storage.progress) == total
+        print(f"Recovered from snapshot in {elapsed:.2f}s")
+        storage.close()
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,91 @@ class Config:
     SECRET_KEY = os.environ.get('SESSION_SECRET', 'dev-secret-key-change-in-production')
     DEBUG = True
     
+    # Storage backend: 'memory' or 'sql'
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'memory')
+    DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///islamic_courses.db')
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    
+    # Write-ahead log and snapshots for the in-memory backend (disabled unless a directory is set)
+    PERSISTENCE_DIR = os.environ.get('PERSISTENCE_DIR')
+    WAL_FSYNC = os.environ.get('WAL_FSYNC', 'batch')  # 'always', 'batch' or 'off'
+    WAL_GROUP_COMMIT_MS = float(os.environ.get('WAL_GROUP_COMMIT_MS', 5))
+    SNAPSHOT_INTERVAL = float(os.environ.get('SNAPSHOT_INTERVAL', 300))  # seconds
+    
+    # Bearer tokens: 'session' (opaque, revocable) or 'signed' (stateless HMAC, expire only)
+    AUTH_TOKENS = os.environ.get('AUTH_TOKENS', 'session')
+    TOKEN_SIGNING_KEY = os.environ.get('TOKEN_SIGNING_KEY')  # defaults to SECRET_KEY
+    SIGNED_TOKEN_TTL = float(os.environ.get('SIGNED_TOKEN_TTL', 24 * 3600))  # seconds
+    
+    # Password hashing: werkzeug method string, and a bounded pool (0 workers hashes inline)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    HASH_WORKERS = int(os.environ.get('HASH_WORKERS', os.cpu_count() or 1))
+    HASH_QUEUE_DEPTH = int(os.environ.get('HASH_QUEUE_DEPTH', 32))
+    
+    # Watch-time heartbeats: coalescing buffer size, flush period and idle cut-off
+    HEARTBEAT_MAX_KEYS = int(os.environ.get('HEARTBEAT_MAX_KEYS', 100_000))
+    HEARTBEAT_FLUSH_INTERVAL = float(os.environ.get('HEARTBEAT_FLUSH_INTERVAL', 5))  # seconds
+    HEARTBEAT_IDLE_TTL = float(os.environ.get('HEARTBEAT_IDLE_TTL', 600))  # seconds
+    HEARTBEAT_MAX_SECONDS = int(os.environ.get('HEARTBEAT_MAX_SECONDS', 60))  # largest credit per heartbeat
+    SYNC_MAX_EVENTS = int(os.environ.get('SYNC_MAX_EVENTS', 1000))  # events per sync request
+    SYNC_EVENT_MEMORY = int(os.environ.get('SYNC_EVENT_MEMORY', 1000))  # applied event ids kept per progress record
+    
+    # Number of striped locks guarding in-memory progress records
+    LOCK_STRIPES = int(os.environ.get('LOCK_STRIPES', 64))
+    
+    # Login sessions: sliding idle expiry, absolute lifetime and per-user cap
+    SESSION_IDLE_TTL = float(os.environ.get('SESSION_IDLE_TTL', 24 * 3600))  # seconds
+    SESSION_ABSOLUTE_TTL = float(os.environ.get('SESSION_ABSOLUTE_TTL', 30 * 24 * 3600))  # seconds
+    SESSION_MAX_PER_USER = int(os.environ.get('SESSION_MAX_PER_USER', 10))
+    SESSION_REAP_INTERVAL = float(os.environ.get('SESSION_REAP_INTERVAL', 60))  # seconds
+    
+    # Course deletes: records removed inline, and beyond that a tombstone swept in batches
+    CASCADE_SYNC_LIMIT = int(os.environ.get('CASCADE_SYNC_LIMIT', 10_000))
+    TOMBSTONE_SWEEP_INTERVAL = float(os.environ.get('TOMBSTONE_SWEEP_INTERVAL', 1))  # seconds
+    TOMBSTONE_SWEEP_BATCH = int(os.environ.get('TOMBSTONE_SWEEP_BATCH', 1000))  # records per lock hold
+    
+    # Logging: root level, 'json' or 'text' lines, written by a listener thread unless LOG_ASYNC is off
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+    LOG_ASYNC = os.environ.get('LOG_ASYNC', '1').lower() not in ('0', 'false', 'no', 'off')
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10_000))  # records; more are dropped, not waited on
+    LOG_SAMPLING = os.environ.get('LOG_SAMPLING', '')  # e.g. 'routes.progress=0.01,werkzeug=0.1'
+    
+    # Request and storage metrics on /metrics (nothing is installed when off); scrapers send
+    # METRICS_TOKEN as a bearer token, otherwise only signed-in admins can read it
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '0').lower() not in ('0', 'false', 'no', 'off')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+    
+    # Sampling profiles of slow requests: picked by X-Profile-Token or at random, kept above the threshold
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))  # fraction of requests
+    PROFILE_THRESHOLD_MS = float(os.environ.get('PROFILE_THRESHOLD_MS', 200))
+    PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', 1))
+    PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', 20))
+    PROFILE_TOKEN_TTL = float(os.environ.get('PROFILE_TOKEN_TTL', 3600))  # seconds
+    
+    # Cache-Control max-age for anonymous catalog responses, and for ones that change only on deploy
+    CATALOG_CACHE_MAX_AGE = int(os.environ.get('CATALOG_CACHE_MAX_AGE', 60))  # seconds
+    STATIC_CACHE_MAX_AGE = int(os.environ.get('STATIC_CACHE_MAX_AGE', 3600))  # seconds
+    
+    # Upper bound on memoized course serializations, measured as encoded JSON
+    COURSE_CACHE_MAX_BYTES = int(os.environ.get('COURSE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    
+    # Compiled per-course access policies kept in memory
+    ACCESS_POLICY_CACHE_SIZE = int(os.environ.get('ACCESS_POLICY_CACHE_SIZE', 1024))
+    
+    # Local media: video URLs under MEDIA_URL_PREFIX are files in MEDIA_ROOT, streamed with signed tokens
+    MEDIA_ROOT = os.environ.get('MEDIA_ROOT')
+    MEDIA_URL_PREFIX = os.environ.get('MEDIA_URL_PREFIX', '/media/')
+    STREAM_TOKEN_TTL = float(os.environ.get('STREAM_TOKEN_TTL', 3600))  # seconds
+    MEDIA_CHUNK_SIZE = int(os.environ.get('MEDIA_CHUNK_SIZE', 256 * 1024))
+    
+    # JSON responses: encoder ('auto', 'orjson' or 'json') and compression
+    JSON_ENCODER = os.environ.get('JSON_ENCODER', 'auto')
+    COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', 1024))
+    GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+    BROTLI_LEVEL = int(os.environ.get('BROTLI_LEVEL', 5))
+    
     # Islamic course categories
     COURSE_CATEGORIES = [
         'Quran Studies',
@@ -0,0 +1,168 @@
+"""
+Compiled per-course access policy.
+
+Access used to be derived on every check by scanning course.enrolled_students
+and preview_config['free_subsections'] lists. A CoursePolicy turns them into
+frozensets and precomputes each subsection's preview decision, and it is
+cached by Course.version. Storage bumps the version on any change to the
+course, its content or its enrollments, so a policy is valid exactly while
+the version matches.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+import threading
+
+from config import Config
+from utils.responses import encode_json
+
+STAFF_ROLES = frozenset(('admin', 'instructor'))
+DEFAULT_PREVIEW_DURATION = 300  # seconds
+
+class SubsectionPolicy:
+    __slots__ = ('id', 'section_id', 'is_preview', 'preview_duration', 'full_duration')
+
+    def __init__(self, subsection, free_subsections: frozenset, open_sections: frozenset,
+                 default_preview_duration: int):
+        self.id = subsection.id
+        self.section_id = subsection.section_id
+        # Every lesson of an open section is previewable, so the section and its lessons agree
+        self.is_preview = (
+            subsection.section_id in open_sections or
+            subsection.id in free_subsections or
+            subsection.access_level == 'free' or
+            subsection.is_preview
+        )
+        self.preview_duration = subsection.preview_duration or default_preview_duration
+        self.full_duration = subsection.duration * 60  # minutes to seconds
+
+class CoursePolicy:
+    __slots__ = ('course_id', 'version', 'is_free', 'enrolled', 'free_sections', 'free_subsections',
+                 'open_sections', 'preview_duration', 'subsections', '_trees')
+
+    def __init__(self, course):
+        preview_config = course.preview_config
+        self.course_id = course.id
+        self.version = course.version
+        self.is_free = bool(course.is_free or course.access_type == 'free')
+        self.enrolled = frozenset(course.enrolled_students)
+        self.free_sections = frozenset(preview_config.get('free_sections', ()))
+        self.free_subsections = frozenset(preview_config.get('free_subsections', ()))
+        self.preview_duration = preview_config.get('preview_duration', DEFAULT_PREVIEW_DURATION)
+        # Sections open to preview: listed as free, or marked free or preview themselves
+        self.open_sections = self.free_sections | frozenset(
+            section.id for section in course.sections if section.access_level == 'free' or section.is_preview
+        )
+        self.subsections: Dict[str, SubsectionPolicy] = {
+            subsection.id: SubsectionPolicy(subsection, self.free_subsections, self.open_sections,
+                                            self.preview_duration)
+            for section in course.sections for subsection in section.subsections
+        }
+        self._trees = self._compile_trees(course)
+
+    def is_enrolled(self, user) -> bool:
+        return user is not None and user.id in self.enrolled
+
+    def has_full_access(self, user) -> bool:
+        """Enrolled students, staff and everyone signed in to a free course"""
+        if user is None:
+            return False
+        return self.is_free or user.role in STAFF_ROLES or user.id in self.enrolled
+
+    def can_preview(self, subsection) -> bool:
+        compiled = self.subsections.get(subsection.id)
+        if compiled is not None:
+            return compiled.is_preview
+        return SubsectionPolicy(subsection, self.free_subsections, self.open_sections,
+                                self.preview_duration).is_preview
+
+    def _compile_trees(self, course) -> Tuple[bytes, bytes]:
+        """Encoded section/subsection decisions for (preview, full) access"""
+        trees = []
+        for full in (False, True):
+            sections = []
+            for section in course.sections:
+                subsections = [self._subsection_entry(subsection, full) for subsection in section.subsections]
+                section_open = full or section.id in self.open_sections
+                sections.append({
+                    'id': section.id,
+                    'title': section.title,
+                    'order': section.order,
+                    'can_access': section_open or any(entry['can_access'] for entry in subsections),
+                    'access_type': 'full' if full else ('preview' if section_open else 'locked'),
+                    'subsections': subsections
+                })
+            trees.append(encode_json(sections))
+        return trees[0], trees[1]
+
+    def _subsection_entry(self, subsection, full: bool) -> Dict[str, Any]:
+        compiled = self.subsections[subsection.id]
+        if full:
+            access_type, available_duration = 'full', compiled.full_duration
+        elif compiled.is_preview:
+            access_type, available_duration = 'preview', compiled.preview_duration
+        else:
+            access_type, available_duration = 'locked', 0
+        return {
+            'id': subsection.id,
+            'title': subsection.title,
+            'content_type': subsection.content_type,
+            'order': subsection.order,
+            'duration': subsection.duration,
+            'can_access': access_type != 'locked',
+            'access_type': access_type,
+            'available_duration': available_duration
+        }
+
+    def tree_json(self, full: bool) -> bytes:
+        """Encoded list of sections with the access decision for every subsection"""
+        return self._trees[1 if full else 0]
+
+class AccessPolicyCache:
+    """LRU of compiled course policies, validated against Course.version"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, CoursePolicy]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, course) -> CoursePolicy:
+        with self._lock:
+            policy = self._entries.get(course.id)
+            if policy is not None and policy.version == course.version:
+                self._entries.move_to_end(course.id)
+                self.hits += 1
+                return policy
+            self.misses += 1
+
+        # Compile outside the lock; the version is read first, so a concurrent
+        # change leaves a stale version behind and forces a recompile
+        policy = CoursePolicy(course)
+        with self._lock:
+            self._entries[course.id] = policy
+            self._entries.move_to_end(course.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return policy
+
+    def invalidate(self, course_id: str):
+        with self._lock:
+            self._entries.pop(course_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+access_policies = AccessPolicyCache(Config.ACCESS_POLICY_CACHE_SIZE)
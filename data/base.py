@@ -0,0 +1,74 @@
+"""
+Storage interface shared by the in-memory and SQL backends.
+Routes only talk to storage through these methods.
+"""
+from typing import Any, Callable, ContextManager, Dict, Iterable, List, Optional, Protocol, Tuple
+from models import User, Course, Section, Subsection, Quiz, Progress, Review
+from data.course_stats import CourseStats
+from data.outline import CourseOutline
+
+class Storage(Protocol):
+    # Users
+    def create_user(self, user: User) -> User: ...
+    def get_user(self, user_id: str) -> Optional[User]: ...
+    def get_users(self, filters: dict = None) -> List[User]: ...
+    def get_user_page(self, filters: dict, per_page: int, page: int = 1,
+                      after: Optional[str] = None) -> Optional[Dict[str, Any]]: ...
+    def get_user_by_email(self, email: str) -> Optional[User]: ...
+    def get_user_by_username(self, username: str) -> Optional[User]: ...
+    def update_user(self, user_id: str, updates: dict) -> Optional[User]: ...
+    def delete_user(self, user_id: str) -> bool: ...
+
+    # Courses
+    def create_course(self, course: Course) -> Course: ...
+    def get_course(self, course_id: str) -> Optional[Course]: ...
+    def get_course_versions(self, course_id: str) -> Optional[Tuple[int, int]]: ...
+    def get_courses(self, filters: dict = None) -> List[Course]: ...
+    def get_course_page(self, filters: dict, per_page: int, page: int = 1,
+                        after: Optional[str] = None) -> Optional[Dict[str, Any]]: ...
+    def get_course_facets(self, filters: dict = None) -> Dict[str, Any]: ...
+    def update_course(self, course_id: str, updates: dict) -> Optional[Course]: ...
+    def delete_course(self, course_id: str) -> bool: ...
+
+    # Enrollment and statistics
+    def enroll(self, user_id: str, course_id: str) -> Optional[Progress]: ...
+    def unenroll(self, user_id: str, course_id: str) -> bool: ...
+    def get_course_stats(self, course_id: str) -> CourseStats: ...
+    def check_course_stats(self) -> Dict[str, List[str]]: ...
+    def integrity_report(self) -> Dict[str, Any]: ...
+    def sweep_tombstones(self, batch_size: int = None) -> int: ...
+
+    # Course content
+    def create_section(self, section: Section) -> Section: ...
+    def get_section(self, section_id: str) -> Optional[Section]: ...
+    def get_sections_by_course(self, course_id: str) -> List[Section]: ...
+    def create_subsection(self, subsection: Subsection) -> Subsection: ...
+    def get_subsection(self, subsection_id: str) -> Optional[Subsection]: ...
+    def create_quiz(self, quiz: Quiz) -> Quiz: ...
+    def get_quiz(self, quiz_id: str) -> Optional[Quiz]: ...
+
+    # Progress and reviews
+    def create_progress(self, progress: Progress) -> Progress: ...
+    def get_progress(self, user_id: str, course_id: str) -> Optional[Progress]: ...
+    def get_user_progress(self, user_id: str) -> List[Progress]: ...
+    def update_progress(self, progress_id: str, updates: dict) -> Optional[Progress]: ...
+    def modify_progress(self, user_id: str, course_id: str,
+                        modify: Callable[[Progress], dict]) -> Optional[Progress]: ...
+    def record_quiz_attempt(self, progress_id: str, quiz_id: str, attempt: dict) -> Optional[Progress]: ...
+    def complete_subsection(self, user_id: str, course_id: str, subsection_id: str) -> Optional[Progress]: ...
+    def complete_section(self, user_id: str, course_id: str, section_id: str) -> Optional[Progress]: ...
+    def course_outline(self, course_id: str) -> Optional[CourseOutline]: ...
+    def completion_mask(self, progress: Progress, outline: CourseOutline) -> int: ...
+    def add_watch_time(self, entries: Iterable[Tuple[str, str, int, Optional[str], float]]) -> int: ...
+    def create_review(self, review: Review) -> Review: ...
+    def get_reviews_by_course(self, course_id: str) -> List[Review]: ...
+
+    # Sessions
+    def create_session(self, token: str, user_id: str, created_at: float = None, last_seen: float = None): ...
+    def get_user_by_token(self, token: str) -> Optional[User]: ...
+    def delete_session(self, token: str) -> bool: ...
+    def reap_sessions(self) -> int: ...
+
+    # Batching
+    def bulk_create(self, items: Iterable[Any]) -> int: ...
+    def transaction(self) -> ContextManager[None]: ...
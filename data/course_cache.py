@@ -0,0 +1,92 @@
+"""
+Memoized course serialization keyed by the per-course version counter.
+Storage bumps Course.version on every change to a course, its sections or
+subsections, so a cached entry is valid exactly while the version matches.
+
+"reviews" is encoded as the last member, so the course detail endpoint can
+take the encoding without it as a prefix and splice in the full reviews.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+import threading
+
+from config import Config
+from utils.responses import encode_json
+
+class CourseCache:
+    """LRU cache of course dicts and their JSON encoding, bounded by encoded size"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        # course id -> (version, dict, encoding, length of the encoding before the reviews member)
+        self._entries: 'OrderedDict[str, Tuple[int, Dict[str, Any], bytes, int]]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, course) -> Tuple[Dict[str, Any], bytes, int]:
+        with self._lock:
+            entry = self._entries.get(course.id)
+            if entry is not None and entry[0] == course.version:
+                self._entries.move_to_end(course.id)
+                self.hits += 1
+                return entry[1], entry[2], entry[3]
+            self.misses += 1
+
+        # Serialize outside the lock; a concurrent miss just does the same work
+        version = course.version
+        data = course.to_dict()
+        data['reviews'] = data.pop('reviews')
+        head = encode_json({key: value for key, value in data.items() if key != 'reviews'})
+        cut = len(head) - 1
+        encoded = head[:cut] + (b',' if cut > 1 else b'') + encode_json({'reviews': data['reviews']})[1:]
+        with self._lock:
+            self._discard(course.id)
+            if len(encoded) <= self.max_bytes:
+                self._entries[course.id] = (version, data, encoded, cut)
+                self._size += len(encoded)
+                while self._size > self.max_bytes:
+                    self._discard(next(iter(self._entries)))
+                    self.evictions += 1
+        return data, encoded, cut
+
+    def _discard(self, course_id: str):
+        entry = self._entries.pop(course_id, None)
+        if entry is not None:
+            self._size -= len(entry[2])
+
+    def get_dict(self, course) -> Dict[str, Any]:
+        """Serialized course; a shallow copy, so callers may add top-level keys"""
+        return dict(self._lookup(course)[0])
+
+    def get_json(self, course, omit_reviews: bool = False) -> bytes:
+        """Serialized course as compact JSON bytes, optionally without the
+        reviews member for callers that add their own"""
+        _, encoded, cut = self._lookup(course)
+        return encoded[:cut] + b'}' if omit_reviews else encoded
+
+    def invalidate(self, course_id: str):
+        with self._lock:
+            self._discard(course_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+course_cache = CourseCache(Config.COURSE_CACHE_MAX_BYTES)
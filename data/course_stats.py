@@ -0,0 +1,77 @@
+"""
+Incrementally maintained per-course statistics.
+InMemoryStorage keeps one CourseStats per course and updates it on every
+enrollment, progress and review change, so the catalog reads it in O(1).
+"""
+import math
+from typing import Dict, Any, Iterable, List
+
+RATINGS = range(1, 6)
+
+class CourseStats:
+    def __init__(self, course_id: str):
+        self.course_id = course_id
+        self.enrolled_count = 0
+        self.progress_count = 0
+        self.completed_count = 0
+        self.progress_sum = 0.0
+        self.review_count = 0
+        self.rating_sum = 0
+        self.rating_histogram = {i: 0 for i in RATINGS}
+
+    @classmethod
+    def from_records(cls, course, progress_records: Iterable, reviews: Iterable) -> 'CourseStats':
+        """Build the aggregate from scratch out of the raw records"""
+        stats = cls(course.id)
+        stats.enrolled_count = len(course.enrolled_students)
+        for progress in progress_records:
+            stats.add_progress(progress.progress_percentage, progress.completed_at is not None)
+        for review in reviews:
+            stats.add_review(review.rating)
+        return stats
+
+    def add_progress(self, percentage: float, completed: bool):
+        self.progress_count += 1
+        self.progress_sum += percentage
+        if completed:
+            self.completed_count += 1
+
+    def remove_progress(self, percentage: float, completed: bool):
+        self.progress_count -= 1
+        self.progress_sum -= percentage
+        if completed:
+            self.completed_count -= 1
+
+    def add_review(self, rating: int):
+        self.review_count += 1
+        self.rating_sum += rating
+        if rating in self.rating_histogram:
+            self.rating_histogram[rating] += 1
+
+    def remove_review(self, rating: int):
+        self.review_count -= 1
+        self.rating_sum -= rating
+        if rating in self.rating_histogram:
+            self.rating_histogram[rating] -= 1
+
+    def diff(self, other: 'CourseStats') -> List[str]:
+        """List the fields that differ from another aggregate"""
+        mismatches = []
+        for field in ['enrolled_count', 'progress_count', 'completed_count',
+                      'review_count', 'rating_sum', 'rating_histogram']:
+            if getattr(self, field) != getattr(other, field):
+                mismatches.append(field)
+        if not math.isclose(self.progress_sum, other.progress_sum, abs_tol=1e-6):
+            mismatches.append('progress_sum')
+        return mismatches
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'total_students': self.enrolled_count,
+            'completed_students': self.completed_count,
+            'completion_rate': (self.completed_count / self.enrolled_count * 100) if self.enrolled_count > 0 else 0,
+            'average_progress': self.progress_sum / self.progress_count if self.progress_count else 0,
+            'average_rating': self.rating_sum / self.review_count if self.review_count else 0,
+            'total_reviews': self.review_count,
+            'rating_distribution': dict(self.rating_histogram)
+        }
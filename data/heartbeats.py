@@ -0,0 +1,157 @@
+"""
+Watch-time heartbeats, coalesced in memory and flushed to storage in batches.
+
+The player reports seconds watched every few seconds per viewer. Writing
+each heartbeat through would cost a progress update apiece, so instead they
+accumulate per (user, course, subsection) and a flusher thread applies one
+increment per (user, course) every HEARTBEAT_FLUSH_INTERVAL. Progress keeps
+time in whole minutes; the leftover seconds carry over to the next flush and
+are rounded once a viewer has been idle for HEARTBEAT_IDLE_TTL. The buffer
+holds at most max_keys entries and rejects new keys with HeartbeatBufferFull
+(answered with 503) until the next flush; close() drains it on shutdown.
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import atexit
+import logging
+import threading
+import time
+
+from config import Config
+from data.storage import storage
+
+logger = logging.getLogger(__name__)
+
+# (user_id, course_id, minutes, subsection_id, last_accessed)
+WatchTime = Tuple[str, str, int, Optional[str], float]
+
+class HeartbeatBufferFull(Exception):
+    """Raised when the buffer holds max_keys entries"""
+
+    def __init__(self, retry_after: int):
+        super().__init__('Heartbeat buffer is full')
+        self.retry_after = retry_after
+
+class HeartbeatBuffer:
+    def __init__(self, apply: Callable[[Iterable[WatchTime]], int], max_keys: int = 100_000,
+                 idle_ttl: float = 600, retry_after: int = 1, clock: Callable[[], float] = time.time):
+        self.apply = apply
+        self.max_keys = max_keys
+        self.idle_ttl = idle_ttl
+        self.retry_after = retry_after
+        self.clock = clock
+        # (user_id, course_id, subsection_id) -> [seconds, last heartbeat]
+        self._pending: Dict[Tuple[str, str, str], List[float]] = {}
+        # (user_id, course_id) -> [seconds short of a whole minute, last heartbeat]
+        self._carry: Dict[Tuple[str, str], List[float]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.received = 0
+        self.rejected = 0
+        self.writes = 0
+
+    def record(self, user_id: str, course_id: str, subsection_id: str, seconds: float):
+        key = (user_id, course_id, subsection_id)
+        now = self.clock()
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None:
+                if len(self._pending) >= self.max_keys:
+                    self.rejected += 1
+                    self._wake.set()
+                    raise HeartbeatBufferFull(self.retry_after)
+                self._pending[key] = [seconds, now]
+            else:
+                entry[0] += seconds
+                entry[1] = now
+            self.received += 1
+
+    def flush(self, drain: bool = False) -> int:
+        """Write buffered watch time; with drain, round off every carried remainder too"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+
+            # Coalesce subsections per progress record; the latest one becomes current
+            totals: Dict[Tuple[str, str], List] = {}
+            for (user_id, course_id, subsection_id), (seconds, seen) in pending.items():
+                total = totals.get((user_id, course_id))
+                if total is None:
+                    totals[(user_id, course_id)] = [seconds, subsection_id, seen]
+                else:
+                    total[0] += seconds
+                    if seen > total[2]:
+                        total[1], total[2] = subsection_id, seen
+
+            now = self.clock()
+            batch: List[WatchTime] = []
+            for key, (seconds, subsection_id, seen) in totals.items():
+                carried = self._carry.pop(key, None)
+                if carried:
+                    seconds += carried[0]
+                minutes, remainder = divmod(seconds, 60)
+                if remainder:
+                    self._carry[key] = [remainder, seen]
+                batch.append((key[0], key[1], int(minutes), subsection_id, seen))
+
+            # Viewers who stopped watching, and the oldest beyond max_keys:
+            # round their remainder to the nearest minute
+            overflow = len(self._carry) - self.max_keys
+            for key, (remainder, seen) in list(self._carry.items()):
+                overflow -= 1
+                if drain or overflow >= 0 or now - seen >= self.idle_ttl:
+                    del self._carry[key]
+                    if remainder >= 30:
+                        batch.append((key[0], key[1], 1, None, seen))
+
+            if not batch:
+                return 0
+            try:
+                written = self.apply(batch)
+            except Exception as e:
+                logger.error(f"Heartbeat flush error, dropped {len(batch)} updates: {str(e)}")
+                return 0
+            self.writes += written
+            return written
+
+    def start(self, interval: float) -> threading.Thread:
+        """Flush every interval seconds, or sooner when the buffer fills up"""
+        def run():
+            while not self._stop.is_set():
+                self._wake.wait(interval)
+                self._wake.clear()
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.error(f"Heartbeat flusher error: {str(e)}")
+
+        self._thread = threading.Thread(target=run, name='heartbeat-flusher', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        return self._thread
+
+    def close(self):
+        """Stop the flusher and drain everything buffered"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush(drain=True)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'carried': len(self._carry),
+                'max_keys': self.max_keys,
+                'received': self.received,
+                'rejected': self.rejected,
+                'writes': self.writes
+            }
+
+heartbeat_buffer = HeartbeatBuffer(storage.add_watch_time, Config.HEARTBEAT_MAX_KEYS, Config.HEARTBEAT_IDLE_TTL)
+if Config.HEARTBEAT_FLUSH_INTERVAL:
+    heartbeat_buffer.start(Config.HEARTBEAT_FLUSH_INTERVAL)
@@ -0,0 +1,25 @@
+"""
+Striped locks: a fixed pool of locks shared out by key hash, so writers to
+different entities rarely contend while memory stays constant.
+"""
+from contextlib import contextmanager
+from typing import Hashable, List
+import threading
+
+class LockStripes:
+    def __init__(self, count: int = 64):
+        self._locks: List[threading.RLock] = [threading.RLock() for _ in range(count)]
+
+    def for_key(self, key: Hashable) -> threading.RLock:
+        return self._locks[hash(key) % len(self._locks)]
+
+    @contextmanager
+    def all(self):
+        """Hold every stripe, always acquired in the same order"""
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(self._locks):
+                lock.release()
@@ -0,0 +1,94 @@
+"""
+Course outlines: every subsection of a course numbered with a stable ordinal,
+so a learner's completed subsections can be held as an int bitset. The
+percentage is a popcount, and a section is complete when its mask is
+covered. Ordinals are only ever appended. Removing a subsection clears its
+live bit, so masks computed earlier stay valid.
+"""
+from typing import Dict, FrozenSet, Iterable, List
+
+class CourseOutline:
+    __slots__ = ('course_id', 'ordinals', 'subsection_ids', 'section_masks', 'live_mask', 'total')
+
+    def __init__(self, course_id: str):
+        self.course_id = course_id
+        self.ordinals: Dict[str, int] = {}
+        self.subsection_ids: List[str] = []
+        self.section_masks: Dict[str, int] = {}
+        self.live_mask = 0
+        self.total = 0
+
+    @classmethod
+    def from_course(cls, course) -> 'CourseOutline':
+        outline = cls(course.id)
+        for section in course.sections:
+            outline.add_section(section.id)
+            for subsection in section.subsections:
+                outline.add_subsection(section.id, subsection.id)
+        return outline
+
+    def add_section(self, section_id: str):
+        self.section_masks.setdefault(section_id, 0)
+
+    def add_subsection(self, section_id: str, subsection_id: str):
+        if subsection_id in self.ordinals:
+            return
+        bit = 1 << len(self.subsection_ids)
+        self.ordinals[subsection_id] = len(self.subsection_ids)
+        self.subsection_ids.append(subsection_id)
+        self.section_masks[section_id] = self.section_masks.get(section_id, 0) | bit
+        self.live_mask |= bit
+        self.total += 1
+
+    def remove_subsection(self, section_id: str, subsection_id: str):
+        ordinal = self.ordinals.get(subsection_id)
+        if ordinal is None or not self.live_mask >> ordinal & 1:
+            return
+        bit = 1 << ordinal
+        self.live_mask &= ~bit
+        if section_id in self.section_masks:
+            self.section_masks[section_id] &= ~bit
+        self.total -= 1
+
+    def remove_section(self, section_id: str):
+        section_mask = self.section_masks.pop(section_id, 0)
+        self.live_mask &= ~section_mask
+        self.total = self.live_mask.bit_count()
+
+    def bit(self, subsection_id: str) -> int:
+        ordinal = self.ordinals.get(subsection_id)
+        return 0 if ordinal is None else 1 << ordinal
+
+    def mask(self, subsection_ids: Iterable[str]) -> int:
+        """Bitset of the given subsections; unknown ids are ignored"""
+        mask = 0
+        ordinals = self.ordinals
+        for subsection_id in subsection_ids:
+            ordinal = ordinals.get(subsection_id)
+            if ordinal is not None:
+                mask |= 1 << ordinal
+        return mask
+
+    def ids(self, mask: int) -> FrozenSet[str]:
+        subsection_ids = self.subsection_ids
+        ids = []
+        while mask:
+            low = mask & -mask
+            ids.append(subsection_ids[low.bit_length() - 1])
+            mask ^= low
+        return frozenset(ids)
+
+    def completed_count(self, mask: int) -> int:
+        return (mask & self.live_mask).bit_count()
+
+    def percentage(self, mask: int) -> float:
+        if self.total == 0:
+            return 0.0
+        return ((mask & self.live_mask).bit_count() / self.total) * 100
+
+    def section_complete(self, mask: int, section_id: str) -> bool:
+        section_mask = self.section_masks.get(section_id, 0)
+        return mask & section_mask == section_mask
+
+    def section_mask(self, section_id: str) -> int:
+        return self.section_masks.get(section_id, 0)
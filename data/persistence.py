@@ -0,0 +1,420 @@
+"""
+Optional durability for InMemoryStorage: an append-only write-ahead log with
+group commit, plus periodic compacted snapshots.
+
+Files in the persistence directory:
+    wal-00000003.log       JSON-lines mutation records, one segment per snapshot epoch
+    snapshot-00000003.jsonl  the full store as of the start of wal-00000003.log
+
+On startup the newest snapshot is loaded and the WAL segments from its epoch
+onwards are replayed.
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import atexit
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from models import User, Course, Section, Subsection, Quiz, Progress, Review
+from data.storage import InMemoryStorage
+from data.sessions import SESSION_TOUCH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+ENTITY_TYPES = {cls.__name__: cls for cls in [User, Course, Section, Subsection, Quiz, Progress, Review]}
+
+# Attributes rebuilt from other records on load rather than stored
+DERIVED_FIELDS = {'sections', 'subsections'}
+
+FSYNC_POLICIES = ('always', 'batch', 'off')
+
+WAL_PATTERN = re.compile(r'^wal-(\d{8})\.log$')
+SNAPSHOT_PATTERN = re.compile(r'^snapshot-(\d{8})\.jsonl$')
+
+def entity_fields(obj) -> Dict[str, Any]:
+    return {key: getattr(obj, key) for key in type(obj).__slots__
+            if key not in DERIVED_FIELDS and hasattr(obj, key)}
+
+def copy_entity(obj):
+    """Copy an entity and its top-level containers so later in-place changes don't leak in"""
+    clone = type(obj).__new__(type(obj))
+    for key, value in entity_fields(obj).items():
+        if isinstance(value, (list, dict, set)):
+            value = value.copy()
+        setattr(clone, key, value)
+    return clone
+
+def encode_value(value):
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    if isinstance(value, set):
+        return {'$set': list(value)}
+    if isinstance(value, frozenset):
+        return {'$frozenset': list(value)}
+    if type(value).__name__ in ENTITY_TYPES:
+        return {'$entity': type(value).__name__, 'fields': entity_fields(value)}
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+def decode_value(obj: dict):
+    if '$dt' in obj:
+        return datetime.fromisoformat(obj['$dt'])
+    if '$set' in obj:
+        return set(obj['$set'])
+    if '$frozenset' in obj:
+        return frozenset(obj['$frozenset'])
+    if '$entity' in obj:
+        entity = ENTITY_TYPES[obj['$entity']].__new__(ENTITY_TYPES[obj['$entity']])
+        for key, value in obj['fields'].items():
+            setattr(entity, key, value)
+        if isinstance(entity, Course):
+            entity.sections = []
+        elif isinstance(entity, Section):
+            entity.subsections = []
+        return entity
+    return obj
+
+def encode_json(value) -> str:
+    return json.dumps(value, default=encode_value, separators=(',', ':'))
+
+def encode_record(op: str, args: list) -> bytes:
+    return (encode_json({'op': op, 'args': args}) + '\n').encode()
+
+def encode_batch(encoded_ops: List[str]) -> bytes:
+    """Join already-encoded [op, args] pairs into one batch record"""
+    return ('{"op":"batch","args":[' + ','.join(encoded_ops) + ']}\n').encode()
+
+def decode_record(line: bytes) -> dict:
+    return json.loads(line, object_hook=decode_value)
+
+class WriteAheadLog:
+    """Append-only log whose writes are flushed in groups by a background thread.
+
+    fsync='always' makes writers wait until their record is fsynced (one fsync
+    covers every record in the group), 'batch' fsyncs each group without making
+    writers wait, and 'off' leaves flushing to the OS.
+    """
+
+    def __init__(self, path: str, fsync: str = 'batch', group_commit_interval: float = 0.005):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}")
+        self.fsync = fsync
+        self.group_commit_interval = group_commit_interval
+        self._file = open(path, 'ab')
+        self._pending: List[bytes] = []
+        self._appended = 0
+        self._durable = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='wal-writer', daemon=True)
+        self._thread.start()
+
+    def append(self, record: bytes) -> int:
+        """Queue a record and return its sequence number"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('Write-ahead log is closed')
+            self._pending.append(record)
+            self._appended += 1
+            self._cond.notify_all()
+            return self._appended
+
+    def wait(self, sequence: int):
+        """Block until the record with this sequence number is durable, if the policy requires it"""
+        if self.fsync != 'always':
+            return
+        with self._cond:
+            while self._durable < sequence and not self._closed:
+                self._cond.wait()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._pending:
+                    return
+            # Let concurrent writers join this group before the write and fsync
+            time.sleep(self.group_commit_interval)
+            self._flush()
+
+    def _flush(self):
+        with self._write_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+                sequence = self._appended
+            if batch:
+                self._file.write(b''.join(batch))
+                self._file.flush()
+                if self.fsync != 'off':
+                    os.fsync(self._file.fileno())
+            with self._cond:
+                self._durable = max(self._durable, sequence)
+                self._cond.notify_all()
+
+    def rotate(self, path: str):
+        """Flush everything queued so far to the current file and continue in a new one"""
+        with self._write_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+                sequence = self._appended
+            self._file.write(b''.join(batch))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = open(path, 'ab')
+            with self._cond:
+                self._durable = max(self._durable, sequence)
+                self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._flush()
+        with self._write_lock:
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+class DurableStorage(InMemoryStorage):
+    """InMemoryStorage that records every mutation in a write-ahead log"""
+
+    def __init__(self, directory: str, fsync: str = 'batch', group_commit_interval: float = 0.005,
+                 snapshot_interval: Optional[float] = 300):
+        super().__init__()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._tx = threading.local()
+        self._replaying = True
+        self.records_since_snapshot = 0
+
+        self.segment = self.recover()
+        self.wal = WriteAheadLog(self._wal_path(self.segment), fsync, group_commit_interval)
+        self._replaying = False
+
+        self._stop = threading.Event()
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_thread = None
+        if snapshot_interval:
+            self._snapshot_thread = threading.Thread(
+                target=self._snapshot_loop, args=(snapshot_interval,), name='snapshotter', daemon=True)
+            self._snapshot_thread.start()
+        atexit.register(self.close)
+
+    def _wal_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f'wal-{segment:08d}.log')
+
+    def _snapshot_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f'snapshot-{segment:08d}.jsonl')
+
+    def _files(self, pattern) -> List[Tuple[int, str]]:
+        found = []
+        for name in os.listdir(self.directory):
+            match = pattern.match(name)
+            if match:
+                found.append((int(match.group(1)), os.path.join(self.directory, name)))
+        return sorted(found)
+
+    # Recovery
+
+    def recover(self) -> int:
+        """Load the newest snapshot, replay the WAL after it, and return the segment to append to"""
+        start = time.perf_counter()
+        snapshots = self._files(SNAPSHOT_PATTERN)
+        segment = 0
+        records = 0
+        if snapshots:
+            segment, path = snapshots[-1]
+            records += self._replay_file(path, truncate_torn_tail=False)
+        for wal_segment, path in self._files(WAL_PATTERN):
+            if wal_segment >= segment:
+                records += self._replay_file(path, truncate_torn_tail=True)
+                segment = wal_segment
+        if records:
+            logger.info("Recovered %s records from %s in %.2fs", records, self.directory, time.perf_counter() - start)
+        return segment
+
+    def _replay_file(self, path: str, truncate_torn_tail: bool) -> int:
+        count = 0
+        good_offset = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                # A crash mid-append leaves a torn record without its newline at the tail
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = decode_record(line)
+                except ValueError:
+                    break
+                self._replay(record)
+                good_offset += len(line)
+                count += 1
+        if truncate_torn_tail and good_offset < os.path.getsize(path):
+            logger.warning("Truncating torn tail of %s at byte %s", path, good_offset)
+            with open(path, 'r+b') as f:
+                f.truncate(good_offset)
+        return count
+
+    def _replay(self, record: dict):
+        if record['op'] == 'batch':
+            for op, args in record['args']:
+                getattr(InMemoryStorage, op)(self, *args)
+        else:
+            getattr(InMemoryStorage, record['op'])(self, *record['args'])
+
+    # Logging
+
+    def _apply(self, op: str, *args, lock=None):
+        """Apply a mutation under the lock (the store-wide one by default) and log it if it changed anything"""
+        with lock if lock is not None else self._lock:
+            result = getattr(InMemoryStorage, op)(self, *args)
+            changed = result is not None and result is not False
+            sequence = self._log(op, list(args)) if changed else None
+        if sequence and not getattr(self._tx, 'depth', 0):
+            self.wal.wait(sequence)
+        return result
+
+    def _log(self, op: str, args: list) -> Optional[int]:
+        if self._replaying:
+            return None
+        self.records_since_snapshot += 1
+        batch = getattr(self._tx, 'batch', None)
+        if batch is not None:
+            # Encode now: entities may change again before the transaction ends
+            batch.append(encode_json([op, args]))
+            return None
+        return self.wal.append(encode_record(op, args))
+
+    @contextmanager
+    def transaction(self):
+        """Apply a group of operations atomically and log them as one WAL record"""
+        with self._lock:
+            depth = getattr(self._tx, 'depth', 0)
+            if depth == 0:
+                self._tx.batch = []
+            self._tx.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._tx.depth = depth
+                if depth == 0:
+                    batch, self._tx.batch = self._tx.batch, None
+                    sequence = self.wal.append(encode_batch(batch)) if batch else None
+        if depth == 0 and sequence:
+            self.wal.wait(sequence)
+
+    def bulk_create(self, items) -> int:
+        with self.transaction():
+            return super().bulk_create(items)
+
+    def create_user(self, user): return self._apply('create_user', user)
+    def update_user(self, user_id, updates): return self._apply('update_user', user_id, updates)
+    def delete_user(self, user_id): return self._apply('delete_user', user_id)
+    def create_course(self, course): return self._apply('create_course', course)
+    def update_course(self, course_id, updates): return self._apply('update_course', course_id, updates)
+    def delete_course(self, course_id): return self._apply('delete_course', course_id)
+    def create_section(self, section): return self._apply('create_section', section)
+    def create_subsection(self, subsection): return self._apply('create_subsection', subsection)
+    def create_quiz(self, quiz): return self._apply('create_quiz', quiz)
+    def create_progress(self, progress): return self._apply('create_progress', progress)
+    def create_review(self, review): return self._apply('create_review', review)
+    def delete_session(self, token): return self._apply('delete_session', token)
+    def unenroll(self, user_id, course_id): return self._apply('unenroll', user_id, course_id)
+
+    def update_progress(self, progress_id, updates):
+        # Logged under the record's own lock; record_quiz_attempt and complete_* log through here
+        return self._apply('update_progress', progress_id, updates,
+                           lock=self._locked_progress(progress_id, updates))
+
+    def create_session(self, token, user_id, created_at=None, last_seen=None):
+        # Log the login time so replay keeps the original absolute expiry
+        return self._apply('create_session', token, user_id, created_at or time.time(), last_seen)
+
+    def get_user_by_token(self, token):
+        # Slide the idle expiry at most once per SESSION_TOUCH_INTERVAL and log each
+        # slide, so a recovered session keeps the expiry it had before the restart
+        session = self.sessions.get(token, touch=False)
+        if session is None:
+            return None
+        now = self.sessions.clock()
+        if now - session.last_seen >= SESSION_TOUCH_INTERVAL:
+            self._apply('touch_session', token, now)
+        return self.users.get(session.user_id)
+
+    def enroll(self, user_id, course_id, progress=None):
+        # Log the progress record that was actually used so replay recreates the same id
+        with self._lock:
+            result = InMemoryStorage.enroll(self, user_id, course_id, progress)
+            sequence = self._log('enroll', [user_id, course_id, result]) if result else None
+        if sequence and not getattr(self._tx, 'depth', 0):
+            self.wal.wait(sequence)
+        return result
+
+    # Snapshots
+
+    def _capture(self) -> List[Tuple[str, list]]:
+        """Copy the store into replayable records; the caller holds the lock"""
+        records = []
+        records += [('create_user', [copy_entity(u)]) for u in self.users.values()]
+        records += [('create_course', [copy_entity(c)]) for c in self.courses.values()]
+        records += [('create_section', [copy_entity(s)]) for s in self.sections.values()]
+        records += [('create_subsection', [copy_entity(s)]) for s in self.subsections.values()]
+        records += [('create_quiz', [copy_entity(q)]) for q in self.quizzes.values()]
+        records += [('create_progress', [copy_entity(p)]) for p in self.progress.values()]
+        records += [('create_review', [copy_entity(r)]) for r in self.reviews.values()]
+        records += [('create_session', [s.token, s.user_id, s.created_at, s.last_seen])
+                    for s in self.sessions.live_sessions()]
+        return records
+
+    def snapshot(self) -> str:
+        """Write a compacted snapshot and drop the WAL segments it covers"""
+        with self._snapshot_lock:
+            # Writers are only blocked while entities are copied, not while the snapshot is encoded
+            with self._lock, self._progress_locks.all():
+                # Finish pending course deletes so no orphaned records are captured
+                for course_id in list(self._tombstones):
+                    self._purge_course(course_id)
+                records = self._capture()
+                old_segment = self.segment
+                self.segment += 1
+                self.wal.rotate(self._wal_path(self.segment))
+                self.records_since_snapshot = 0
+
+            path = self._snapshot_path(self.segment)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                for op, args in records:
+                    f.write(encode_record(op, args))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+
+            for segment, old_path in self._files(WAL_PATTERN) + self._files(SNAPSHOT_PATTERN):
+                if segment <= old_segment:
+                    os.remove(old_path)
+            logger.info("Snapshot written: %s (%s records)", path, len(records))
+            return path
+
+    def _snapshot_loop(self, interval: float):
+        while not self._stop.wait(interval):
+            if self.records_since_snapshot:
+                try:
+                    self.snapshot()
+                except Exception as e:
+                    logger.error(f"Snapshot error: {str(e)}")
+
+    def close(self):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self._snapshot_thread:
+            self._snapshot_thread.join()
+        self.wal.close()
@@ -0,0 +1,155 @@
+"""
+In-process inverted index for full-text course search, ranked with BM25.
+InMemoryStorage keeps it up to date as courses are created, updated and deleted.
+"""
+from typing import Dict, List, Tuple
+import heapq
+import math
+import re
+import threading
+import unicodedata
+
+# Arabic diacritics (tashkeel), superscript alef and tatweel
+ARABIC_DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+
+ARABIC_LETTER_MAP = str.maketrans({
+    'أ': 'ا',  # alef with hamza above -> alef
+    'إ': 'ا',  # alef with hamza below -> alef
+    'آ': 'ا',  # alef with madda -> alef
+    'ٱ': 'ا',  # alef wasla -> alef
+    'ؤ': 'و',  # waw with hamza -> waw
+    'ئ': 'ي',  # yeh with hamza -> yeh
+    'ى': 'ي',  # alef maksura -> yeh
+    'ة': 'ه',  # teh marbuta -> heh
+})
+
+# Apostrophes and ayn/hamza marks used in Latin transliteration (Qur'an, Shari`ah, Ka'bah)
+TRANSLITERATION_MARKS = re.compile("['\u2018\u2019\u02bb\u02bc\u02be\u02bf`\u00b4]")
+
+# Common alternative spellings folded onto one canonical term
+TRANSLITERATION_VARIANTS = {
+    'koran': 'quran',
+    'quraan': 'quran',
+    'hadeeth': 'hadith',
+    'ahadith': 'hadith',
+    'tajwid': 'tajweed',
+    'seerah': 'sirah',
+    'sira': 'sirah',
+    'shariah': 'sharia',
+    'shariat': 'sharia',
+    'mohammed': 'muhammad',
+    'mohammad': 'muhammad',
+    'muhammed': 'muhammad',
+    'tafseer': 'tafsir',
+    'aqeedah': 'aqidah',
+    'aqida': 'aqidah',
+}
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Title and tag matches count more than description matches
+FIELD_WEIGHTS = (('title', 3), ('tags', 2), ('description', 1))
+
+def normalize_text(text: str) -> str:
+    """Fold case, accents, Arabic letter variants and transliteration marks"""
+    text = ARABIC_DIACRITICS.sub('', text).translate(ARABIC_LETTER_MAP)
+    text = TRANSLITERATION_MARKS.sub('', text)
+    # Strip Latin accents (e.g. ā, ī, ḥ) without touching Arabic letters
+    text = ''.join(char for char in unicodedata.normalize('NFKD', text)
+                   if not unicodedata.combining(char))
+    return text.casefold()
+
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized search terms"""
+    tokens = TOKEN_PATTERN.findall(normalize_text(text))
+    return [TRANSLITERATION_VARIANTS.get(token, token) for token in tokens]
+
+class SearchIndex:
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}  # term -> {doc_id: weighted tf}
+        self.doc_terms: Dict[str, Dict[str, int]] = {}  # doc_id -> {term: weighted tf}
+        self.doc_lengths: Dict[str, int] = {}
+        self.total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    @staticmethod
+    def _course_terms(course) -> Dict[str, int]:
+        fields = {
+            'title': course.title or '',
+            'tags': ' '.join(course.tags or []),
+            'description': course.description or ''
+        }
+        terms: Dict[str, int] = {}
+        for field, weight in FIELD_WEIGHTS:
+            for token in tokenize(fields[field]):
+                terms[token] = terms.get(token, 0) + weight
+        return terms
+
+    def add(self, course):
+        """Index a course, replacing any previous version of it"""
+        terms = self._course_terms(course)
+        with self._lock:
+            self._remove(course.id)
+            for term, tf in terms.items():
+                self.postings.setdefault(term, {})[course.id] = tf
+            length = sum(terms.values())
+            self.doc_terms[course.id] = terms
+            self.doc_lengths[course.id] = length
+            self.total_length += length
+
+    def remove(self, course_id: str):
+        with self._lock:
+            self._remove(course_id)
+
+    def _remove(self, course_id: str):
+        terms = self.doc_terms.pop(course_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(course_id, None)
+                if not docs:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(course_id)
+
+    def search(self, query: str, limit: int = None) -> List[Tuple[str, float]]:
+        """Return (course_id, score) pairs for courses matching every query term, best first"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        with self._lock:
+            postings = [self.postings.get(term) for term in terms]
+            if not all(postings):
+                return []
+
+            # Intersect starting from the rarest term so only matching documents are visited
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for docs in postings[1:]:
+                candidates.intersection_update(docs)
+                if not candidates:
+                    return []
+
+            doc_count = len(self.doc_lengths)
+            avg_length = self.total_length / doc_count if doc_count else 0
+            idfs = [math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5)) for docs in postings]
+
+            scores = []
+            for doc_id in candidates:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length) if avg_length else self.k1
+                score = 0.0
+                for idf, docs in zip(idfs, postings):
+                    tf = docs[doc_id]
+                    score += idf * tf * (self.k1 + 1) / (tf + norm)
+                scores.append((doc_id, score))
+
+        if limit is not None:
+            return heapq.nsmallest(limit, scores, key=lambda item: (-item[1], item[0]))
+        return sorted(scores, key=lambda item: (-item[1], item[0]))
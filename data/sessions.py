@@ -0,0 +1,169 @@
+"""
+Expiring login sessions for the in-memory backend.
+
+A session expires after SESSION_IDLE_TTL seconds without use (sliding) or
+SESSION_ABSOLUTE_TTL seconds after login, whichever comes first, and each
+user keeps at most SESSION_MAX_PER_USER sessions. Expired sessions are found
+through a heap ordered by expiry, so reaping costs O(expired log n) rather
+than a scan of every token.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+import heapq
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Stores that write sessions durably record activity at most this often, so reads don't all become writes
+SESSION_TOUCH_INTERVAL = 60  # seconds
+
+class Session:
+    __slots__ = ('token', 'user_id', 'created_at', 'last_seen')
+
+    def __init__(self, token: str, user_id: str, created_at: float, last_seen: float):
+        self.token = token
+        self.user_id = user_id
+        self.created_at = created_at
+        self.last_seen = last_seen
+
+class SessionStore:
+    def __init__(self, idle_ttl: float, absolute_ttl: float, max_per_user: int = 0,
+                 clock: Callable[[], float] = time.time):
+        self.idle_ttl = idle_ttl
+        self.absolute_ttl = absolute_ttl
+        self.max_per_user = max_per_user
+        self.clock = clock
+        self._sessions: Dict[str, Session] = {}
+        # user_id -> {token: None}, in login order so the oldest is evicted first
+        self._tokens_by_user: Dict[str, Dict[str, None]] = {}
+        # (expiry as of scheduling, token); sliding renewals are rescheduled lazily when popped
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def expires_at(self, session: Session) -> float:
+        return min(session.last_seen + self.idle_ttl, session.created_at + self.absolute_ttl)
+
+    def create(self, token: str, user_id: str, created_at: Optional[float] = None,
+               last_seen: Optional[float] = None) -> Session:
+        """Add a session, evicting the user's oldest ones beyond the cap"""
+        created_at = created_at if created_at is not None else self.clock()
+        session = Session(token, user_id, created_at, last_seen if last_seen is not None else created_at)
+        with self._lock:
+            self._remove(token)
+            self._sessions[token] = session
+            user_tokens = self._tokens_by_user.setdefault(user_id, {})
+            user_tokens[token] = None
+            if self.max_per_user:
+                while len(user_tokens) > self.max_per_user:
+                    self._remove(next(iter(user_tokens)))
+            heapq.heappush(self._expiry_heap, (self.expires_at(session), token))
+        return session
+
+    def get(self, token: str, touch: bool = True) -> Optional[Session]:
+        """Return a live session, sliding its idle expiry forward when touched"""
+        session = self._sessions.get(token)
+        if session is None:
+            return None
+        now = self.clock()
+        if self.expires_at(session) <= now:
+            with self._lock:
+                if self._sessions.get(token) is session:
+                    self._remove(token)
+            return None
+        if touch:
+            session.last_seen = now
+        return session
+
+    def touch(self, token: str, last_seen: float) -> bool:
+        """Slide a session's idle expiry to last_seen; never moves it back"""
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None or last_seen <= session.last_seen:
+                return False
+            session.last_seen = last_seen
+            return True
+
+    def delete(self, token: str) -> bool:
+        with self._lock:
+            return self._remove(token) is not None
+
+    def delete_user(self, user_id: str) -> int:
+        """End every session of a user"""
+        with self._lock:
+            tokens = list(self._tokens_by_user.get(user_id, ()))
+            for token in tokens:
+                self._remove(token)
+            return len(tokens)
+
+    def _remove(self, token: str) -> Optional[Session]:
+        # The heap entry is left behind and skipped when it is popped
+        session = self._sessions.pop(token, None)
+        if session is not None:
+            user_tokens = self._tokens_by_user.get(session.user_id)
+            if user_tokens is not None:
+                user_tokens.pop(token, None)
+                if not user_tokens:
+                    del self._tokens_by_user[session.user_id]
+        return session
+
+    def sessions_for_user(self, user_id: str) -> List[Session]:
+        with self._lock:
+            return [self._sessions[token] for token in self._tokens_by_user.get(user_id, ())]
+
+    def live_sessions(self) -> List[Session]:
+        now = self.clock()
+        with self._lock:
+            return [session for session in self._sessions.values() if self.expires_at(session) > now]
+
+    def reap(self, batch_size: int = 10_000) -> int:
+        """Remove expired sessions, releasing the lock between batches"""
+        removed = 0
+        while True:
+            now = self.clock()
+            with self._lock:
+                done = True
+                for _ in range(batch_size):
+                    if not self._expiry_heap or self._expiry_heap[0][0] > now:
+                        break
+                    _, token = heapq.heappop(self._expiry_heap)
+                    session = self._sessions.get(token)
+                    if session is None:
+                        continue  # logged out or evicted already
+                    expires_at = self.expires_at(session)
+                    if expires_at > now:
+                        heapq.heappush(self._expiry_heap, (expires_at, token))
+                    else:
+                        self._remove(token)
+                        removed += 1
+                else:
+                    done = False
+                self._compact_heap()
+            if done:
+                return removed
+
+    def _compact_heap(self):
+        # Logouts and evictions leave stale heap entries; rebuild once they dominate
+        if len(self._expiry_heap) > 2 * len(self._sessions) + 1024:
+            self._expiry_heap = [(self.expires_at(session), token) for token, session in self._sessions.items()]
+            heapq.heapify(self._expiry_heap)
+
+def start_reaper(reap: Callable[[], int], interval: float, name: str = 'session-reaper',
+                 what: str = 'expired sessions') -> threading.Thread:
+    """Run reap every interval seconds on a daemon thread"""
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                removed = reap()
+                if removed:
+                    logger.info("Reaped %s %s", removed, what)
+            except Exception as e:
+                logger.error(f"{name} error: {str(e)}")
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    return thread
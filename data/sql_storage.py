@@ -0,0 +1,951 @@
+"""
+Durable SQL storage backend (PostgreSQL in production, SQLite locally).
+Implements the same interface as InMemoryStorage using SQLAlchemy Core.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import threading
+import time
+
+from sqlalchemy import (
+    MetaData, Table, Column, String, Text, Integer, Float, Boolean, DateTime, JSON,
+    Index, create_engine, select, insert, update, delete, func, and_, or_, cast, event, case
+)
+from sqlalchemy.pool import StaticPool
+
+from models import User, Course, Section, Subsection, Quiz, Progress, Review, REVIEWER_FIELDS
+from config import Config
+from data.sessions import SESSION_TOUCH_INTERVAL
+from data.course_stats import CourseStats
+from data.facets import FACET_FIELDS
+from data.outline import CourseOutline
+from utils.helpers import completion_updates, page_of
+
+metadata = MetaData()
+
+ID = String(36)
+
+users_table = Table(
+    'users', metadata,
+    Column('id', ID, primary_key=True),
+    Column('username', String(150), nullable=False, unique=True),
+    Column('email', String(255), nullable=False, unique=True),
+    Column('password_hash', String(255), nullable=False),
+    Column('role', String(20), nullable=False, index=True),
+    Column('created_at', DateTime, nullable=False),
+    Column('profile', JSON, nullable=False),
+)
+
+courses_table = Table(
+    'courses', metadata,
+    Column('id', ID, primary_key=True),
+    Column('title', String(255), nullable=False),
+    Column('description', Text, nullable=False),
+    Column('instructor_id', ID, nullable=False, index=True),
+    Column('category', String(100), nullable=False),
+    Column('level', String(20), nullable=False),
+    Column('price', Float, nullable=False),
+    Column('thumbnail_url', Text, nullable=False),
+    Column('preview_video_url', Text, nullable=False),
+    Column('tags', JSON, nullable=False),
+    Column('created_at', DateTime, nullable=False),
+    Column('updated_at', DateTime, nullable=False),
+    Column('published', Boolean, nullable=False),
+    Column('rating', Float, nullable=False),
+    Column('reviews', JSON, nullable=False),
+    Column('total_duration', Integer, nullable=False),
+    Column('language', String(50), nullable=False),
+    Column('prerequisites', JSON, nullable=False),
+    Column('is_free', Boolean, nullable=False),
+    Column('access_type', String(20), nullable=False),
+    Column('preview_config', JSON, nullable=False),
+    Column('version', Integer, nullable=False, default=0),
+    Column('review_version', Integer, nullable=False, default=0),
+    Index('ix_courses_catalog', 'published', 'category', 'level'),
+    Index('ix_courses_created', 'created_at', 'id'),
+)
+
+sections_table = Table(
+    'sections', metadata,
+    Column('id', ID, primary_key=True),
+    Column('title', String(255), nullable=False),
+    Column('description', Text, nullable=False),
+    Column('course_id', ID, nullable=False, index=True),
+    Column('order', Integer, nullable=False),
+    Column('materials', JSON, nullable=False),
+    Column('quiz_id', ID),
+    Column('created_at', DateTime, nullable=False),
+    Column('access_level', String(20), nullable=False),
+    Column('is_preview', Boolean, nullable=False),
+    Column('preview_duration', Integer),
+)
+
+subsections_table = Table(
+    'subsections', metadata,
+    Column('id', ID, primary_key=True),
+    Column('title', String(255), nullable=False),
+    Column('content_type', String(20), nullable=False),
+    Column('section_id', ID, nullable=False, index=True),
+    Column('order', Integer, nullable=False),
+    Column('content', JSON, nullable=False),
+    Column('duration', Integer, nullable=False),
+    Column('created_at', DateTime, nullable=False),
+    Column('access_level', String(20), nullable=False),
+    Column('is_preview', Boolean, nullable=False),
+    Column('preview_duration', Integer),
+    Column('video_url', Text, nullable=False),
+    Column('preview_video_url', Text, nullable=False),
+)
+
+quizzes_table = Table(
+    'quizzes', metadata,
+    Column('id', ID, primary_key=True),
+    Column('title', String(255), nullable=False),
+    Column('section_id', ID, nullable=False, index=True),
+    Column('questions', JSON, nullable=False),
+    Column('passing_score', Integer, nullable=False),
+    Column('time_limit', Integer, nullable=False),
+    Column('attempts_allowed', Integer, nullable=False),
+    Column('created_at', DateTime, nullable=False),
+)
+
+progress_table = Table(
+    'progress', metadata,
+    Column('id', ID, primary_key=True),
+    Column('user_id', ID, nullable=False),
+    Column('course_id', ID, nullable=False, index=True),
+    Column('completed_sections', JSON, nullable=False),
+    Column('completed_subsections', JSON, nullable=False),
+    Column('quiz_attempts', JSON, nullable=False),
+    Column('current_section_id', ID),
+    Column('current_subsection_id', ID),
+    Column('progress_percentage', Float, nullable=False),
+    Column('total_time_spent', Integer, nullable=False),
+    Column('started_at', DateTime, nullable=False),
+    Column('last_accessed', DateTime, nullable=False),
+    Column('completed_at', DateTime),
+    Column('sync_event_ids', JSON, nullable=False, default=list),
+    Column('sync_seconds', Float, nullable=False, default=0.0),
+    Index('ix_progress_user_course', 'user_id', 'course_id', unique=True),
+)
+
+reviews_table = Table(
+    'reviews', metadata,
+    Column('id', ID, primary_key=True),
+    Column('user_id', ID, nullable=False, index=True),
+    Column('course_id', ID, nullable=False, index=True),
+    Column('rating', Integer, nullable=False),
+    Column('comment', Text, nullable=False),
+    Column('created_at', DateTime, nullable=False),
+)
+
+enrollments_table = Table(
+    'enrollments', metadata,
+    Column('user_id', ID, primary_key=True),
+    Column('course_id', ID, primary_key=True, index=True),
+    Column('enrolled_at', DateTime, nullable=False),
+)
+
+# User.wishlist, one row per course so a course delete finds its entries through an index
+wishlist_table = Table(
+    'wishlist_entries', metadata,
+    Column('user_id', ID, primary_key=True),
+    Column('course_id', ID, primary_key=True, index=True),
+    Column('position', Integer, nullable=False),
+)
+
+sessions_table = Table(
+    'sessions', metadata,
+    Column('token', String(64), primary_key=True),
+    Column('user_id', ID, nullable=False, index=True),
+    Column('created_at', DateTime, nullable=False),
+    Column('last_seen', DateTime, nullable=False),
+    Column('expires_at', DateTime, nullable=False, index=True),
+)
+
+MODEL_TABLES = {
+    User: users_table,
+    Course: courses_table,
+    Section: sections_table,
+    Subsection: subsections_table,
+    Quiz: quizzes_table,
+    Progress: progress_table,
+    Review: reviews_table,
+}
+
+# Insert order that keeps parents ahead of children within one batch
+BULK_ORDER = [User, Course, Section, Subsection, Quiz, Progress, Review]
+
+# JSON columns held as frozensets and tuples on the model objects
+SET_COLUMNS = {'completed_sections', 'completed_subsections'}
+TUPLE_COLUMNS = {'sync_event_ids'}
+
+def to_column_value(column, value):
+    """Convert a model attribute (epoch float, set) to what its column stores"""
+    if value is None:
+        return None
+    if isinstance(column.type, DateTime) and isinstance(value, (int, float)):
+        return datetime.utcfromtimestamp(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if isinstance(value, tuple):
+        return list(value)
+    return value
+
+def from_column_value(column, value):
+    if value is None:
+        return None
+    if isinstance(column.type, DateTime):
+        return value.replace(tzinfo=timezone.utc).timestamp()
+    if column.name in SET_COLUMNS:
+        return frozenset(value)
+    if column.name in TUPLE_COLUMNS:
+        return tuple(value)
+    return value
+
+def to_row(obj) -> Dict[str, Any]:
+    """Column values for a model object"""
+    table = MODEL_TABLES[type(obj)]
+    return {column.name: to_column_value(column, getattr(obj, column.name)) for column in table.columns}
+
+def wishlist_rows(user_id: str, wishlist: Iterable[str]) -> List[Dict[str, Any]]:
+    """wishlist_entries rows for a wishlist, in order and without repeats"""
+    return [{'user_id': user_id, 'course_id': course_id, 'position': position}
+            for position, course_id in enumerate(dict.fromkeys(wishlist))]
+
+def from_row(cls, row) -> Any:
+    """Build a model object from a row without running its constructor"""
+    obj = cls.__new__(cls)
+    columns = MODEL_TABLES[cls].c
+    for key, value in row._mapping.items():
+        setattr(obj, key, from_column_value(columns[key], value))
+    return obj
+
+class SQLStorage:
+    def __init__(self, url: str, pool_size: int = 10, max_overflow: int = 20, echo: bool = False):
+        engine_options = {'echo': echo}
+        if url.startswith('sqlite'):
+            engine_options['connect_args'] = {'check_same_thread': False}
+            if url in ('sqlite://', 'sqlite:///:memory:'):
+                # One shared connection, otherwise every connection sees its own empty database
+                engine_options['poolclass'] = StaticPool
+        else:
+            engine_options.update({
+                'pool_size': pool_size,
+                'max_overflow': max_overflow,
+                'pool_pre_ping': True,
+                'pool_recycle': 1800
+            })
+        self.engine = create_engine(url, **engine_options)
+        self._local = threading.local()
+        if url.startswith('sqlite'):
+            event.listen(self.engine, 'connect', self._configure_sqlite)
+            event.listen(self.engine, 'begin', self._begin_sqlite)
+        metadata.create_all(self.engine)
+        # course id -> (course version, outline); rebuilt when the version moves on
+        self._outlines: Dict[str, Tuple[int, CourseOutline]] = {}
+
+    @staticmethod
+    def _configure_sqlite(dbapi_connection, connection_record):
+        # pysqlite would run the first SELECT outside any transaction and only
+        # BEGIN at the first write; _begin_sqlite issues BEGIN itself instead
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.close()
+
+    def _begin_sqlite(self, conn):
+        # SQLite ignores FOR UPDATE. A transaction() block takes the write lock
+        # up front so two read-modify-writes cannot both read the old row
+        conn.exec_driver_sql('BEGIN IMMEDIATE' if getattr(self._local, 'immediate', False) else 'BEGIN')
+
+    @contextmanager
+    def transaction(self):
+        """Run every storage call in the block on one connection and commit once"""
+        if getattr(self._local, 'connection', None) is not None:
+            yield
+            return
+        self._local.immediate = True
+        try:
+            with self.engine.begin() as conn:
+                self._local.connection = conn
+                try:
+                    yield
+                finally:
+                    self._local.connection = None
+        finally:
+            self._local.immediate = False
+
+    @contextmanager
+    def _connect(self):
+        conn = getattr(self._local, 'connection', None)
+        if conn is not None:
+            yield conn
+        else:
+            with self.engine.begin() as conn:
+                yield conn
+
+    def _get(self, cls, entity_id: str):
+        table = MODEL_TABLES[cls]
+        with self._connect() as conn:
+            row = conn.execute(select(table).where(table.c.id == entity_id)).first()
+        return from_row(cls, row) if row else None
+
+    def _update(self, cls, entity_id: str, updates: dict) -> bool:
+        table = MODEL_TABLES[cls]
+        values = {key: to_column_value(table.c[key], value) for key, value in updates.items() if key in table.c}
+        if not values:
+            return True
+        with self._connect() as conn:
+            result = conn.execute(update(table).where(table.c.id == entity_id).values(**values))
+        return result.rowcount > 0
+
+    @staticmethod
+    def _bump_course_versions(conn, condition):
+        """Invalidate cached serializations of the courses matching condition"""
+        conn.execute(update(courses_table).where(condition).values(version=courses_table.c.version + 1))
+
+    @staticmethod
+    def _bump_review_versions(conn, condition):
+        """Invalidate review listings of the courses matching condition"""
+        conn.execute(update(courses_table).where(condition).values(review_version=courses_table.c.review_version + 1))
+
+    @staticmethod
+    def _page(conn, table, conditions: list, load: Callable, per_page: int, page: int,
+              after: Optional[str]) -> Optional[Dict[str, Any]]:
+        """One page of table rows in (created_at, id) order, cut with LIMIT/OFFSET or
+        after a keyset cursor, with only that page's rows loaded"""
+        created_at, row_id = table.c.created_at, table.c.id
+        query = select(table).where(*conditions).order_by(created_at, row_id).limit(per_page)
+        if after:
+            anchor = conn.execute(select(created_at).where(row_id == after)).scalar()
+            if anchor is None:
+                return None
+            later = or_(created_at > anchor, and_(created_at == anchor, row_id > after))
+            total, start = conn.execute(
+                select(func.count(), func.coalesce(func.sum(case((later, 0), else_=1)), 0))
+                .select_from(table).where(*conditions)
+            ).one()
+            query = query.where(later)
+        else:
+            total = conn.execute(select(func.count()).select_from(table).where(*conditions)).scalar()
+            start = max(page - 1, 0) * per_page
+            query = query.offset(start)
+        return page_of(load(conn, conn.execute(query).all()), total, start, per_page)
+
+    # Users
+
+    def create_user(self, user: User) -> User:
+        with self.transaction():
+            with self._connect() as conn:
+                conn.execute(insert(users_table).values(**to_row(user)))
+                if user.wishlist:
+                    conn.execute(insert(wishlist_table), wishlist_rows(user.id, user.wishlist))
+        return user
+
+    @staticmethod
+    def _replace_wishlist(conn, user_id: str, wishlist: List[str]):
+        conn.execute(delete(wishlist_table).where(wishlist_table.c.user_id == user_id))
+        rows = wishlist_rows(user_id, wishlist)
+        if rows:
+            conn.execute(insert(wishlist_table), rows)
+
+    def _load_users(self, conn, rows) -> List[User]:
+        users = [from_row(User, row) for row in rows]
+        if users:
+            enrolled: Dict[str, List[str]] = {user.id: [] for user in users}
+            wishlists: Dict[str, List[str]] = {user.id: [] for user in users}
+            result = conn.execute(
+                select(enrollments_table.c.user_id, enrollments_table.c.course_id)
+                .where(enrollments_table.c.user_id.in_(list(enrolled)))
+                .order_by(enrollments_table.c.enrolled_at)
+            )
+            for user_id, course_id in result:
+                enrolled[user_id].append(course_id)
+            result = conn.execute(
+                select(wishlist_table.c.user_id, wishlist_table.c.course_id)
+                .where(wishlist_table.c.user_id.in_(list(wishlists)))
+                .order_by(wishlist_table.c.position)
+            )
+            for user_id, course_id in result:
+                wishlists[user_id].append(course_id)
+            for user in users:
+                user.enrolled_courses = enrolled[user.id]
+                user.wishlist = wishlists[user.id]
+        return users
+
+    def _get_user_where(self, condition) -> Optional[User]:
+        with self._connect() as conn:
+            rows = conn.execute(select(users_table).where(condition)).all()
+            users = self._load_users(conn, rows)
+        return users[0] if users else None
+
+    def get_user(self, user_id: str) -> Optional[User]:
+        return self._get_user_where(users_table.c.id == user_id)
+
+    @staticmethod
+    def _user_conditions(filters: dict) -> list:
+        return [users_table.c.role == filters['role']] if filters and 'role' in filters else []
+
+    def get_users(self, filters: dict = None) -> List[User]:
+        query = (select(users_table)
+                 .where(*self._user_conditions(filters))
+                 .order_by(users_table.c.created_at, users_table.c.id))
+        with self._connect() as conn:
+            return self._load_users(conn, conn.execute(query).all())
+
+    def get_user_page(self, filters: dict, per_page: int, page: int = 1,
+                      after: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            return self._page(conn, users_table, self._user_conditions(filters), self._load_users,
+                              per_page, page, after)
+
+    def get_user_by_email(self, email: str) -> Optional[User]:
+        return self._get_user_where(users_table.c.email == email)
+
+    def get_user_by_username(self, username: str) -> Optional[User]:
+        return self._get_user_where(users_table.c.username == username)
+
+    def update_user(self, user_id: str, updates: dict) -> Optional[User]:
+        with self.transaction():
+            if not self._update(User, user_id, updates):
+                return None
+            if 'wishlist' in updates:
+                with self._connect() as conn:
+                    self._replace_wishlist(conn, user_id, updates['wishlist'])
+            if updates.keys() & REVIEWER_FIELDS:
+                with self._connect() as conn:
+                    self._bump_review_versions(conn, courses_table.c.id.in_(
+                        select(reviews_table.c.course_id).where(reviews_table.c.user_id == user_id)))
+            return self.get_user(user_id)
+
+    def delete_user(self, user_id: str) -> bool:
+        """Delete a user with their sessions, enrollments, progress and reviews in one transaction"""
+        with self.transaction():
+            with self._connect() as conn:
+                result = conn.execute(delete(users_table).where(users_table.c.id == user_id))
+                if not result.rowcount:
+                    return False
+                self._bump_course_versions(conn, courses_table.c.id.in_(
+                    select(enrollments_table.c.course_id).where(enrollments_table.c.user_id == user_id)))
+                self._bump_review_versions(conn, courses_table.c.id.in_(
+                    select(reviews_table.c.course_id).where(reviews_table.c.user_id == user_id)))
+                conn.execute(delete(enrollments_table).where(enrollments_table.c.user_id == user_id))
+                conn.execute(delete(progress_table).where(progress_table.c.user_id == user_id))
+                conn.execute(delete(reviews_table).where(reviews_table.c.user_id == user_id))
+                conn.execute(delete(sessions_table).where(sessions_table.c.user_id == user_id))
+                conn.execute(delete(wishlist_table).where(wishlist_table.c.user_id == user_id))
+        return True
+
+    # Courses
+
+    def create_course(self, course: Course) -> Course:
+        with self._connect() as conn:
+            conn.execute(insert(courses_table).values(**to_row(course)))
+        return course
+
+    def _load_courses(self, conn, rows) -> List[Course]:
+        """Hydrate courses with their enrollments and section/subsection tree in three queries"""
+        courses = [from_row(Course, row) for row in rows]
+        if not courses:
+            return courses
+        by_id = {course.id: course for course in courses}
+        for course in courses:
+            course.enrolled_students = []
+            course.sections = []
+
+        result = conn.execute(
+            select(enrollments_table.c.course_id, enrollments_table.c.user_id)
+            .where(enrollments_table.c.course_id.in_(list(by_id)))
+            .order_by(enrollments_table.c.enrolled_at)
+        )
+        for course_id, user_id in result:
+            by_id[course_id].enrolled_students.append(user_id)
+
+        sections = self._load_sections(conn, select(sections_table).where(
+            sections_table.c.course_id.in_(list(by_id))))
+        for section in sections:
+            by_id[section.course_id].sections.append(section)
+        return courses
+
+    def _load_sections(self, conn, query) -> List[Section]:
+        rows = conn.execute(query.order_by(sections_table.c.order, sections_table.c.created_at)).all()
+        sections = [from_row(Section, row) for row in rows]
+        if not sections:
+            return sections
+        by_id = {section.id: section for section in sections}
+        for section in sections:
+            section.subsections = []
+        result = conn.execute(
+            select(subsections_table)
+            .where(subsections_table.c.section_id.in_(list(by_id)))
+            .order_by(subsections_table.c.order, subsections_table.c.created_at)
+        )
+        for row in result:
+            subsection = from_row(Subsection, row)
+            by_id[subsection.section_id].subsections.append(subsection)
+        return sections
+
+    def get_course_versions(self, course_id: str) -> Optional[Tuple[int, int]]:
+        """(version, review_version) of a course, without loading its tree"""
+        with self._connect() as conn:
+            row = conn.execute(select(courses_table.c.version, courses_table.c.review_version)
+                               .where(courses_table.c.id == course_id)).first()
+        return tuple(row) if row else None
+
+    def get_course(self, course_id: str) -> Optional[Course]:
+        with self._connect() as conn:
+            rows = conn.execute(select(courses_table).where(courses_table.c.id == course_id)).all()
+            courses = self._load_courses(conn, rows)
+        return courses[0] if courses else None
+
+    def _course_conditions(self, filters: dict) -> list:
+        # Search is a substring match of the whole query, unranked. Unlike the in-memory
+        # BM25 index it does not split terms or normalize Arabic, so results can differ
+        conditions = []
+        for field in FACET_FIELDS:
+            if field in filters:
+                conditions.append(courses_table.c[field] == filters[field])
+        if filters.get('search'):
+            pattern = f"%{filters['search'].lower()}%"
+            conditions.append(or_(
+                func.lower(courses_table.c.title).like(pattern),
+                func.lower(courses_table.c.description).like(pattern),
+                func.lower(cast(courses_table.c.tags, Text)).like(pattern)
+            ))
+        return conditions
+
+    def get_courses(self, filters: dict = None) -> List[Course]:
+        query = (select(courses_table)
+                 .where(*self._course_conditions(filters or {}))
+                 .order_by(courses_table.c.created_at, courses_table.c.id))
+        with self._connect() as conn:
+            return self._load_courses(conn, conn.execute(query).all())
+
+    def get_course_page(self, filters: dict, per_page: int, page: int = 1,
+                        after: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """One catalog page in creation order; search matches are not ranked here"""
+        with self._connect() as conn:
+            return self._page(conn, courses_table, self._course_conditions(filters or {}), self._load_courses,
+                              per_page, page, after)
+
+    def get_course_facets(self, filters: dict = None) -> Dict[str, Any]:
+        conditions = self._course_conditions(filters or {})
+        facets = {}
+        with self._connect() as conn:
+            total = conn.execute(select(func.count()).select_from(courses_table).where(*conditions)).scalar()
+            for field in FACET_FIELDS:
+                column = courses_table.c[field]
+                result = conn.execute(select(column, func.count()).where(*conditions).group_by(column))
+                facets[field] = {value: count for value, count in result}
+        return {'total': total, 'facets': facets}
+
+    def update_course(self, course_id: str, updates: dict) -> Optional[Course]:
+        updates = {key: value for key, value in updates.items() if key not in ('version', 'review_version')}
+        with self.transaction():
+            if not self._update(Course, course_id, updates):
+                return None
+            with self._connect() as conn:
+                self._bump_course_versions(conn, courses_table.c.id == course_id)
+            return self.get_course(course_id)
+
+    def delete_course(self, course_id: str) -> bool:
+        """Delete a course and everything it owns in one transaction; each
+        statement is a set delete over an indexed owner column"""
+        section_ids = select(sections_table.c.id).where(sections_table.c.course_id == course_id)
+        with self.transaction():
+            with self._connect() as conn:
+                result = conn.execute(delete(courses_table).where(courses_table.c.id == course_id))
+                if not result.rowcount:
+                    return False
+                conn.execute(delete(quizzes_table).where(quizzes_table.c.section_id.in_(section_ids)))
+                conn.execute(delete(subsections_table).where(subsections_table.c.section_id.in_(section_ids)))
+                conn.execute(delete(sections_table).where(sections_table.c.course_id == course_id))
+                conn.execute(delete(progress_table).where(progress_table.c.course_id == course_id))
+                conn.execute(delete(reviews_table).where(reviews_table.c.course_id == course_id))
+                conn.execute(delete(enrollments_table).where(enrollments_table.c.course_id == course_id))
+                conn.execute(delete(wishlist_table).where(wishlist_table.c.course_id == course_id))
+        self._outlines.pop(course_id, None)
+        return True
+
+    def sweep_tombstones(self, batch_size: int = None) -> int:
+        """Deletes cascade inside their transaction, so nothing is left to sweep"""
+        return 0
+
+    # Enrollment and statistics
+
+    def enroll(self, user_id: str, course_id: str) -> Optional[Progress]:
+        """Enroll a user in a course, reusing any earlier progress record"""
+        with self.transaction():
+            with self._connect() as conn:
+                exists = conn.execute(
+                    select(enrollments_table.c.user_id).where(
+                        enrollments_table.c.user_id == user_id,
+                        enrollments_table.c.course_id == course_id
+                    )
+                ).first()
+                if exists:
+                    return None
+                conn.execute(insert(enrollments_table).values(
+                    user_id=user_id, course_id=course_id, enrolled_at=datetime.utcnow()))
+                self._bump_course_versions(conn, courses_table.c.id == course_id)
+                progress = self.get_progress(user_id, course_id)
+                if not progress:
+                    progress = self.create_progress(Progress(user_id, course_id))
+                return progress
+
+    def unenroll(self, user_id: str, course_id: str) -> bool:
+        with self._connect() as conn:
+            result = conn.execute(delete(enrollments_table).where(
+                enrollments_table.c.user_id == user_id,
+                enrollments_table.c.course_id == course_id
+            ))
+            if result.rowcount:
+                self._bump_course_versions(conn, courses_table.c.id == course_id)
+        return result.rowcount > 0
+
+    def get_course_stats(self, course_id: str) -> CourseStats:
+        """Aggregate statistics with indexed SQL queries"""
+        stats = CourseStats(course_id)
+        with self._connect() as conn:
+            stats.enrolled_count = conn.execute(
+                select(func.count()).where(enrollments_table.c.course_id == course_id)
+            ).scalar()
+            progress_count, progress_sum, completed_count = conn.execute(
+                select(
+                    func.count(progress_table.c.id),
+                    func.coalesce(func.sum(progress_table.c.progress_percentage), 0.0),
+                    func.count(progress_table.c.completed_at)
+                ).where(progress_table.c.course_id == course_id)
+            ).one()
+            stats.progress_count = progress_count
+            stats.progress_sum = float(progress_sum)
+            stats.completed_count = completed_count
+            result = conn.execute(
+                select(reviews_table.c.rating, func.count())
+                .where(reviews_table.c.course_id == course_id)
+                .group_by(reviews_table.c.rating)
+            )
+            for rating, count in result:
+                stats.review_count += count
+                stats.rating_sum += rating * count
+                if rating in stats.rating_histogram:
+                    stats.rating_histogram[rating] = count
+        return stats
+
+    def check_course_stats(self) -> Dict[str, List[str]]:
+        """Statistics are always computed from the tables, so they cannot drift"""
+        return {}
+
+    def integrity_report(self) -> Dict[str, Any]:
+        """Count rows whose owner no longer exists"""
+        def missing(table, column):
+            return ~select(table.c.id).where(table.c.id == column).exists()
+
+        def count(table, *conditions):
+            return conn.execute(select(func.count()).select_from(table).where(or_(*conditions))).scalar()
+
+        with self._connect() as conn:
+            orphans = {
+                'sections': count(sections_table, missing(courses_table, sections_table.c.course_id)),
+                'subsections': count(subsections_table, missing(sections_table, subsections_table.c.section_id)),
+                'quizzes': count(quizzes_table, missing(sections_table, quizzes_table.c.section_id)),
+                'progress': count(progress_table, missing(users_table, progress_table.c.user_id),
+                                  missing(courses_table, progress_table.c.course_id)),
+                'reviews': count(reviews_table, missing(users_table, reviews_table.c.user_id),
+                                 missing(courses_table, reviews_table.c.course_id)),
+                'sessions': count(sessions_table, missing(users_table, sessions_table.c.user_id)),
+                'enrollments': count(enrollments_table, missing(users_table, enrollments_table.c.user_id),
+                                     missing(courses_table, enrollments_table.c.course_id)),
+                'wishlist_entries': count(wishlist_table, missing(users_table, wishlist_table.c.user_id),
+                                          missing(courses_table, wishlist_table.c.course_id)),
+                'course_stats': 0
+            }
+        return {
+            'orphans': orphans,
+            'total_orphans': sum(orphans.values()),
+            'tombstones': {'courses': 0, 'records': 0}
+        }
+
+    # Course content
+
+    def create_section(self, section: Section) -> Section:
+        with self._connect() as conn:
+            conn.execute(insert(sections_table).values(**to_row(section)))
+            self._bump_course_versions(conn, courses_table.c.id == section.course_id)
+        return section
+
+    def get_section(self, section_id: str) -> Optional[Section]:
+        with self._connect() as conn:
+            sections = self._load_sections(conn, select(sections_table).where(sections_table.c.id == section_id))
+        return sections[0] if sections else None
+
+    def get_sections_by_course(self, course_id: str) -> List[Section]:
+        with self._connect() as conn:
+            return self._load_sections(conn, select(sections_table).where(sections_table.c.course_id == course_id))
+
+    def create_subsection(self, subsection: Subsection) -> Subsection:
+        with self._connect() as conn:
+            conn.execute(insert(subsections_table).values(**to_row(subsection)))
+            self._bump_course_versions(conn, courses_table.c.id == self._section_course_id(subsection.section_id))
+        return subsection
+
+    @staticmethod
+    def _section_course_id(section_id):
+        return select(sections_table.c.course_id).where(sections_table.c.id == section_id).scalar_subquery()
+
+    def get_subsection(self, subsection_id: str) -> Optional[Subsection]:
+        return self._get(Subsection, subsection_id)
+
+    def create_quiz(self, quiz: Quiz) -> Quiz:
+        with self._connect() as conn:
+            conn.execute(insert(quizzes_table).values(**to_row(quiz)))
+        return quiz
+
+    def get_quiz(self, quiz_id: str) -> Optional[Quiz]:
+        return self._get(Quiz, quiz_id)
+
+    # Progress and reviews
+
+    def create_progress(self, progress: Progress) -> Progress:
+        with self._connect() as conn:
+            conn.execute(insert(progress_table).values(**to_row(progress)))
+        return progress
+
+    def get_progress(self, user_id: str, course_id: str) -> Optional[Progress]:
+        with self._connect() as conn:
+            row = conn.execute(select(progress_table).where(
+                progress_table.c.user_id == user_id,
+                progress_table.c.course_id == course_id
+            )).first()
+        return from_row(Progress, row) if row else None
+
+    def get_user_progress(self, user_id: str) -> List[Progress]:
+        with self._connect() as conn:
+            rows = conn.execute(select(progress_table).where(progress_table.c.user_id == user_id)).all()
+        return [from_row(Progress, row) for row in rows]
+
+    def update_progress(self, progress_id: str, updates: dict) -> Optional[Progress]:
+        with self.transaction():
+            if not self._update(Progress, progress_id, updates):
+                return None
+            return self._get(Progress, progress_id)
+
+    def _lock_progress(self, conn, condition) -> Optional[Progress]:
+        """Read a progress row with a row lock held until the transaction ends"""
+        row = conn.execute(select(progress_table).where(condition).with_for_update()).first()
+        return from_row(Progress, row) if row else None
+
+    def record_quiz_attempt(self, progress_id: str, quiz_id: str, attempt: dict) -> Optional[Progress]:
+        with self.transaction():
+            with self._connect() as conn:
+                progress = self._lock_progress(conn, progress_table.c.id == progress_id)
+            if not progress:
+                return None
+            quiz_attempts = dict(progress.quiz_attempts)
+            quiz_attempts[quiz_id] = quiz_attempts.get(quiz_id, []) + [attempt]
+            return self.update_progress(progress_id, {'quiz_attempts': quiz_attempts, 'last_accessed': time.time()})
+
+    def add_watch_time(self, entries: Iterable[Tuple[str, str, int, Optional[str], float]]) -> int:
+        written = 0
+        with self.transaction():
+            with self._connect() as conn:
+                for user_id, course_id, minutes, subsection_id, last_accessed in entries:
+                    seen = to_column_value(progress_table.c.last_accessed, last_accessed)
+                    newer = progress_table.c.last_accessed < seen
+                    values = {
+                        'total_time_spent': progress_table.c.total_time_spent + minutes,
+                        'last_accessed': case((newer, seen), else_=progress_table.c.last_accessed)
+                    }
+                    if subsection_id:
+                        values['current_subsection_id'] = case(
+                            (newer, subsection_id), else_=progress_table.c.current_subsection_id)
+                    written += conn.execute(
+                        update(progress_table)
+                        .where((progress_table.c.user_id == user_id) & (progress_table.c.course_id == course_id))
+                        .values(**values)
+                    ).rowcount
+        return written
+
+    def modify_progress(self, user_id: str, course_id: str,
+                        modify: Callable[[Progress], dict]) -> Optional[Progress]:
+        with self.transaction():
+            progress = self._lock_user_progress(user_id, course_id)
+            if not progress:
+                return None
+            updates = modify(progress)
+            if 'user_id' in updates or 'course_id' in updates:
+                raise ValueError('modify_progress cannot change user_id or course_id')
+            return self.update_progress(progress.id, updates) if updates else progress
+
+    def _lock_user_progress(self, user_id: str, course_id: str) -> Optional[Progress]:
+        with self._connect() as conn:
+            return self._lock_progress(conn, (progress_table.c.user_id == user_id)
+                                       & (progress_table.c.course_id == course_id))
+
+    def course_outline(self, course_id: str) -> Optional[CourseOutline]:
+        with self._connect() as conn:
+            version = conn.execute(select(courses_table.c.version).where(courses_table.c.id == course_id)).scalar()
+        if version is None:
+            self._outlines.pop(course_id, None)
+            return None
+        cached = self._outlines.get(course_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        course = self.get_course(course_id)
+        if not course:
+            return None
+        outline = CourseOutline.from_course(course)
+        self._outlines[course_id] = (course.version, outline)
+        return outline
+
+    def completion_mask(self, progress: Progress, outline: CourseOutline) -> int:
+        return outline.mask(progress.completed_subsections)
+
+    def complete_subsection(self, user_id: str, course_id: str, subsection_id: str) -> Optional[Progress]:
+        with self.transaction():
+            progress = self._lock_user_progress(user_id, course_id)
+            subsection = self.get_subsection(subsection_id)
+            section = self.get_section(subsection.section_id) if subsection else None
+            outline = self.course_outline(course_id)
+            if not progress or not section or section.course_id != course_id or not outline:
+                return None
+            mask = outline.mask(progress.completed_subsections)
+            bit = outline.bit(subsection_id)
+            if mask & bit:
+                return progress
+            mask |= bit
+            completed_subsections = progress.completed_subsections | {subsection_id}
+            completed_sections = progress.completed_sections
+            if section.id not in completed_sections and outline.section_complete(mask, section.id):
+                completed_sections = completed_sections | {section.id}
+            updates = completion_updates(completed_sections, completed_subsections, outline.percentage(mask))
+            updates['current_subsection_id'] = subsection_id
+            updates['current_section_id'] = section.id
+            return self.update_progress(progress.id, updates)
+
+    def complete_section(self, user_id: str, course_id: str, section_id: str) -> Optional[Progress]:
+        with self.transaction():
+            progress = self._lock_user_progress(user_id, course_id)
+            section = self.get_section(section_id)
+            outline = self.course_outline(course_id)
+            if not progress or not section or section.course_id != course_id or not outline:
+                return None
+            if section_id in progress.completed_sections:
+                return progress
+            section_mask = outline.section_mask(section_id)
+            mask = outline.mask(progress.completed_subsections) | section_mask
+            completed_subsections = progress.completed_subsections | outline.ids(section_mask)
+            updates = completion_updates(progress.completed_sections | {section_id}, completed_subsections,
+                                         outline.percentage(mask))
+            return self.update_progress(progress.id, updates)
+
+    def create_review(self, review: Review) -> Review:
+        with self._connect() as conn:
+            conn.execute(insert(reviews_table).values(**to_row(review)))
+            self._bump_review_versions(conn, courses_table.c.id == review.course_id)
+        return review
+
+    def get_reviews_by_course(self, course_id: str) -> List[Review]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                select(reviews_table)
+                .where(reviews_table.c.course_id == course_id)
+                .order_by(reviews_table.c.created_at)
+            ).all()
+        return [from_row(Review, row) for row in rows]
+
+    # Sessions
+
+    def create_session(self, token: str, user_id: str, created_at: float = None, last_seen: float = None):
+        created_at = created_at if created_at is not None else time.time()
+        last_seen = last_seen if last_seen is not None else created_at
+        with self.transaction():
+            with self._connect() as conn:
+                conn.execute(insert(sessions_table).values(
+                    token=token, user_id=user_id,
+                    created_at=datetime.utcfromtimestamp(created_at),
+                    last_seen=datetime.utcfromtimestamp(last_seen),
+                    expires_at=self._session_expiry(created_at, last_seen)))
+                # Keep only the newest sessions of this user
+                if Config.SESSION_MAX_PER_USER:
+                    keep = (select(sessions_table.c.token)
+                            .where(sessions_table.c.user_id == user_id)
+                            .order_by(sessions_table.c.created_at.desc())
+                            .limit(Config.SESSION_MAX_PER_USER))
+                    conn.execute(delete(sessions_table).where(
+                        sessions_table.c.user_id == user_id,
+                        sessions_table.c.token.not_in(keep.scalar_subquery())
+                    ))
+
+    @staticmethod
+    def _session_expiry(created_at: float, last_seen: float) -> datetime:
+        return datetime.utcfromtimestamp(min(last_seen + Config.SESSION_IDLE_TTL,
+                                             created_at + Config.SESSION_ABSOLUTE_TTL))
+
+    def get_user_by_token(self, token: str) -> Optional[User]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                select(sessions_table.c.user_id, sessions_table.c.created_at, sessions_table.c.last_seen)
+                .where(sessions_table.c.token == token,
+                       sessions_table.c.expires_at > datetime.utcfromtimestamp(now))
+            ).first()
+        if not row:
+            return None
+        # Slide the idle expiry forward. The touch is its own statement so a
+        # plain authenticated read never waits for the SQLite write lock
+        last_seen = from_column_value(sessions_table.c.last_seen, row.last_seen)
+        if now - last_seen >= SESSION_TOUCH_INTERVAL:
+            created_at = from_column_value(sessions_table.c.created_at, row.created_at)
+            with self._connect() as conn:
+                conn.execute(update(sessions_table).where(sessions_table.c.token == token).values(
+                    last_seen=datetime.utcfromtimestamp(now),
+                    expires_at=self._session_expiry(created_at, now)))
+        return self.get_user(row.user_id)
+
+    def delete_session(self, token: str) -> bool:
+        with self._connect() as conn:
+            result = conn.execute(delete(sessions_table).where(sessions_table.c.token == token))
+        return result.rowcount > 0
+
+    def reap_sessions(self) -> int:
+        """Delete expired sessions through the expires_at index"""
+        with self._connect() as conn:
+            result = conn.execute(delete(sessions_table).where(
+                sessions_table.c.expires_at <= datetime.utcfromtimestamp(time.time())))
+        return result.rowcount
+
+    # Batching
+
+    def bulk_create(self, items: Iterable[Any]) -> int:
+        """Insert many entities with one executemany per table in a single transaction"""
+        rows_by_model: Dict[type, List[Dict[str, Any]]] = {}
+        wishlists: List[Dict[str, Any]] = []
+        for item in items:
+            rows_by_model.setdefault(type(item), []).append(to_row(item))
+            if isinstance(item, User) and item.wishlist:
+                wishlists += wishlist_rows(item.id, item.wishlist)
+        with self.transaction():
+            with self._connect() as conn:
+                for model in BULK_ORDER:
+                    rows = rows_by_model.get(model)
+                    if rows:
+                        conn.execute(insert(MODEL_TABLES[model]), rows)
+                if wishlists:
+                    conn.execute(insert(wishlist_table), wishlists)
+                # New content changes the serialized tree of existing courses
+                section_ids = {row['section_id'] for row in rows_by_model.get(Subsection, [])}
+                course_ids = {row['course_id'] for row in rows_by_model.get(Section, [])}
+                if section_ids:
+                    course_ids.update(conn.execute(
+                        select(sections_table.c.course_id).where(sections_table.c.id.in_(section_ids))
+                    ).scalars())
+                if course_ids:
+                    self._bump_course_versions(conn, courses_table.c.id.in_(course_ids))
+                reviewed_ids = {row['course_id'] for row in rows_by_model.get(Review, [])}
+                if reviewed_ids:
+                    self._bump_review_versions(conn, courses_table.c.id.in_(reviewed_ids))
+        return sum(len(rows) for rows in rows_by_model.values())
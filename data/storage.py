@@ -1,9 +1,21 @@
 """
-In-memory storage for MVP. In production, this would be replaced with MongoDB.
+In-memory storage for MVP. Set PERSISTENCE_DIR to keep it across restarts
+(data/persistence.py), or STORAGE_BACKEND=sql to use the SQL backend in
+data/sql_storage.py instead.
 """
-from typing import Dict, List, Optional
-from models import User, Course, Section, Subsection, Quiz, Progress, Review
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from models import User, Course, Section, Subsection, Quiz, Progress, Review, REVIEWER_FIELDS
+from config import Config
+from data.course_stats import CourseStats
+from data.search import SearchIndex
+from data.facets import FacetIndex, FACET_FIELDS
+from data.sessions import SessionStore, start_reaper
+from data.locks import LockStripes
+from data.outline import CourseOutline
+from utils.helpers import completion_updates, creation_order_key, paginate_after, paginate_results
 import threading
+import time
 
 class InMemoryStorage:
     def __init__(self):
@@ -14,74 +26,217 @@ class InMemoryStorage:
         self.quizzes: Dict[str, Quiz] = {}
         self.progress: Dict[str, Progress] = {}
         self.reviews: Dict[str, Review] = {}
-        self.user_sessions: Dict[str, str] = {}  # token -> user_id
-        self._lock = threading.Lock()
+        self.sessions = SessionStore(
+            Config.SESSION_IDLE_TTL, Config.SESSION_ABSOLUTE_TTL, Config.SESSION_MAX_PER_USER)
+        self.course_stats: Dict[str, CourseStats] = {}
+        self.search_index = SearchIndex()
+        self.facet_index = FacetIndex()
+        # Secondary indexes, maintained under _lock by every mutating method.
+        # Progress records are updated under per-record stripes instead, and the
+        # course aggregates they feed under _stats_lock (always taken last).
+        self._user_ids_by_email: Dict[str, str] = {}
+        self._user_ids_by_username: Dict[str, str] = {}
+        # One-to-many indexes map an owner id to an ordered set ({child_id: None}),
+        # so cascading deletes find and unlink children in O(children)
+        self._progress_ids_by_user_course: Dict[Tuple[str, str], str] = {}
+        self._progress_ids_by_user: Dict[str, Dict[str, None]] = {}
+        self._progress_ids_by_course: Dict[str, Dict[str, None]] = {}
+        self._section_ids_by_course: Dict[str, Dict[str, None]] = {}
+        self._quiz_ids_by_section: Dict[str, Dict[str, None]] = {}
+        self._review_ids_by_course: Dict[str, Dict[str, None]] = {}
+        self._review_ids_by_user: Dict[str, Dict[str, None]] = {}
+        self._wishlist_user_ids_by_course: Dict[str, Dict[str, None]] = {}
+        # Deleted courses whose records are still being swept, oldest first
+        self._tombstones: Dict[str, None] = {}
+        # Subsection ordinals per course, built on first use and then kept up to date,
+        # and each progress record's completion bitset for its current completed set
+        self._outlines: Dict[str, CourseOutline] = {}
+        self._completion_masks: Dict[str, Tuple[frozenset, CourseOutline, int]] = {}
+        self._lock = threading.RLock()
+        self._progress_locks = LockStripes(Config.LOCK_STRIPES)
+        self._stats_lock = threading.RLock()
+
+    @staticmethod
+    def _index_add(index: Dict[str, Dict[str, None]], key: str, value: str):
+        index.setdefault(key, {})[value] = None
+
+    @staticmethod
+    def _index_remove(index: Dict[str, Dict[str, None]], key: str, value: str):
+        values = index.get(key)
+        if values is not None:
+            values.pop(value, None)
+            if not values:
+                del index[key]
 
     def create_user(self, user: User) -> User:
         with self._lock:
             self.users[user.id] = user
+            self._user_ids_by_email[user.email] = user.id
+            self._user_ids_by_username[user.username] = user.id
+            for course_id in user.wishlist:
+                self._index_add(self._wishlist_user_ids_by_course, course_id, user.id)
             return user
 
     def get_user(self, user_id: str) -> Optional[User]:
         return self.users.get(user_id)
 
+    def get_users(self, filters: dict = None) -> List[User]:
+        users = list(self.users.values())
+        if filters and 'role' in filters:
+            users = [u for u in users if u.role == filters['role']]
+        return users
+
+    def get_user_page(self, filters: dict, per_page: int, page: int = 1,
+                      after: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """One page of users in creation order; None when the after cursor is not a user"""
+        users = sorted(self.get_users(filters), key=creation_order_key)
+        if not after:
+            return paginate_results(users, page, per_page)
+        anchor = self.users.get(after)
+        if not anchor:
+            return None
+        return paginate_after(users, creation_order_key(anchor), per_page, creation_order_key)
+
     def get_user_by_email(self, email: str) -> Optional[User]:
-        for user in self.users.values():
-            if user.email == email:
-                return user
+        user_id = self._user_ids_by_email.get(email)
+        if user_id:
+            return self.users.get(user_id)
         return None
 
     def get_user_by_username(self, username: str) -> Optional[User]:
-        for user in self.users.values():
-            if user.username == username:
-                return user
+        user_id = self._user_ids_by_username.get(username)
+        if user_id:
+            return self.users.get(user_id)
         return None
 
     def update_user(self, user_id: str, updates: dict) -> Optional[User]:
         with self._lock:
             user = self.users.get(user_id)
             if user:
+                old_email, old_username, old_wishlist = user.email, user.username, user.wishlist
                 for key, value in updates.items():
                     if hasattr(user, key):
                         setattr(user, key, value)
+                if user.email != old_email:
+                    if self._user_ids_by_email.get(old_email) == user_id:
+                        del self._user_ids_by_email[old_email]
+                    self._user_ids_by_email[user.email] = user_id
+                if user.username != old_username:
+                    if self._user_ids_by_username.get(old_username) == user_id:
+                        del self._user_ids_by_username[old_username]
+                    self._user_ids_by_username[user.username] = user_id
+                if user.wishlist is not old_wishlist:
+                    for course_id in old_wishlist:
+                        self._index_remove(self._wishlist_user_ids_by_course, course_id, user_id)
+                    for course_id in user.wishlist:
+                        self._index_add(self._wishlist_user_ids_by_course, course_id, user_id)
+                if updates.keys() & REVIEWER_FIELDS:
+                    # Review listings show the reviewer's name and profile
+                    reviewed = {self.reviews[review_id].course_id
+                                for review_id in self._review_ids_by_user.get(user_id, ())}
+                    for course_id in reviewed:
+                        course = self.courses.get(course_id)
+                        if course:
+                            course.review_version += 1
                 return user
             return None
 
     def delete_user(self, user_id: str) -> bool:
+        """Delete a user with their sessions, enrollments, progress and reviews"""
         with self._lock:
-            if user_id in self.users:
-                del self.users[user_id]
-                return True
-            return False
+            user = self.users.pop(user_id, None)
+            if not user:
+                return False
+            if self._user_ids_by_email.get(user.email) == user_id:
+                del self._user_ids_by_email[user.email]
+            if self._user_ids_by_username.get(user.username) == user_id:
+                del self._user_ids_by_username[user.username]
+            self.sessions.delete_user(user_id)
+            for course_id in user.wishlist:
+                self._index_remove(self._wishlist_user_ids_by_course, course_id, user_id)
+            for course_id in user.enrolled_courses:
+                course = self.courses.get(course_id)
+                if course and user_id in course.enrolled_students:
+                    course.enrolled_students.remove(user_id)
+                    course.version += 1
+                    with self._stats_lock:
+                        self._stats_for(course_id).enrolled_count -= 1
+            for progress_id in list(self._progress_ids_by_user.get(user_id, ())):
+                self._remove_progress(progress_id)
+            for review_id in list(self._review_ids_by_user.get(user_id, ())):
+                self._remove_review(review_id)
+            return True
 
     def create_course(self, course: Course) -> Course:
         with self._lock:
             self.courses[course.id] = course
+            self.course_stats[course.id] = CourseStats.from_records(course, [], [])
+            self.search_index.add(course)
+            self.facet_index.add(course)
             return course
 
     def get_course(self, course_id: str) -> Optional[Course]:
         return self.courses.get(course_id)
 
+    def get_course_versions(self, course_id: str) -> Optional[Tuple[int, int]]:
+        """(version, review_version) of a course, for cache validators"""
+        course = self.courses.get(course_id)
+        return (course.version, course.review_version) if course else None
+
     def get_courses(self, filters: dict = None) -> List[Course]:
-        courses = list(self.courses.values())
+        """Get courses matching filters; a 'search' filter returns them ranked by relevance"""
+        filters = filters or {}
+        course_ids = self._filter_course_ids(filters)
         
-        if filters:
-            if 'category' in filters:
-                courses = [c for c in courses if c.category == filters['category']]
-            if 'level' in filters:
-                courses = [c for c in courses if c.level == filters['level']]
-            if 'instructor_id' in filters:
-                courses = [c for c in courses if c.instructor_id == filters['instructor_id']]
-            if 'published' in filters:
-                courses = [c for c in courses if c.published == filters['published']]
-            if 'search' in filters:
-                search_term = filters['search'].lower()
-                courses = [c for c in courses if 
-                          search_term in c.title.lower() or 
-                          search_term in c.description.lower() or
-                          any(search_term in tag.lower() for tag in c.tags)]
+        if 'search' in filters:
+            ranked = self.search_index.search(filters['search'])
+            return [self.courses[course_id] for course_id, _ in ranked
+                    if course_id in self.courses and (course_ids is None or course_id in course_ids)]
         
-        return courses
+        if course_ids is None:
+            return list(self.courses.values())
+        return [self.courses[course_id] for course_id in course_ids if course_id in self.courses]
+
+    def get_course_page(self, filters: dict, per_page: int, page: int = 1,
+                        after: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """One catalog page in a stable order: by relevance when searching, else
+        by creation. None when the after cursor is not a course in that order"""
+        courses = self.get_courses(filters)
+        if 'search' in filters:
+            ranks = {course.id: rank for rank, course in enumerate(courses)}
+            sort_key = lambda course: ranks[course.id]
+        else:
+            courses.sort(key=creation_order_key)
+            sort_key = creation_order_key
+        if not after:
+            return paginate_results(courses, page, per_page)
+        anchor = self.get_course(after)
+        if not anchor or ('search' in filters and after not in ranks):
+            return None
+        return paginate_after(courses, sort_key(anchor), per_page, sort_key)
+
+    def get_course_facets(self, filters: dict = None) -> Dict[str, Any]:
+        """Count matching courses per facet value for the given filters"""
+        filters = filters or {}
+        course_ids = self._filter_course_ids(filters)
+        
+        if 'search' in filters:
+            ranked = self.search_index.search(filters['search'])
+            course_ids = [course_id for course_id, _ in ranked
+                          if course_ids is None or course_id in course_ids]
+        elif course_ids is None:
+            course_ids = list(self.courses)
+        
+        return {
+            'total': len(course_ids),
+            'facets': self.facet_index.counts(course_ids)
+        }
+
+    def _filter_course_ids(self, filters: dict) -> Optional[Set[str]]:
+        facet_filters = {key: value for key, value in filters.items() if key in FACET_FIELDS}
+        if not facet_filters:
+            return None
+        return self.facet_index.filter(facet_filters)
 
     def update_course(self, course_id: str, updates: dict) -> Optional[Course]:
         with self._lock:
@@ -90,30 +245,252 @@ class InMemoryStorage:
                 for key, value in updates.items():
                     if hasattr(course, key):
                         setattr(course, key, value)
+                course.version += 1
+                if updates.keys() & {'title', 'description', 'tags'}:
+                    self.search_index.add(course)
+                if updates.keys() & set(FACET_FIELDS):
+                    self.facet_index.add(course)
                 return course
             return None
 
     def delete_course(self, course_id: str) -> bool:
+        """Delete a course and everything it owns. A course owning more than
+        CASCADE_SYNC_LIMIT records disappears at once and leaves a tombstone;
+        sweep_tombstones then removes its records in batches."""
         with self._lock:
-            if course_id in self.courses:
-                del self.courses[course_id]
-                return True
-            return False
+            course = self.courses.pop(course_id, None)
+            if not course:
+                return False
+            for user_id in course.enrolled_students:
+                user = self.users.get(user_id)
+                if user and course_id in user.enrolled_courses:
+                    user.enrolled_courses.remove(course_id)
+            for user_id in self._wishlist_user_ids_by_course.pop(course_id, ()):
+                user = self.users.get(user_id)
+                if user:
+                    user.wishlist = [c for c in user.wishlist if c != course_id]
+            with self._stats_lock:
+                self.course_stats.pop(course_id, None)
+            self._outlines.pop(course_id, None)
+            self.search_index.remove(course_id)
+            self.facet_index.remove(course_id)
+            if self._owned_count(course_id) > Config.CASCADE_SYNC_LIMIT:
+                self._tombstones[course_id] = None
+            else:
+                self._purge_course(course_id)
+            return True
+
+    def _owned_count(self, course_id: str) -> int:
+        count = len(self._progress_ids_by_course.get(course_id, ()))
+        count += len(self._review_ids_by_course.get(course_id, ()))
+        for section_id in self._section_ids_by_course.get(course_id, ()):
+            section = self.sections.get(section_id)
+            count += 1 + (len(section.subsections) if section else 0)
+            count += len(self._quiz_ids_by_section.get(section_id, ()))
+        return count
+
+    def _purge_course(self, course_id: str, limit: Optional[int] = None) -> Tuple[int, bool]:
+        """Remove up to limit records of a deleted course; returns (removed, done).
+        Callers hold _lock."""
+        removed = 0
+        progress_ids = self._progress_ids_by_course.get(course_id, {})
+        while progress_ids and (limit is None or removed < limit):
+            self._remove_progress(next(iter(progress_ids)), update_stats=False)
+            removed += 1
+        review_ids = self._review_ids_by_course.get(course_id, {})
+        while review_ids and (limit is None or removed < limit):
+            self._remove_review(next(iter(review_ids)), update_stats=False)
+            removed += 1
+        section_ids = self._section_ids_by_course.get(course_id, {})
+        while section_ids and (limit is None or removed < limit):
+            section_id = next(iter(section_ids))
+            section = self.sections.get(section_id)
+            if section is None:
+                self._index_remove(self._section_ids_by_course, course_id, section_id)
+                continue
+            quiz_ids = self._quiz_ids_by_section.get(section_id, {})
+            while quiz_ids and (limit is None or removed < limit):
+                quiz_id = next(iter(quiz_ids))
+                self.quizzes.pop(quiz_id, None)
+                self._index_remove(self._quiz_ids_by_section, section_id, quiz_id)
+                removed += 1
+            while section.subsections and (limit is None or removed < limit):
+                self.subsections.pop(section.subsections.pop().id, None)
+                removed += 1
+            if quiz_ids or section.subsections or (limit is not None and removed >= limit):
+                break
+            del self.sections[section_id]
+            self._index_remove(self._section_ids_by_course, course_id, section_id)
+            removed += 1
+        done = course_id not in self._progress_ids_by_course and course_id not in self._review_ids_by_course \
+            and course_id not in self._section_ids_by_course
+        if done:
+            self._tombstones.pop(course_id, None)
+            with self._stats_lock:
+                # An update that raced the delete may have recreated the aggregate
+                self.course_stats.pop(course_id, None)
+        return removed, done
+
+    def sweep_tombstones(self, batch_size: int = None) -> int:
+        """Remove the records of deleted courses, releasing the lock between batches"""
+        batch_size = batch_size or Config.TOMBSTONE_SWEEP_BATCH
+        removed = 0
+        while self._tombstones:
+            with self._lock:
+                if not self._tombstones:
+                    break
+                count, _ = self._purge_course(next(iter(self._tombstones)), batch_size)
+            removed += count
+        return removed
+
+    def _remove_progress(self, progress_id: str, update_stats: bool = True):
+        # Callers hold _lock; the stripe keeps in-flight updates of the record out
+        with self._progress_locks.for_key(progress_id):
+            progress = self.progress.pop(progress_id, None)
+            if progress is None:
+                return
+            self._unindex_progress(progress)
+            self._completion_masks.pop(progress_id, None)
+            if update_stats and progress.course_id in self.courses:
+                with self._stats_lock:
+                    self._stats_for(progress.course_id).remove_progress(
+                        progress.progress_percentage, progress.completed_at is not None)
+
+    def _remove_review(self, review_id: str, update_stats: bool = True):
+        review = self.reviews.pop(review_id, None)
+        if review is None:
+            return
+        self._index_remove(self._review_ids_by_course, review.course_id, review_id)
+        self._index_remove(self._review_ids_by_user, review.user_id, review_id)
+        course = self.courses.get(review.course_id)
+        if course:
+            course.review_version += 1
+        if update_stats and course:
+            with self._stats_lock:
+                self._stats_for(review.course_id).remove_review(review.rating)
+
+    def enroll(self, user_id: str, course_id: str, progress: Progress = None) -> Optional[Progress]:
+        """Enroll a user in a course, reusing any earlier progress record
+        or else storing the given (or a new) one"""
+        with self._lock:
+            user = self.users.get(user_id)
+            course = self.courses.get(course_id)
+            if not user or not course or user_id in course.enrolled_students:
+                return None
+            course.enrolled_students.append(user_id)
+            course.version += 1
+            user.enrolled_courses.append(course_id)
+            with self._stats_lock:
+                self._stats_for(course_id).enrolled_count += 1
+
+            existing = self.get_progress(user_id, course_id)
+            if existing:
+                return existing
+            progress = progress or Progress(user_id, course_id)
+            self.progress[progress.id] = progress
+            self._index_progress(progress)
+            self._stats_add_progress(progress)
+            return progress
+
+    def unenroll(self, user_id: str, course_id: str) -> bool:
+        with self._lock:
+            user = self.users.get(user_id)
+            course = self.courses.get(course_id)
+            if not user or not course or user_id not in course.enrolled_students:
+                return False
+            course.enrolled_students.remove(user_id)
+            course.version += 1
+            if course_id in user.enrolled_courses:
+                user.enrolled_courses.remove(course_id)
+            with self._stats_lock:
+                self._stats_for(course_id).enrolled_count -= 1
+            return True
+
+    def get_course_stats(self, course_id: str) -> CourseStats:
+        return self.course_stats.get(course_id) or CourseStats(course_id)
+
+    def check_course_stats(self) -> Dict[str, List[str]]:
+        """Recompute every course aggregate from scratch and report mismatches"""
+        with self._lock, self._progress_locks.all():
+            progress_by_course: Dict[str, List[Progress]] = {}
+            for progress in self.progress.values():
+                progress_by_course.setdefault(progress.course_id, []).append(progress)
+
+            mismatches = {}
+            for course_id, course in self.courses.items():
+                expected = CourseStats.from_records(
+                    course,
+                    progress_by_course.get(course_id, []),
+                    self.get_reviews_by_course(course_id)
+                )
+                diff = self.get_course_stats(course_id).diff(expected)
+                if diff:
+                    mismatches[course_id] = diff
+            return mismatches
+
+    def integrity_report(self) -> Dict[str, Any]:
+        """Count records whose owner no longer exists. Records of deleted courses
+        that are still being swept are reported as tombstoned, not orphaned."""
+        with self._lock, self._progress_locks.all():
+            courses = self.courses.keys() | self._tombstones.keys()
+            orphans = {
+                'sections': sum(1 for s in self.sections.values() if s.course_id not in courses),
+                'subsections': sum(1 for s in self.subsections.values() if s.section_id not in self.sections),
+                'quizzes': sum(1 for q in self.quizzes.values() if q.section_id not in self.sections),
+                'progress': sum(1 for p in self.progress.values()
+                                if p.user_id not in self.users or p.course_id not in courses),
+                'reviews': sum(1 for r in self.reviews.values()
+                               if r.user_id not in self.users or r.course_id not in courses),
+                'sessions': sum(1 for session in self.sessions.live_sessions() if session.user_id not in self.users),
+                'enrollments': sum(1 for c in self.courses.values() for user_id in c.enrolled_students
+                                   if user_id not in self.users)
+                               + sum(1 for u in self.users.values() for course_id in u.enrolled_courses
+                                     if course_id not in self.courses),
+                'wishlist_entries': sum(1 for u in self.users.values() for course_id in u.wishlist
+                                        if course_id not in self.courses),
+                'course_stats': sum(1 for course_id in self.course_stats if course_id not in courses)
+            }
+            return {
+                'orphans': orphans,
+                'total_orphans': sum(orphans.values()),
+                'tombstones': {
+                    'courses': len(self._tombstones),
+                    'records': sum(self._owned_count(course_id) for course_id in self._tombstones)
+                }
+            }
+
+    def _stats_for(self, course_id: str) -> CourseStats:
+        # Callers hold _stats_lock
+        stats = self.course_stats.get(course_id)
+        if stats is None:
+            stats = self.course_stats[course_id] = CourseStats(course_id)
+        return stats
+
+    def _stats_add_progress(self, progress: Progress):
+        with self._stats_lock:
+            self._stats_for(progress.course_id).add_progress(
+                progress.progress_percentage, progress.completed_at is not None)
 
     def create_section(self, section: Section) -> Section:
         with self._lock:
             self.sections[section.id] = section
+            self._index_add(self._section_ids_by_course, section.course_id, section.id)
             # Add to course
             course = self.courses.get(section.course_id)
             if course:
                 course.sections.append(section)
+                course.version += 1
+                outline = self._outlines.get(course.id)
+                if outline:
+                    outline.add_section(section.id)
             return section
 
     def get_section(self, section_id: str) -> Optional[Section]:
         return self.sections.get(section_id)
 
     def get_sections_by_course(self, course_id: str) -> List[Section]:
-        return [s for s in self.sections.values() if s.course_id == course_id]
+        section_ids = self._section_ids_by_course.get(course_id, ())
+        return [self.sections[section_id] for section_id in section_ids]
 
     def create_subsection(self, subsection: Subsection) -> Subsection:
         with self._lock:
@@ -122,6 +499,12 @@ class InMemoryStorage:
             section = self.sections.get(subsection.section_id)
             if section:
                 section.subsections.append(subsection)
+                course = self.courses.get(section.course_id)
+                if course:
+                    course.version += 1
+                    outline = self._outlines.get(course.id)
+                    if outline:
+                        outline.add_subsection(section.id, subsection.id)
             return subsection
 
     def get_subsection(self, subsection_id: str) -> Optional[Subsection]:
@@ -130,6 +513,7 @@ class InMemoryStorage:
     def create_quiz(self, quiz: Quiz) -> Quiz:
         with self._lock:
             self.quizzes[quiz.id] = quiz
+            self._index_add(self._quiz_ids_by_section, quiz.section_id, quiz.id)
             return quiz
 
     def get_quiz(self, quiz_id: str) -> Optional[Quiz]:
@@ -138,51 +522,277 @@ class InMemoryStorage:
     def create_progress(self, progress: Progress) -> Progress:
         with self._lock:
             self.progress[progress.id] = progress
+            self._index_progress(progress)
+            self._stats_add_progress(progress)
             return progress
 
     def get_progress(self, user_id: str, course_id: str) -> Optional[Progress]:
-        for progress in self.progress.values():
-            if progress.user_id == user_id and progress.course_id == course_id:
-                return progress
+        progress_id = self._progress_ids_by_user_course.get((user_id, course_id))
+        if progress_id and course_id not in self._tombstones:
+            return self.progress.get(progress_id)
         return None
 
     def get_user_progress(self, user_id: str) -> List[Progress]:
-        return [p for p in self.progress.values() if p.user_id == user_id]
+        progress_ids = self._progress_ids_by_user.get(user_id, ())
+        progress = [self.progress[progress_id] for progress_id in progress_ids]
+        if self._tombstones:
+            progress = [p for p in progress if p.course_id not in self._tombstones]
+        return progress
+
+    @contextmanager
+    def _locked_progress(self, progress_id: str, updates: dict = None):
+        """Lock one progress record; moving it to another user or course also needs the index lock"""
+        if updates and ('user_id' in updates or 'course_id' in updates):
+            with self._lock, self._progress_locks.for_key(progress_id):
+                yield
+        else:
+            with self._progress_locks.for_key(progress_id):
+                yield
 
     def update_progress(self, progress_id: str, updates: dict) -> Optional[Progress]:
-        with self._lock:
+        with self._locked_progress(progress_id, updates):
             progress = self.progress.get(progress_id)
             if progress:
+                reindex = 'user_id' in updates or 'course_id' in updates
+                if reindex:
+                    self._unindex_progress(progress)
+                old_course_id = progress.course_id
+                old_percentage, old_completed = progress.progress_percentage, progress.completed_at is not None
                 for key, value in updates.items():
                     if hasattr(progress, key):
                         setattr(progress, key, value)
+                with self._stats_lock:
+                    self._stats_for(old_course_id).remove_progress(old_percentage, old_completed)
+                    self._stats_for(progress.course_id).add_progress(
+                        progress.progress_percentage, progress.completed_at is not None)
+                if reindex:
+                    self._index_progress(progress)
                 return progress
             return None
 
+    def modify_progress(self, user_id: str, course_id: str,
+                        modify: Callable[[Progress], dict]) -> Optional[Progress]:
+        """Read-modify-write one progress record atomically; modify returns the updates to apply.
+        They may not move the record: that needs the index lock, which is never taken under a stripe"""
+        progress = self.get_progress(user_id, course_id)
+        if not progress:
+            return None
+        with self._locked_progress(progress.id):
+            progress = self.progress.get(progress.id)
+            if not progress:
+                return None
+            updates = modify(progress)
+            if 'user_id' in updates or 'course_id' in updates:
+                raise ValueError('modify_progress cannot change user_id or course_id')
+            return self.update_progress(progress.id, updates) if updates else progress
+
+    def record_quiz_attempt(self, progress_id: str, quiz_id: str, attempt: dict) -> Optional[Progress]:
+        """Append a quiz attempt without losing attempts recorded concurrently"""
+        with self._locked_progress(progress_id):
+            progress = self.progress.get(progress_id)
+            if not progress:
+                return None
+            quiz_attempts = dict(progress.quiz_attempts)
+            quiz_attempts[quiz_id] = quiz_attempts.get(quiz_id, []) + [attempt]
+            return self.update_progress(progress_id, {
+                'quiz_attempts': quiz_attempts,
+                'last_accessed': time.time()
+            })
+
+    def complete_subsection(self, user_id: str, course_id: str, subsection_id: str) -> Optional[Progress]:
+        """Mark a subsection completed, completing its section when it was the last one"""
+        progress = self.get_progress(user_id, course_id)
+        subsection = self.get_subsection(subsection_id)
+        section = self.get_section(subsection.section_id) if subsection else None
+        outline = self.course_outline(course_id)
+        if not progress or not section or section.course_id != course_id or not outline:
+            return None
+        with self._locked_progress(progress.id):
+            progress = self.progress.get(progress.id)
+            if not progress:
+                return None
+            mask = self.completion_mask(progress, outline)
+            bit = outline.bit(subsection_id)
+            if mask & bit:
+                return progress
+            mask |= bit
+            completed_subsections = progress.completed_subsections | {subsection_id}
+            completed_sections = progress.completed_sections
+            if section.id not in completed_sections and outline.section_complete(mask, section.id):
+                completed_sections = completed_sections | {section.id}
+            updates = completion_updates(completed_sections, completed_subsections, outline.percentage(mask))
+            updates['current_subsection_id'] = subsection_id
+            updates['current_section_id'] = section.id
+            return self._update_completion(progress.id, updates, outline, mask)
+
+    def complete_section(self, user_id: str, course_id: str, section_id: str) -> Optional[Progress]:
+        """Mark a section and all of its subsections completed"""
+        progress = self.get_progress(user_id, course_id)
+        section = self.get_section(section_id)
+        outline = self.course_outline(course_id)
+        if not progress or not section or section.course_id != course_id or not outline:
+            return None
+        with self._locked_progress(progress.id):
+            progress = self.progress.get(progress.id)
+            if not progress:
+                return None
+            if section_id in progress.completed_sections:
+                return progress
+            section_mask = outline.section_mask(section_id)
+            mask = self.completion_mask(progress, outline) | section_mask
+            completed_subsections = progress.completed_subsections | outline.ids(section_mask)
+            updates = completion_updates(progress.completed_sections | {section_id}, completed_subsections,
+                                         outline.percentage(mask))
+            return self._update_completion(progress.id, updates, outline, mask)
+
+    def add_watch_time(self, entries: Iterable[Tuple[str, str, int, Optional[str], float]]) -> int:
+        """Add minutes watched to many progress records, each under its own stripe;
+        entries are (user_id, course_id, minutes, subsection_id or None, last_accessed)"""
+        written = 0
+        for user_id, course_id, minutes, subsection_id, last_accessed in entries:
+            progress_id = self._progress_ids_by_user_course.get((user_id, course_id))
+            if progress_id is None:
+                continue
+            with self._locked_progress(progress_id):
+                progress = self.progress.get(progress_id)
+                if not progress:
+                    continue
+                updates = {'total_time_spent': progress.total_time_spent + minutes}
+                if last_accessed > progress.last_accessed:
+                    updates['last_accessed'] = last_accessed
+                    if subsection_id:
+                        updates['current_subsection_id'] = subsection_id
+                self.update_progress(progress_id, updates)
+                written += 1
+        return written
+
+    def _update_completion(self, progress_id: str, updates: dict, outline: CourseOutline, mask: int) -> Optional[Progress]:
+        progress = self.update_progress(progress_id, updates)
+        if progress:
+            self._completion_masks[progress_id] = (progress.completed_subsections, outline, mask)
+        return progress
+
+    def course_outline(self, course_id: str) -> Optional[CourseOutline]:
+        """Subsection ordinals and count for a course, built once and then maintained"""
+        outline = self._outlines.get(course_id)
+        if outline is None:
+            with self._lock:
+                course = self.courses.get(course_id)
+                if not course:
+                    return None
+                outline = self._outlines.get(course_id)
+                if outline is None:
+                    outline = self._outlines[course_id] = CourseOutline.from_course(course)
+        return outline
+
+    def completion_mask(self, progress: Progress, outline: CourseOutline) -> int:
+        """Bitset of a record's completed subsections, recomputed only when its set is replaced"""
+        entry = self._completion_masks.get(progress.id)
+        completed = progress.completed_subsections
+        if entry is not None and entry[0] is completed and entry[1] is outline:
+            return entry[2]
+        mask = outline.mask(completed)
+        self._completion_masks[progress.id] = (completed, outline, mask)
+        return mask
+
+    def _index_progress(self, progress: Progress):
+        self._progress_ids_by_user_course[(progress.user_id, progress.course_id)] = progress.id
+        self._index_add(self._progress_ids_by_user, progress.user_id, progress.id)
+        self._index_add(self._progress_ids_by_course, progress.course_id, progress.id)
+
+    def _unindex_progress(self, progress: Progress):
+        key = (progress.user_id, progress.course_id)
+        if self._progress_ids_by_user_course.get(key) == progress.id:
+            del self._progress_ids_by_user_course[key]
+        self._index_remove(self._progress_ids_by_user, progress.user_id, progress.id)
+        self._index_remove(self._progress_ids_by_course, progress.course_id, progress.id)
+
     def create_review(self, review: Review) -> Review:
         with self._lock:
             self.reviews[review.id] = review
+            self._index_add(self._review_ids_by_course, review.course_id, review.id)
+            self._index_add(self._review_ids_by_user, review.user_id, review.id)
+            course = self.courses.get(review.course_id)
+            if course:
+                course.review_version += 1
+            with self._stats_lock:
+                self._stats_for(review.course_id).add_review(review.rating)
             return review
 
     def get_reviews_by_course(self, course_id: str) -> List[Review]:
-        return [r for r in self.reviews.values() if r.course_id == course_id]
+        review_ids = self._review_ids_by_course.get(course_id, ())
+        return [self.reviews[review_id] for review_id in review_ids]
 
-    def create_session(self, token: str, user_id: str):
-        with self._lock:
-            self.user_sessions[token] = user_id
+    def create_session(self, token: str, user_id: str, created_at: float = None, last_seen: float = None):
+        return self.sessions.create(token, user_id, created_at, last_seen)
 
     def get_user_by_token(self, token: str) -> Optional[User]:
-        user_id = self.user_sessions.get(token)
-        if user_id:
-            return self.users.get(user_id)
+        session = self.sessions.get(token)
+        if session:
+            return self.users.get(session.user_id)
         return None
 
+    def touch_session(self, token: str, last_seen: float) -> bool:
+        return self.sessions.touch(token, last_seen)
+
     def delete_session(self, token: str) -> bool:
+        return self.sessions.delete(token)
+
+    def reap_sessions(self) -> int:
+        return self.sessions.reap()
+
+    def bulk_create(self, items: Iterable[Any]) -> int:
+        """Create many entities of any model type in one locked batch"""
+        creators = {
+            User: self.create_user,
+            Course: self.create_course,
+            Section: self.create_section,
+            Subsection: self.create_subsection,
+            Quiz: self.create_quiz,
+            Progress: self.create_progress,
+            Review: self.create_review
+        }
+        count = 0
+        with self._lock:
+            for item in items:
+                creators[type(item)](item)
+                count += 1
+        return count
+
+    @contextmanager
+    def transaction(self):
+        """Hold the storage lock so a group of operations applies atomically"""
         with self._lock:
-            if token in self.user_sessions:
-                del self.user_sessions[token]
-                return True
-            return False
+            yield
+
+def create_storage(backend: str = None):
+    """Create the storage backend selected by config"""
+    backend = backend or Config.STORAGE_BACKEND
+    if backend == 'sql':
+        from data.sql_storage import SQLStorage
+        store = SQLStorage(
+            Config.DATABASE_URL,
+            pool_size=Config.DB_POOL_SIZE,
+            max_overflow=Config.DB_MAX_OVERFLOW
+        )
+    elif backend != 'memory':
+        raise ValueError(f"Unknown storage backend: {backend}")
+    elif Config.PERSISTENCE_DIR:
+        from data.persistence import DurableStorage
+        store = DurableStorage(
+            Config.PERSISTENCE_DIR,
+            fsync=Config.WAL_FSYNC,
+            group_commit_interval=Config.WAL_GROUP_COMMIT_MS / 1000,
+            snapshot_interval=Config.SNAPSHOT_INTERVAL
+        )
+    else:
+        store = InMemoryStorage()
+    if Config.SESSION_REAP_INTERVAL:
+        start_reaper(store.reap_sessions, Config.SESSION_REAP_INTERVAL)
+    if Config.TOMBSTONE_SWEEP_INTERVAL:
+        start_reaper(store.sweep_tombstones, Config.TOMBSTONE_SWEEP_INTERVAL,
+                     name='tombstone-sweeper', what='records of deleted courses')
+    return store
 
 # Global storage instance
-storage = InMemoryStorage()
+storage = create_storage()
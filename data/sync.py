@@ -0,0 +1,241 @@
+"""
+Batched, idempotent progress sync for offline and mobile clients.
+
+A client sends its queued events in order, each with a client-generated id.
+The events of each course are merged into that course's progress record in
+one read-modify-write, and the whole batch runs in a single storage
+transaction. Each record keeps the ids of its last SYNC_EVENT_MEMORY
+applied events, so a retried batch applies nothing twice.
+
+Merge policy:
+- completions are set unions, so their order does not matter
+- time spent adds up, and deduplication keeps it from counting twice.
+  Seconds short of a whole minute are kept on the record for the next batch
+- quiz attempts are appended with the client's timestamps
+- current_subsection_id is last-writer-wins on the event time. The newest
+  completion or position event in the batch moves it, but only if that
+  event is newer than the record's last_accessed. Activity the server saw
+  later is not rolled back by older offline events.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import time
+
+from config import Config
+from models import Progress, format_timestamp
+from data.outline import CourseOutline
+
+EVENT_TYPES = ('complete_subsection', 'complete_section', 'position', 'time_spent', 'quiz_attempt')
+
+MAX_EVENT_SECONDS = 24 * 3600  # largest time_spent credit for a single event
+
+# Values of the sync fields on records written before those fields existed
+_FIELD_DEFAULTS = {'sync_event_ids': (), 'sync_seconds': 0.0}
+
+class SyncEvent:
+    __slots__ = ('index', 'id', 'type', 'course_id', 'at', 'data')
+
+    def __init__(self, index: int, event_id: str, event_type: str, course_id: str, at: float, data: dict):
+        self.index = index
+        self.id = event_id
+        self.type = event_type
+        self.course_id = course_id
+        self.at = at
+        self.data = data
+
+def _event_time(value, now: float) -> Optional[float]:
+    """Client time as epoch seconds (number or ISO 8601), never later than now"""
+    if value is None:
+        return now
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        at = float(value)
+    elif isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        at = parsed.timestamp()
+    else:
+        return None
+    return min(at, now)
+
+def parse_events(raw_events: Any, now: float) -> Tuple[List[SyncEvent], List[Dict[str, Any]]]:
+    """Validate the shape of each event; returns the events and a result slot per input"""
+    events = []
+    results: List[Dict[str, Any]] = []
+    for index, raw in enumerate(raw_events):
+        if not isinstance(raw, dict):
+            results.append({'id': None, 'status': 'rejected', 'error': 'Event must be an object'})
+            continue
+        event_id = raw.get('id')
+        result = {'id': event_id, 'status': 'rejected'}
+        results.append(result)
+        at = _event_time(raw.get('at'), now)
+        if not isinstance(event_id, str) or not event_id or len(event_id) > 128:
+            result['error'] = 'Event id must be a non-empty string'
+        elif raw.get('type') not in EVENT_TYPES:
+            result['error'] = f"Event type must be one of {', '.join(EVENT_TYPES)}"
+        elif not isinstance(raw.get('course_id'), str):
+            result['error'] = 'course_id is required'
+        elif at is None:
+            result['error'] = 'Invalid event time'
+        else:
+            result['status'] = 'pending'
+            events.append(SyncEvent(index, event_id, raw['type'], raw['course_id'], at, raw))
+    return events, results
+
+class _Merge:
+    """Fold one course's events into updates for its progress record"""
+
+    def __init__(self, storage, outline: CourseOutline, events: List[SyncEvent], results: List[Dict[str, Any]]):
+        self.storage = storage
+        self.outline = outline
+        self.events = events
+        self.results = results
+        # The record's values for every key the merge changes, to undo it if the batch fails
+        self.previous: Dict[str, Any] = {}
+
+    def __call__(self, progress: Progress) -> dict:
+        outline = self.outline
+        applied_ids = list(getattr(progress, 'sync_event_ids', ()))
+        seen = set(applied_ids)
+        old_mask = mask = self.storage.completion_mask(progress, outline)
+        new_sections = set()
+        seconds = 0.0
+        quiz_attempts = None
+        position: Optional[Tuple[float, str]] = None
+        latest = progress.last_accessed
+
+        for event in self.events:
+            result = self.results[event.index]
+            if event.id in seen:
+                result['status'] = 'duplicate'
+                continue
+            data = event.data
+            error = None
+            moved_to = None
+            if event.type == 'complete_subsection' or event.type == 'position':
+                # Removed subsections keep their ordinals, so check the live ones
+                bit = outline.bit(str(data.get('subsection_id'))) & outline.live_mask
+                if not bit:
+                    error = 'Subsection not found in this course'
+                else:
+                    if event.type == 'complete_subsection':
+                        mask |= bit
+                    moved_to = data['subsection_id']
+            elif event.type == 'complete_section':
+                section_id = data.get('section_id')
+                if section_id not in outline.section_masks:
+                    error = 'Section not found in this course'
+                else:
+                    mask |= outline.section_mask(section_id)
+                    new_sections.add(section_id)
+            elif event.type == 'time_spent':
+                value = data.get('seconds')
+                if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 < value <= MAX_EVENT_SECONDS:
+                    error = f'seconds must be between 0 and {MAX_EVENT_SECONDS}'
+                else:
+                    seconds += value
+            else:
+                attempt, error = self._quiz_attempt(event)
+                if attempt:
+                    if quiz_attempts is None:
+                        quiz_attempts = dict(progress.quiz_attempts)
+                    quiz_id = data['quiz_id']
+                    quiz_attempts[quiz_id] = quiz_attempts.get(quiz_id, []) + [attempt]
+
+            if error:
+                result['status'], result['error'] = 'rejected', error
+                continue
+            result['status'] = 'applied'
+            seen.add(event.id)
+            applied_ids.append(event.id)
+            latest = max(latest, event.at)
+            if moved_to and (position is None or event.at >= position[0]):
+                position = (event.at, moved_to)
+
+        if len(applied_ids) == len(getattr(progress, 'sync_event_ids', ())):
+            return {}  # nothing new
+
+        updates: Dict[str, Any] = {
+            'sync_event_ids': tuple(applied_ids[-Config.SYNC_EVENT_MEMORY:]),
+            'last_accessed': latest
+        }
+        added = mask & ~old_mask
+        if added or new_sections - progress.completed_sections:
+            # A section whose last subsection arrived in this batch is complete too
+            for section_id, section_mask in outline.section_masks.items():
+                if section_mask & added and mask & section_mask == section_mask:
+                    new_sections.add(section_id)
+            updates['completed_subsections'] = progress.completed_subsections | outline.ids(added)
+            updates['completed_sections'] = progress.completed_sections | new_sections
+            updates['progress_percentage'] = outline.percentage(mask)
+            if updates['progress_percentage'] >= 100 and progress.completed_at is None:
+                updates['completed_at'] = latest
+        if seconds:
+            # Whole minutes are credited; the rest waits for the next batch
+            minutes, remainder = divmod(getattr(progress, 'sync_seconds', 0.0) + seconds, 60)
+            updates['total_time_spent'] = progress.total_time_spent + int(minutes)
+            updates['sync_seconds'] = remainder
+        if quiz_attempts is not None:
+            updates['quiz_attempts'] = quiz_attempts
+        if position and position[0] >= progress.last_accessed:
+            subsection = self.storage.get_subsection(position[1])
+            updates['current_subsection_id'] = position[1]
+            updates['current_section_id'] = subsection.section_id if subsection else progress.current_section_id
+        self.previous = {key: getattr(progress, key, _FIELD_DEFAULTS.get(key)) for key in updates}
+        return updates
+
+    def _quiz_attempt(self, event: SyncEvent) -> Tuple[Optional[dict], Optional[str]]:
+        data = event.data
+        quiz = self.storage.get_quiz(str(data.get('quiz_id')))
+        if not quiz:
+            return None, 'Quiz not found'
+        if 'score' not in data or 'answers' not in data:
+            return None, 'Score and answers are required'
+        score = data['score']
+        if isinstance(score, bool) or not isinstance(score, int) or not 0 <= score <= 100:
+            return None, 'Score must be an integer between 0 and 100'
+        return {
+            'score': score,
+            'answers': data['answers'],
+            'timestamp': format_timestamp(event.at),
+            'passed': score >= quiz.passing_score
+        }, None
+
+def sync_progress(storage, user_id: str, raw_events: list) -> Tuple[List[Dict[str, Any]], Dict[str, Progress]]:
+    """Apply a batch of client events; returns a result per event and the merged progress per course"""
+    events, results = parse_events(raw_events, time.time())
+
+    by_course: Dict[str, List[SyncEvent]] = {}
+    for event in events:
+        by_course.setdefault(event.course_id, []).append(event)
+
+    merged: Dict[str, Progress] = {}
+    undo: List[Tuple[str, Dict[str, Any]]] = []
+    with storage.transaction():
+        try:
+            for course_id, course_events in by_course.items():
+                outline = storage.course_outline(course_id)
+                progress = None
+                if outline:
+                    merge = _Merge(storage, outline, course_events, results)
+                    progress = storage.modify_progress(user_id, course_id, merge)
+                    if progress is not None and merge.previous:
+                        undo.append((progress.id, merge.previous))
+                if progress is None:
+                    for event in course_events:
+                        results[event.index].update(status='rejected', error='Not enrolled in this course')
+                    continue
+                merged[course_id] = progress
+        except Exception:
+            # The in-memory transaction does not roll back. Restore the courses merged so far,
+            # or their event ids would stay recorded and a retry would skip them as duplicates
+            for progress_id, previous in reversed(undo):
+                storage.update_progress(progress_id, previous)
+            raise
+    return results, merged
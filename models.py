@@ -1,15 +1,30 @@
 from datetime import datetime
 from typing import List, Dict, Optional
+import time
 import uuid
 
+# Shared by every record with nothing completed yet
+NO_IDS = frozenset()
+# User fields shown next to their reviews
+REVIEWER_FIELDS = frozenset({'username', 'profile'})
+
+def format_timestamp(timestamp: Optional[float]) -> Optional[str]:
+    """Format an epoch timestamp as the ISO string used in API responses"""
+    if timestamp is None:
+        return None
+    return datetime.utcfromtimestamp(timestamp).isoformat()
+
 class User:
+    __slots__ = ('id', 'username', 'email', 'password_hash', 'role', 'created_at', 'profile',
+                 'enrolled_courses', 'wishlist')
+
     def __init__(self, username: str, email: str, password_hash: str, role: str = 'student'):
         self.id = str(uuid.uuid4())
         self.username = username
         self.email = email
         self.password_hash = password_hash
         self.role = role  # 'student', 'instructor', 'admin'
-        self.created_at = datetime.utcnow()
+        self.created_at = time.time()
         self.profile = {
             'first_name': '',
             'last_name': '',
@@ -26,13 +41,18 @@ class User:
             'username': self.username,
             'email': self.email,
             'role': self.role,
-            'created_at': self.created_at.isoformat(),
+            'created_at': format_timestamp(self.created_at),
             'profile': self.profile,
             'enrolled_courses': self.enrolled_courses,
             'wishlist': self.wishlist
         }
 
 class Course:
+    __slots__ = ('id', 'title', 'description', 'instructor_id', 'category', 'level', 'price',
+                 'thumbnail_url', 'preview_video_url', 'tags', 'sections', 'created_at', 'updated_at',
+                 'published', 'enrolled_students', 'rating', 'reviews', 'total_duration', 'language',
+                 'prerequisites', 'is_free', 'access_type', 'preview_config', 'version', 'review_version')
+
     def __init__(self, title: str, description: str, instructor_id: str, category: str):
         self.id = str(uuid.uuid4())
         self.title = title
@@ -45,8 +65,8 @@ class Course:
         self.preview_video_url = ''
         self.tags = []
         self.sections = []
-        self.created_at = datetime.utcnow()
-        self.updated_at = datetime.utcnow()
+        self.created_at = time.time()
+        self.updated_at = time.time()
         self.published = False
         self.enrolled_students = []
         self.rating = 0.0
@@ -62,6 +82,10 @@ class Course:
             'free_subsections': [],  # List of subsection IDs that are free
             'preview_duration': 300  # Default preview duration in seconds
         }
+        # Bumped by storage whenever the course, its sections or subsections change
+        self.version = 0
+        # Bumped by storage whenever the course's reviews or their reviewers' names change
+        self.review_version = 0
 
     def to_dict(self):
         return {
@@ -76,8 +100,8 @@ class Course:
             'preview_video_url': self.preview_video_url,
             'tags': self.tags,
             'sections': [section.to_dict() for section in self.sections],
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
+            'created_at': format_timestamp(self.created_at),
+            'updated_at': format_timestamp(self.updated_at),
             'published': self.published,
             'enrolled_students': len(self.enrolled_students),
             'rating': self.rating,
@@ -91,6 +115,9 @@ class Course:
         }
 
 class Section:
+    __slots__ = ('id', 'title', 'description', 'course_id', 'order', 'subsections', 'materials', 'quiz_id',
+                 'created_at', 'access_level', 'is_preview', 'preview_duration')
+
     def __init__(self, title: str, description: str, course_id: str):
         self.id = str(uuid.uuid4())
         self.title = title
@@ -100,7 +127,7 @@ class Section:
         self.subsections = []
         self.materials = []
         self.quiz_id = None
-        self.created_at = datetime.utcnow()
+        self.created_at = time.time()
         # Access control
         self.access_level = 'paid'  # 'free', 'paid', 'preview'
         self.is_preview = False
@@ -116,13 +143,16 @@ class Section:
             'subsections': [subsection.to_dict() for subsection in self.subsections],
             'materials': self.materials,
             'quiz_id': self.quiz_id,
-            'created_at': self.created_at.isoformat(),
+            'created_at': format_timestamp(self.created_at),
             'access_level': self.access_level,
             'is_preview': self.is_preview,
             'preview_duration': self.preview_duration
         }
 
 class Subsection:
+    __slots__ = ('id', 'title', 'content_type', 'section_id', 'order', 'content', 'duration', 'created_at',
+                 'access_level', 'is_preview', 'preview_duration', 'video_url', 'preview_video_url')
+
     def __init__(self, title: str, content_type: str, section_id: str):
         self.id = str(uuid.uuid4())
         self.title = title
@@ -131,7 +161,7 @@ class Subsection:
         self.order = 0
         self.content = {}  # Flexible content structure
         self.duration = 0  # in minutes
-        self.created_at = datetime.utcnow()
+        self.created_at = time.time()
         # Access control
         self.access_level = 'paid'  # 'free', 'paid', 'preview'
         self.is_preview = False
@@ -148,7 +178,7 @@ class Subsection:
             'order': self.order,
             'content': self.content,
             'duration': self.duration,
-            'created_at': self.created_at.isoformat(),
+            'created_at': format_timestamp(self.created_at),
             'access_level': self.access_level,
             'is_preview': self.is_preview,
             'preview_duration': self.preview_duration,
@@ -157,6 +187,9 @@ class Subsection:
         }
 
 class Quiz:
+    __slots__ = ('id', 'title', 'section_id', 'questions', 'passing_score', 'time_limit', 'attempts_allowed',
+                 'created_at')
+
     def __init__(self, title: str, section_id: str):
         self.id = str(uuid.uuid4())
         self.title = title
@@ -165,7 +198,7 @@ class Quiz:
         self.passing_score = 70
         self.time_limit = 30  # in minutes
         self.attempts_allowed = 3
-        self.created_at = datetime.utcnow()
+        self.created_at = time.time()
 
     def to_dict(self):
         return {
@@ -176,50 +209,61 @@ class Quiz:
             'passing_score': self.passing_score,
             'time_limit': self.time_limit,
             'attempts_allowed': self.attempts_allowed,
-            'created_at': self.created_at.isoformat()
+            'created_at': format_timestamp(self.created_at)
         }
 
 class Progress:
+    __slots__ = ('id', 'user_id', 'course_id', 'completed_sections', 'completed_subsections', 'quiz_attempts',
+                 'current_section_id', 'current_subsection_id', 'progress_percentage', 'total_time_spent',
+                 'started_at', 'last_accessed', 'completed_at', 'sync_event_ids', 'sync_seconds')
+
     def __init__(self, user_id: str, course_id: str):
         self.id = str(uuid.uuid4())
         self.user_id = user_id
         self.course_id = course_id
-        self.completed_sections = []
-        self.completed_subsections = []
+        # Replaced rather than mutated, so records can share NO_IDS
+        self.completed_sections = NO_IDS
+        self.completed_subsections = NO_IDS
         self.quiz_attempts = {}
         self.current_section_id = None
         self.current_subsection_id = None
         self.progress_percentage = 0.0
         self.total_time_spent = 0  # in minutes
-        self.started_at = datetime.utcnow()
-        self.last_accessed = datetime.utcnow()
+        self.started_at = time.time()
+        self.last_accessed = time.time()
         self.completed_at = None
+        # Most recent client event ids applied by sync, oldest first
+        self.sync_event_ids = ()
+        # Synced watch time short of a whole minute, carried to the next batch
+        self.sync_seconds = 0.0
 
     def to_dict(self):
         return {
             'id': self.id,
             'user_id': self.user_id,
             'course_id': self.course_id,
-            'completed_sections': self.completed_sections,
-            'completed_subsections': self.completed_subsections,
+            'completed_sections': sorted(self.completed_sections),
+            'completed_subsections': sorted(self.completed_subsections),
             'quiz_attempts': self.quiz_attempts,
             'current_section_id': self.current_section_id,
             'current_subsection_id': self.current_subsection_id,
             'progress_percentage': self.progress_percentage,
             'total_time_spent': self.total_time_spent,
-            'started_at': self.started_at.isoformat(),
-            'last_accessed': self.last_accessed.isoformat(),
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+            'started_at': format_timestamp(self.started_at),
+            'last_accessed': format_timestamp(self.last_accessed),
+            'completed_at': format_timestamp(self.completed_at)
         }
 
 class Review:
+    __slots__ = ('id', 'user_id', 'course_id', 'rating', 'comment', 'created_at')
+
     def __init__(self, user_id: str, course_id: str, rating: int, comment: str):
         self.id = str(uuid.uuid4())
         self.user_id = user_id
         self.course_id = course_id
         self.rating = rating
         self.comment = comment
-        self.created_at = datetime.utcnow()
+        self.created_at = time.time()
 
     def to_dict(self):
         return {
@@ -228,5 +272,5 @@ class Review:
             'course_id': self.course_id,
             'rating': self.rating,
             'comment': self.comment,
-            'created_at': self.created_at.isoformat()
+            'created_at': format_timestamp(self.created_at)
         }
@@ -1,23 +1,14 @@
-from flask import request, jsonify, session
+from flask import jsonify
 from flask_restful import Resource, Api
 from data.storage import storage
+from data.access_policy import access_policies
+from utils.auth import get_current_user
+from utils.media import issue_stream_token, local_media_path, stream_url
+from utils.responses import RawJSON
 import logging
 
 logger = logging.getLogger(__name__)
 
-def get_current_user():
-    """Get current authenticated user"""
-    user_id = session.get('user_id')
-    if not user_id:
-        token = request.headers.get('Authorization')
-        if token and token.startswith('Bearer '):
-            token = token[7:]
-            user = storage.get_user_by_token(token)
-            return user
-    else:
-        return storage.get_user(user_id)
-    return None
-
 class CourseAccessCheckResource(Resource):
     def get(self, course_id):
         """Check user's access level for a course"""
@@ -39,23 +30,16 @@ class CourseAccessCheckResource(Resource):
                     'preview_duration': course.preview_config.get('preview_duration', 300)
                 }, 200
             
-            # Check if user is enrolled or has purchased the course
-            has_full_access = current_user.id in course.enrolled_students
-            
-            # Instructor and admin always have full access
-            if current_user.role in ['admin', 'instructor']:
-                has_full_access = True
-            
-            # If course is free, everyone has access
-            if course.is_free or course.access_type == 'free':
-                has_full_access = True
+            # Enrolled students, instructors, admins and free courses get full access
+            policy = access_policies.get(course)
+            has_full_access = policy.has_full_access(current_user)
             
             access_info = {
                 'has_full_access': has_full_access,
                 'access_type': 'full' if has_full_access else 'preview',
                 'can_access_previews': True,
                 'user_role': current_user.role,
-                'is_enrolled': current_user.id in course.enrolled_students
+                'is_enrolled': policy.is_enrolled(current_user)
             }
             
             if not has_full_access:
@@ -87,14 +71,8 @@ class SubsectionAccessResource(Resource):
                 return {'error': 'Subsection not found'}, 404
             
             # Check if user has full access
-            has_full_access = False
-            if current_user:
-                has_full_access = (
-                    current_user.id in course.enrolled_students or
-                    current_user.role in ['admin', 'instructor'] or
-                    course.is_free or
-                    course.access_type == 'free'
-                )
+            policy = access_policies.get(course)
+            has_full_access = policy.has_full_access(current_user)
             
             # Determine what content to return
             subsection_data = subsection.to_dict()
@@ -105,10 +83,7 @@ class SubsectionAccessResource(Resource):
                 subsection_data['access_type'] = 'full'
             else:
                 # Check if this subsection is in free previews
-                is_free_subsection = subsection.id in course.preview_config.get('free_subsections', [])
-                is_preview_section = subsection.access_level == 'free' or subsection.is_preview
-                
-                if is_free_subsection or is_preview_section:
+                if policy.can_preview(subsection):
                     subsection_data['can_access'] = True
                     subsection_data['access_type'] = 'preview'
                     
@@ -135,6 +110,15 @@ class SubsectionAccessResource(Resource):
             logger.error(f"Subsection access error: {str(e)}")
             return {'error': 'Failed to check subsection access'}, 500
 
+def signed_video_url(subsection, url: str, access_type: str, available_seconds: int,
+                     duration_seconds: int = None) -> str:
+    """Swap a local media URL for an expiring signed stream URL; remote URLs pass through"""
+    relative_path = local_media_path(url)
+    if relative_path is None:
+        return url
+    token = issue_stream_token(subsection.id, access_type, relative_path, available_seconds, duration_seconds)
+    return stream_url(token)
+
 class VideoStreamResource(Resource):
     def get(self, subsection_id):
         """Get video stream URL with access control"""
@@ -155,14 +139,8 @@ class VideoStreamResource(Resource):
                 return {'error': 'Course not found'}, 404
             
             # Check access
-            has_full_access = False
-            if current_user:
-                has_full_access = (
-                    current_user.id in course.enrolled_students or
-                    current_user.role in ['admin', 'instructor'] or
-                    course.is_free or
-                    course.access_type == 'free'
-                )
+            policy = access_policies.get(course)
+            has_full_access = policy.has_full_access(current_user)
             
             video_data = {
                 'subsection_id': subsection.id,
@@ -173,27 +151,30 @@ class VideoStreamResource(Resource):
             if has_full_access:
                 # Full access - return complete video
                 video_data.update({
-                    'video_url': subsection.video_url,
+                    'video_url': signed_video_url(subsection, subsection.video_url, 'full',
+                                                  subsection.duration * 60),
                     'access_type': 'full',
                     'available_duration': subsection.duration * 60  # Convert to seconds
                 })
             else:
                 # Check preview access
-                is_preview_available = (
-                    subsection.id in course.preview_config.get('free_subsections', []) or
-                    subsection.access_level == 'free' or
-                    subsection.is_preview
-                )
-                
-                if is_preview_available:
+                if policy.can_preview(subsection):
                     # Preview access
                     preview_duration = (
                         subsection.preview_duration or 
                         course.preview_config.get('preview_duration', 300)
                     )
                     
+                    # A separate preview video is all preview; the full one is cut to the window
+                    if subsection.preview_video_url:
+                        video_url = signed_video_url(subsection, subsection.preview_video_url, 'preview',
+                                                     preview_duration)
+                    else:
+                        video_url = signed_video_url(subsection, subsection.video_url, 'preview',
+                                                     preview_duration, subsection.duration * 60)
+                    
                     video_data.update({
-                        'video_url': subsection.preview_video_url or subsection.video_url,
+                        'video_url': video_url,
                         'access_type': 'preview',
                         'available_duration': preview_duration,
                         'message': f'Preview available for {preview_duration} seconds. Enroll for full access.'
@@ -208,8 +189,37 @@ class VideoStreamResource(Resource):
             logger.error(f"Video stream error: {str(e)}")
             return {'error': 'Failed to get video stream'}, 500
 
+class CourseAccessTreeResource(Resource):
+    def get(self, course_id):
+        """Access decisions for every section and subsection of a course in one response"""
+        try:
+            current_user = get_current_user()
+            course = storage.get_course(course_id)
+            
+            if not course:
+                return {'error': 'Course not found'}, 404
+            
+            policy = access_policies.get(course)
+            has_full_access = policy.has_full_access(current_user)
+            
+            access_type = 'full' if has_full_access else ('preview' if current_user else 'guest')
+            return {
+                'course_id': course.id,
+                'has_full_access': has_full_access,
+                'access_type': access_type,
+                'is_enrolled': policy.is_enrolled(current_user),
+                'user_role': current_user.role if current_user else None,
+                'preview_duration': policy.preview_duration,
+                'sections': RawJSON(policy.tree_json(has_full_access))
+            }, 200
+            
+        except Exception as e:
+            logger.error(f"Access tree error: {str(e)}")
+            return {'error': 'Failed to build access tree'}, 500
+
 def register_access_routes(api: Api):
     """Register access control routes"""
     api.add_resource(CourseAccessCheckResource, '/api/courses/<string:course_id>/access')
+    api.add_resource(CourseAccessTreeResource, '/api/courses/<string:course_id>/access/tree')
     api.add_resource(SubsectionAccessResource, '/api/courses/<string:course_id>/subsections/<string:subsection_id>/access')
     api.add_resource(VideoStreamResource, '/api/videos/<string:subsection_id>/stream')
\ No newline at end of file
@@ -0,0 +1,95 @@
+from flask import Response
+from flask_restful import Resource, Api
+from data.storage import storage
+from utils.auth import get_current_user
+from utils.profiling import PROFILE_HEADER, collapsed_stacks, issue_profile_token, profiles
+from config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+class StorageIntegrityResource(Resource):
+    def get(self):
+        """Count orphaned records and deletes still being swept (admin only)"""
+        try:
+            current_user = get_current_user()
+            if not current_user:
+                return {'error': 'Authentication required'}, 401
+            
+            if current_user.role != 'admin':
+                return {'error': 'Insufficient permissions'}, 403
+            
+            return storage.integrity_report(), 200
+            
+        except Exception as e:
+            logger.error(f"Integrity report error: {str(e)}")
+            return {'error': 'Failed to build integrity report'}, 500
+
+class RequestProfileTokenResource(Resource):
+    def post(self):
+        """Issue a token that has requests sending it profiled (admin only)"""
+        try:
+            current_user = get_current_user()
+            if not current_user:
+                return {'error': 'Authentication required'}, 401
+            
+            if current_user.role != 'admin':
+                return {'error': 'Insufficient permissions'}, 403
+            
+            return {
+                'header': PROFILE_HEADER,
+                'token': issue_profile_token(current_user.id),
+                'expires_in': Config.PROFILE_TOKEN_TTL,
+                'threshold_ms': Config.PROFILE_THRESHOLD_MS
+            }, 201
+            
+        except Exception as e:
+            logger.error(f"Profile token error: {str(e)}")
+            return {'error': 'Failed to issue profile token'}, 500
+
+class RequestProfileListResource(Resource):
+    def get(self):
+        """Slow request profiles kept in this process, newest first (admin only)"""
+        try:
+            current_user = get_current_user()
+            if not current_user:
+                return {'error': 'Authentication required'}, 401
+            
+            if current_user.role != 'admin':
+                return {'error': 'Insufficient permissions'}, 403
+            
+            return {'profiles': profiles.list()}, 200
+            
+        except Exception as e:
+            logger.error(f"Profile list error: {str(e)}")
+            return {'error': 'Failed to list profiles'}, 500
+
+class RequestProfileResource(Resource):
+    def get(self, profile_id):
+        """Download a profile as collapsed stacks for flamegraph tools (admin only)"""
+        try:
+            current_user = get_current_user()
+            if not current_user:
+                return {'error': 'Authentication required'}, 401
+            
+            if current_user.role != 'admin':
+                return {'error': 'Insufficient permissions'}, 403
+            
+            profile = profiles.get(profile_id)
+            if not profile:
+                return {'error': 'Profile not found'}, 404
+            
+            response = Response(collapsed_stacks(profile), mimetype='text/plain')
+            response.headers['Content-Disposition'] = f'attachment; filename=profile-{profile_id}.folded'
+            return response
+            
+        except Exception as e:
+            logger.error(f"Profile download error: {str(e)}")
+            return {'error': 'Failed to get profile'}, 500
+
+def register_admin_routes(api: Api):
+    """Register admin routes"""
+    api.add_resource(StorageIntegrityResource, '/api/admin/storage/integrity')
+    api.add_resource(RequestProfileTokenResource, '/api/admin/profiles/token')
+    api.add_resource(RequestProfileListResource, '/api/admin/profiles')
+    api.add_resource(RequestProfileResource, '/api/admin/profiles/<string:profile_id>')
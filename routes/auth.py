@@ -1,10 +1,10 @@
 from flask import request, jsonify, session
 from flask_restful import Resource, Api
-from werkzeug.security import generate_password_hash, check_password_hash
 from data.storage import storage
 from models import User
 from utils.validators import validate_email, validate_password
-from utils.helpers import generate_token, hash_password, verify_password
+from utils.hashing import password_pool, needs_rehash, PasswordPoolBusy
+from utils.auth import get_current_user, issue_token, bearer_token
 import logging
 
 logger = logging.getLogger(__name__)
@@ -41,7 +41,7 @@ class RegisterResource(Resource):
                 return {'error': 'Username already taken'}, 409
             
             # Create new user
-            password_hash = hash_password(data['password'])
+            password_hash = password_pool.hash(data['password'])
             user = User(
                 username=data['username'],
                 email=data['email'],
@@ -52,7 +52,7 @@ class RegisterResource(Resource):
             # Save user
             storage.create_user(user)
             
-            logger.info(f"New user registered: {user.username}")
+            logger.info("New user registered: %s", user.username)
             
             return {
                 'message': 'User registered successfully',
@@ -64,6 +64,9 @@ class RegisterResource(Resource):
                 }
             }, 201
             
+        except PasswordPoolBusy as e:
+            logger.warning("Registration rejected: password hashing queue full")
+            return {'error': 'Server busy, please retry'}, 503, {'Retry-After': str(e.retry_after)}
         except Exception as e:
             logger.error(f"Registration error: {str(e)}")
             return {'error': 'Registration failed'}, 500
@@ -87,18 +90,25 @@ class LoginResource(Resource):
                 return {'error': 'Invalid credentials'}, 401
             
             # Verify password
-            if not verify_password(data['password'], user.password_hash):
+            if not password_pool.verify(data['password'], user.password_hash):
                 return {'error': 'Invalid credentials'}, 401
             
-            # Generate session token
-            token = generate_token()
-            storage.create_session(token, user.id)
+            # Upgrade hashes made with old cost parameters, off the request path
+            if needs_rehash(user.password_hash):
+                user_id = user.id
+                password_pool.rehash_later(
+                    data['password'],
+                    lambda new_hash: storage.update_user(user_id, {'password_hash': new_hash})
+                )
+            
+            # Issue a session (or signed) token
+            token = issue_token(user.id)
             
             # Set session
             session['user_id'] = user.id
             session['token'] = token
             
-            logger.info(f"User logged in: {user.username}")
+            logger.info("User logged in: %s", user.username)
             
             return {
                 'message': 'Login successful',
@@ -111,6 +121,9 @@ class LoginResource(Resource):
                 }
             }, 200
             
+        except PasswordPoolBusy as e:
+            logger.warning("Login rejected: password hashing queue full")
+            return {'error': 'Server busy, please retry'}, 503, {'Retry-After': str(e.retry_after)}
         except Exception as e:
             logger.error(f"Login error: {str(e)}")
             return {'error': 'Login failed'}, 500
@@ -119,10 +132,10 @@ class LogoutResource(Resource):
     def post(self):
         """Logout user"""
         try:
-            token = request.headers.get('Authorization')
-            if token and token.startswith('Bearer '):
-                token = token[7:]  # Remove 'Bearer ' prefix
-                storage.delete_session(token)
+            # Revoke the bearer token and the one held by the session cookie
+            for token in {bearer_token(), session.get('token')}:
+                if token:
+                    storage.delete_session(token)
             
             # Clear session
             session.clear()
@@ -137,22 +150,9 @@ class ProfileResource(Resource):
     def get(self):
         """Get current user profile"""
         try:
-            # Get user from session or token
-            user_id = session.get('user_id')
-            if not user_id:
-                token = request.headers.get('Authorization')
-                if token and token.startswith('Bearer '):
-                    token = token[7:]
-                    user = storage.get_user_by_token(token)
-                    if user:
-                        user_id = user.id
-            
-            if not user_id:
-                return {'error': 'Authentication required'}, 401
-            
-            user = storage.get_user(user_id)
+            user = get_current_user()
             if not user:
-                return {'error': 'User not found'}, 404
+                return {'error': 'Authentication required'}, 401
             
             return {'user': user.to_dict()}, 200
             
@@ -163,17 +163,8 @@ class ProfileResource(Resource):
     def put(self):
         """Update user profile"""
         try:
-            # Get user from session or token
-            user_id = session.get('user_id')
-            if not user_id:
-                token = request.headers.get('Authorization')
-                if token and token.startswith('Bearer '):
-                    token = token[7:]
-                    user = storage.get_user_by_token(token)
-                    if user:
-                        user_id = user.id
-            
-            if not user_id:
+            current_user = get_current_user()
+            if not current_user:
                 return {'error': 'Authentication required'}, 401
             
             data = request.get_json()
@@ -185,7 +176,7 @@ class ProfileResource(Resource):
             if 'profile' in data:
                 updates['profile'] = data['profile']
             
-            user = storage.update_user(user_id, updates)
+            user = storage.update_user(current_user.id, updates)
             if not user:
                 return {'error': 'User not found'}, 404
             
@@ -1,26 +1,40 @@
-from flask import request, jsonify, session
+from flask import request, jsonify
 from flask_restful import Resource, Api
 from data.storage import storage
+from data.course_cache import course_cache
+from data.access_policy import access_policies
 from models import Course, Section, Subsection, Quiz, Review
 from utils.validators import validate_course_data, validate_section_data, validate_subsection_data, validate_quiz_data
-from utils.helpers import paginate_results, get_course_statistics, sanitize_search_query, generate_course_slug
+from utils.helpers import get_course_statistics, sanitize_search_query, generate_course_slug
+from utils.responses import merge_json
+from utils.conditional import conditional_get, entity_tag
+from utils.auth import get_current_user
 from config import Config
 import logging
 
 logger = logging.getLogger(__name__)
 
-def get_current_user():
-    """Get current authenticated user"""
-    user_id = session.get('user_id')
-    if not user_id:
-        token = request.headers.get('Authorization')
-        if token and token.startswith('Bearer '):
-            token = token[7:]
-            user = storage.get_user_by_token(token)
-            return user
-    else:
-        return storage.get_user(user_id)
-    return None
+def get_course_filters():
+    """Build catalog filters from query parameters"""
+    filters = {}
+    for field in ['category', 'level', 'access_type', 'language', 'instructor_id']:
+        value = request.args.get(field)
+        if value:
+            filters[field] = value
+    
+    search = request.args.get('search')
+    if search:
+        filters['search'] = sanitize_search_query(search)
+    
+    is_free = request.args.get('is_free')
+    if is_free:
+        filters['is_free'] = is_free.lower() == 'true'
+    
+    published_only = request.args.get('published', 'true').lower() == 'true'
+    if published_only:
+        filters['published'] = True
+    
+    return filters
 
 class CoursesResource(Resource):
     def get(self):
@@ -29,44 +43,31 @@ class CoursesResource(Resource):
             # Get query parameters
             page = int(request.args.get('page', 1))
             per_page = int(request.args.get('per_page', 10))
-            category = request.args.get('category')
-            level = request.args.get('level')
-            search = request.args.get('search')
-            published_only = request.args.get('published', 'true').lower() == 'true'
-            
-            # Build filters
-            filters = {}
-            if category:
-                filters['category'] = category
-            if level:
-                filters['level'] = level
-            if search:
-                filters['search'] = sanitize_search_query(search)
-            if published_only:
-                filters['published'] = True
-            
-            # Get courses
-            courses = storage.get_courses(filters)
-            
-            # Convert to dict and add statistics
-            courses_data = []
-            for course in courses:
-                course_dict = course.to_dict()
-                course_dict['statistics'] = get_course_statistics(course, storage)
-                courses_data.append(course_dict)
+            after = request.args.get('after')
+            filters = get_course_filters()
+            
+            # One page in a stable order (relevance when searching, else creation), by cursor if given
+            paginated = storage.get_course_page(filters, per_page, page, after)
+            if paginated is None:
+                return {'error': 'Invalid cursor'}, 400
             
-            # Paginate results
-            paginated = paginate_results(courses_data, page, per_page)
+            # Serialize only the page, from the cache, and add statistics
+            courses_data = []
+            for course in paginated['items']:
+                courses_data.append(merge_json(course_cache.get_json(course), {
+                    'statistics': get_course_statistics(course, storage)
+                }))
             
             return {
-                'courses': paginated['items'],
+                'courses': courses_data,
                 'pagination': {
                     'page': paginated['page'],
                     'per_page': paginated['per_page'],
                     'total': paginated['total'],
                     'pages': paginated['pages'],
                     'has_prev': paginated['has_prev'],
-                    'has_next': paginated['has_next']
+                    'has_next': paginated['has_next'],
+                    'next_cursor': paginated['items'][-1].id if paginated['has_next'] else None
                 }
             }, 200
             
@@ -120,7 +121,7 @@ class CoursesResource(Resource):
             # Save course
             storage.create_course(course)
             
-            logger.info(f"New course created: {course.title} by {user.username}")
+            logger.info("New course created: %s by %s", course.title, user.username)
             
             return {
                 'message': 'Course created successfully',
@@ -135,19 +136,30 @@ class CourseResource(Resource):
     def get(self, course_id):
         """Get specific course details"""
         try:
+            versions = storage.get_course_versions(course_id)
+            if not versions:
+                return {'error': 'Course not found'}, 404
+            
+            # Counters are read before the content, so the tag is never newer than the body;
+            # the statistics can move back and forth, so the tag covers the values sent
+            statistics = storage.get_course_stats(course_id).to_dict()
+            tag = entity_tag('course', course_id, versions, statistics)
+            not_modified, headers = conditional_get(f'course:{course_id}', tag)
+            if not_modified:
+                return not_modified
+            
             course = storage.get_course(course_id)
             if not course:
                 return {'error': 'Course not found'}, 404
             
-            # Get course with statistics
-            course_dict = course.to_dict()
-            course_dict['statistics'] = get_course_statistics(course, storage)
-            
-            # Get reviews
+            # Get course with statistics and reviews
             reviews = storage.get_reviews_by_course(course_id)
-            course_dict['reviews'] = [review.to_dict() for review in reviews]
+            course_data = merge_json(course_cache.get_json(course, omit_reviews=True), {
+                'statistics': statistics,
+                'reviews': [review.to_dict() for review in reviews]
+            })
             
-            return {'course': course_dict}, 200
+            return {'course': course_data}, 200, headers
             
         except Exception as e:
             logger.error(f"Course fetch error: {str(e)}")
@@ -186,7 +198,7 @@ class CourseResource(Resource):
             if not updated_course:
                 return {'error': 'Failed to update course'}, 500
             
-            logger.info(f"Course updated: {course.title} by {user.username}")
+            logger.info("Course updated: %s by %s", course.title, user.username)
             
             return {
                 'message': 'Course updated successfully',
@@ -214,7 +226,9 @@ class CourseResource(Resource):
             
             # Delete course
             if storage.delete_course(course_id):
-                logger.info(f"Course deleted: {course.title} by {user.username}")
+                course_cache.invalidate(course_id)
+                access_policies.invalidate(course_id)
+                logger.info("Course deleted: %s by %s", course.title, user.username)
                 return {'message': 'Course deleted successfully'}, 200
             else:
                 return {'error': 'Failed to delete course'}, 500
@@ -239,16 +253,11 @@ class CourseEnrollmentResource(Resource):
             if user.id in course.enrolled_students:
                 return {'error': 'Already enrolled in this course'}, 400
             
-            # Enroll user
-            course.enrolled_students.append(user.id)
-            user.enrolled_courses.append(course_id)
-            
-            # Create initial progress
-            from models import Progress
-            progress = Progress(user.id, course_id)
-            storage.create_progress(progress)
+            # Enroll user and create (or resume) progress
+            if not storage.enroll(user.id, course_id):
+                return {'error': 'Already enrolled in this course'}, 400
             
-            logger.info(f"User enrolled: {user.username} in {course.title}")
+            logger.info("User enrolled: %s in %s", user.username, course.title)
             
             return {'message': 'Enrolled successfully'}, 200
             
@@ -272,10 +281,10 @@ class CourseEnrollmentResource(Resource):
                 return {'error': 'Not enrolled in this course'}, 400
             
             # Unenroll user
-            course.enrolled_students.remove(user.id)
-            user.enrolled_courses.remove(course_id)
+            if not storage.unenroll(user.id, course_id):
+                return {'error': 'Not enrolled in this course'}, 400
             
-            logger.info(f"User unenrolled: {user.username} from {course.title}")
+            logger.info("User unenrolled: %s from %s", user.username, course.title)
             
             return {'message': 'Unenrolled successfully'}, 200
             
@@ -287,14 +296,19 @@ class CourseSectionsResource(Resource):
     def get(self, course_id):
         """Get course sections"""
         try:
-            course = storage.get_course(course_id)
-            if not course:
+            versions = storage.get_course_versions(course_id)
+            if not versions:
                 return {'error': 'Course not found'}, 404
             
+            tag = entity_tag('sections', course_id, versions[0])
+            not_modified, headers = conditional_get(f'sections:{course_id}', tag)
+            if not_modified:
+                return not_modified
+            
             sections = storage.get_sections_by_course(course_id)
             sections_data = [section.to_dict() for section in sections]
             
-            return {'sections': sections_data}, 200
+            return {'sections': sections_data}, 200, headers
             
         except Exception as e:
             logger.error(f"Sections fetch error: {str(e)}")
@@ -337,7 +351,7 @@ class CourseSectionsResource(Resource):
             
             storage.create_section(section)
             
-            logger.info(f"New section created: {section.title} in {course.title}")
+            logger.info("New section created: %s in %s", section.title, course.title)
             
             return {
                 'message': 'Section created successfully',
@@ -348,11 +362,25 @@ class CourseSectionsResource(Resource):
             logger.error(f"Section creation error: {str(e)}")
             return {'error': 'Failed to create section'}, 500
 
+class CourseFacetsResource(Resource):
+    def get(self):
+        """Get course counts per facet value for the current filters"""
+        try:
+            return storage.get_course_facets(get_course_filters()), 200
+        except Exception as e:
+            logger.error(f"Facets fetch error: {str(e)}")
+            return {'error': 'Failed to fetch facets'}, 500
+
 class CourseCategoriesResource(Resource):
     def get(self):
         """Get available course categories"""
         try:
-            return {'categories': Config.COURSE_CATEGORIES}, 200
+            tag = entity_tag('categories', tuple(Config.COURSE_CATEGORIES))
+            not_modified, headers = conditional_get('categories', tag, Config.STATIC_CACHE_MAX_AGE)
+            if not_modified:
+                return not_modified
+            
+            return {'categories': Config.COURSE_CATEGORIES}, 200, headers
         except Exception as e:
             logger.error(f"Categories fetch error: {str(e)}")
             return {'error': 'Failed to fetch categories'}, 500
@@ -361,10 +389,15 @@ class CourseReviewsResource(Resource):
     def get(self, course_id):
         """Get course reviews"""
         try:
-            course = storage.get_course(course_id)
-            if not course:
+            versions = storage.get_course_versions(course_id)
+            if not versions:
                 return {'error': 'Course not found'}, 404
             
+            tag = entity_tag('reviews', course_id, versions[1])
+            not_modified, headers = conditional_get(f'reviews:{course_id}', tag)
+            if not_modified:
+                return not_modified
+            
             reviews = storage.get_reviews_by_course(course_id)
             reviews_data = []
             
@@ -379,7 +412,7 @@ class CourseReviewsResource(Resource):
                     }
                 reviews_data.append(review_dict)
             
-            return {'reviews': reviews_data}, 200
+            return {'reviews': reviews_data}, 200, headers
             
         except Exception as e:
             logger.error(f"Reviews fetch error: {str(e)}")
@@ -425,7 +458,7 @@ class CourseReviewsResource(Resource):
             
             storage.create_review(review)
             
-            logger.info(f"New review created for {course.title} by {user.username}")
+            logger.info("New review created for %s by %s", course.title, user.username)
             
             return {
                 'message': 'Review created successfully',
@@ -443,4 +476,5 @@ def register_course_routes(api: Api):
     api.add_resource(CourseEnrollmentResource, '/api/courses/<string:course_id>/enroll')
     api.add_resource(CourseSectionsResource, '/api/courses/<string:course_id>/sections')
     api.add_resource(CourseCategoriesResource, '/api/courses/categories')
+    api.add_resource(CourseFacetsResource, '/api/courses/facets')
     api.add_resource(CourseReviewsResource, '/api/courses/<string:course_id>/reviews')
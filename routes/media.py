@@ -0,0 +1,25 @@
+from flask_restful import Resource, Api
+from utils.media import range_response, verify_stream_token
+import logging
+import mimetypes
+
+logger = logging.getLogger(__name__)
+
+class MediaStreamResource(Resource):
+    def get(self, token):
+        """Stream a media file granted by a signed token, with Range support"""
+        try:
+            grant = verify_stream_token(token)
+            if not grant:
+                return {'error': 'Invalid or expired stream token'}, 403
+
+            mimetype = mimetypes.guess_type(grant['src'])[0] or 'application/octet-stream'
+            return range_response(grant, mimetype)
+
+        except Exception as e:
+            logger.error(f"Media stream error: {str(e)}")
+            return {'error': 'Failed to stream media'}, 500
+
+def register_media_routes(api: Api):
+    """Register media streaming routes"""
+    api.add_resource(MediaStreamResource, '/api/media/<string:token>')
@@ -1,26 +1,17 @@
-from flask import request, jsonify, session
+from flask import request, jsonify
 from flask_restful import Resource, Api
 from data.storage import storage
+from utils.auth import get_current_user
 from models import Progress
-from utils.helpers import calculate_progress_percentage
+from data.heartbeats import heartbeat_buffer, HeartbeatBufferFull
+from data.sync import sync_progress
+from config import Config
 from datetime import datetime
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
-def get_current_user():
-    """Get current authenticated user"""
-    user_id = session.get('user_id')
-    if not user_id:
-        token = request.headers.get('Authorization')
-        if token and token.startswith('Bearer '):
-            token = token[7:]
-            user = storage.get_user_by_token(token)
-            return user
-    else:
-        return storage.get_user(user_id)
-    return None
-
 class ProgressResource(Resource):
     def get(self, user_id, course_id):
         """Get user's progress for a specific course"""
@@ -43,20 +34,16 @@ class ProgressResource(Resource):
             if not progress:
                 return {'error': 'Progress not found'}, 404
             
-            # Get course details to calculate total subsections
-            course = storage.get_course(course_id)
-            if not course:
+            # Cached subsection ordinals and count for the course
+            outline = storage.course_outline(course_id)
+            if not outline:
                 return {'error': 'Course not found'}, 404
-            
-            # Calculate total subsections
-            total_subsections = 0
-            for section in course.sections:
-                total_subsections += len(section.subsections)
+            total_subsections = outline.total
             
             # Update progress percentage
-            progress.progress_percentage = calculate_progress_percentage(
-                progress.completed_subsections, total_subsections
-            )
+            progress_percentage = outline.percentage(storage.completion_mask(progress, outline))
+            if progress_percentage != progress.progress_percentage:
+                progress = storage.update_progress(progress.id, {'progress_percentage': progress_percentage})
             
             progress_data = progress.to_dict()
             progress_data['total_subsections'] = total_subsections
@@ -89,11 +76,12 @@ class ProgressResource(Resource):
             # Update progress
             updates = {}
             
-            if 'completed_sections' in data:
-                updates['completed_sections'] = data['completed_sections']
-            
-            if 'completed_subsections' in data:
-                updates['completed_subsections'] = data['completed_subsections']
+            for field in ('completed_sections', 'completed_subsections'):
+                if field in data:
+                    ids = data[field]
+                    if not isinstance(ids, list) or not all(isinstance(item, str) for item in ids):
+                        return {'error': f'{field} must be a list of ids'}, 400
+                    updates[field] = frozenset(ids)
             
             if 'current_section_id' in data:
                 updates['current_section_id'] = data['current_section_id']
@@ -105,26 +93,23 @@ class ProgressResource(Resource):
                 updates['total_time_spent'] = int(data['total_time_spent'])
             
             # Always update last accessed time
-            updates['last_accessed'] = datetime.utcnow()
+            updates['last_accessed'] = time.time()
             
             # Calculate progress percentage
             if 'completed_subsections' in updates:
-                course = storage.get_course(course_id)
-                if course:
-                    total_subsections = sum(len(section.subsections) for section in course.sections)
-                    updates['progress_percentage'] = calculate_progress_percentage(
-                        updates['completed_subsections'], total_subsections
-                    )
+                outline = storage.course_outline(course_id)
+                if outline:
+                    updates['progress_percentage'] = outline.percentage(outline.mask(updates['completed_subsections']))
                     
                     # Check if course is completed
                     if updates['progress_percentage'] >= 100:
-                        updates['completed_at'] = datetime.utcnow()
+                        updates['completed_at'] = time.time()
             
             updated_progress = storage.update_progress(progress.id, updates)
             if not updated_progress:
                 return {'error': 'Failed to update progress'}, 500
             
-            logger.info(f"Progress updated for user {user_id} in course {course_id}")
+            logger.info("Progress updated for user %s in course %s", user_id, course_id)
             
             return {
                 'message': 'Progress updated successfully',
@@ -156,29 +141,14 @@ class SectionProgressResource(Resource):
             if not section or section.course_id != course_id:
                 return {'error': 'Section not found'}, 404
             
-            # Mark section as completed
-            if section_id not in progress.completed_sections:
-                progress.completed_sections.append(section_id)
-                
-                # Also mark all subsections in this section as completed
-                for subsection in section.subsections:
-                    if subsection.id not in progress.completed_subsections:
-                        progress.completed_subsections.append(subsection.id)
-                
-                # Update progress
-                course = storage.get_course(course_id)
-                if course:
-                    total_subsections = sum(len(s.subsections) for s in course.sections)
-                    progress.progress_percentage = calculate_progress_percentage(
-                        progress.completed_subsections, total_subsections
-                    )
-                    
-                    if progress.progress_percentage >= 100:
-                        progress.completed_at = datetime.utcnow()
-                
-                progress.last_accessed = datetime.utcnow()
-                
-                logger.info(f"Section {section_id} completed by user {user_id}")
+            # Mark section and all its subsections as completed, atomically
+            already_completed = section_id in progress.completed_sections
+            progress = storage.complete_section(user_id, course_id, section_id)
+            if not progress:
+                return {'error': 'Failed to mark section as completed'}, 500
+            
+            if not already_completed:
+                logger.info("Section %s completed by user %s", section_id, user_id)
             
             return {
                 'message': 'Section marked as completed',
@@ -215,37 +185,14 @@ class SubsectionProgressResource(Resource):
             if not section or section.course_id != course_id:
                 return {'error': 'Subsection not found in this course'}, 404
             
-            # Mark subsection as completed
-            if subsection_id not in progress.completed_subsections:
-                progress.completed_subsections.append(subsection_id)
-                
-                # Update current position
-                progress.current_subsection_id = subsection_id
-                progress.current_section_id = subsection.section_id
-                
-                # Check if entire section is completed
-                section_completed = all(
-                    sub.id in progress.completed_subsections 
-                    for sub in section.subsections
-                )
-                
-                if section_completed and section.id not in progress.completed_sections:
-                    progress.completed_sections.append(section.id)
-                
-                # Update progress percentage
-                course = storage.get_course(course_id)
-                if course:
-                    total_subsections = sum(len(s.subsections) for s in course.sections)
-                    progress.progress_percentage = calculate_progress_percentage(
-                        progress.completed_subsections, total_subsections
-                    )
-                    
-                    if progress.progress_percentage >= 100:
-                        progress.completed_at = datetime.utcnow()
-                
-                progress.last_accessed = datetime.utcnow()
-                
-                logger.info(f"Subsection {subsection_id} completed by user {user_id}")
+            # Mark subsection (and its section, if it was the last one) as completed, atomically
+            already_completed = subsection_id in progress.completed_subsections
+            progress = storage.complete_subsection(user_id, course_id, subsection_id)
+            if not progress:
+                return {'error': 'Failed to mark subsection as completed'}, 500
+            
+            if not already_completed:
+                logger.info("Subsection %s completed by user %s", subsection_id, user_id)
             
             return {
                 'message': 'Subsection marked as completed',
@@ -299,13 +246,11 @@ class QuizAttemptResource(Resource):
                 'passed': score >= quiz.passing_score
             }
             
-            if quiz_id not in progress.quiz_attempts:
-                progress.quiz_attempts[quiz_id] = []
-            
-            progress.quiz_attempts[quiz_id].append(attempt_data)
-            progress.last_accessed = datetime.utcnow()
+            progress = storage.record_quiz_attempt(progress.id, quiz_id, attempt_data)
+            if not progress:
+                return {'error': 'Failed to record quiz attempt'}, 500
             
-            logger.info(f"Quiz attempt recorded: quiz {quiz_id} by user {user_id}, score: {score}")
+            logger.info("Quiz attempt recorded: quiz %s by user %s, score: %s", quiz_id, user_id, score)
             
             return {
                 'message': 'Quiz attempt recorded',
@@ -317,6 +262,79 @@ class QuizAttemptResource(Resource):
             logger.error(f"Quiz attempt error: {str(e)}")
             return {'error': 'Failed to record quiz attempt'}, 500
 
+class HeartbeatResource(Resource):
+    def post(self, user_id, course_id):
+        """Report seconds watched; buffered and written to progress in batches"""
+        try:
+            current_user = get_current_user()
+            if not current_user:
+                return {'error': 'Authentication required'}, 401
+            
+            # Users can only report their own watch time
+            if current_user.id != user_id:
+                return {'error': 'Insufficient permissions'}, 403
+            
+            data = request.get_json(silent=True)
+            if not data or not data.get('subsection_id'):
+                return {'error': 'subsection_id is required'}, 400
+            
+            try:
+                seconds = float(data.get('seconds', 0))
+            except (TypeError, ValueError):
+                return {'error': 'Invalid seconds value'}, 400
+            if not 0 < seconds < float('inf'):
+                return {'error': 'seconds must be positive'}, 400
+            
+            # The subsection becomes current_subsection_id, so it must belong to the course.
+            # The outline is memoized; enrollment is checked when the buffer is flushed
+            subsection_id = str(data['subsection_id'])
+            outline = storage.course_outline(course_id)
+            if not outline or not outline.bit(subsection_id) & outline.live_mask:
+                return {'error': 'Subsection not found in this course'}, 400
+            
+            heartbeat_buffer.record(user_id, course_id, subsection_id, min(seconds, Config.HEARTBEAT_MAX_SECONDS))
+            
+            return {'message': 'Heartbeat accepted'}, 202
+            
+        except HeartbeatBufferFull as e:
+            logger.warning("Heartbeat rejected: buffer full")
+            return {'error': 'Server busy, please retry'}, 503, {'Retry-After': str(e.retry_after)}
+        except Exception as e:
+            logger.error(f"Heartbeat error: {str(e)}")
+            return {'error': 'Failed to record heartbeat'}, 500
+
+class ProgressSyncResource(Resource):
+    def post(self, user_id):
+        """Apply a batch of offline progress events; retrying a batch is safe"""
+        try:
+            current_user = get_current_user()
+            if not current_user:
+                return {'error': 'Authentication required'}, 401
+            
+            # Users can only sync their own progress
+            if current_user.id != user_id:
+                return {'error': 'Insufficient permissions'}, 403
+            
+            data = request.get_json(silent=True)
+            if not data or not isinstance(data.get('events'), list):
+                return {'error': 'events must be a list'}, 400
+            if len(data['events']) > Config.SYNC_MAX_EVENTS:
+                return {'error': f'At most {Config.SYNC_MAX_EVENTS} events per request'}, 400
+            
+            results, merged = sync_progress(storage, user_id, data['events'])
+            
+            applied = sum(1 for result in results if result['status'] == 'applied')
+            logger.info("Progress sync for user %s: %s/%s events applied", user_id, applied, len(results))
+            
+            return {
+                'results': results,
+                'progress': {course_id: progress.to_dict() for course_id, progress in merged.items()}
+            }, 200
+            
+        except Exception as e:
+            logger.error(f"Progress sync error: {str(e)}")
+            return {'error': 'Failed to sync progress'}, 500
+
 class UserProgressListResource(Resource):
     def get(self, user_id):
         """Get all progress for a user"""
@@ -360,4 +378,6 @@ def register_progress_routes(api: Api):
     api.add_resource(SectionProgressResource, '/api/progress/<string:user_id>/<string:course_id>/sections/<string:section_id>/complete')
     api.add_resource(SubsectionProgressResource, '/api/progress/<string:user_id>/<string:course_id>/subsections/<string:subsection_id>/complete')
     api.add_resource(QuizAttemptResource, '/api/progress/<string:user_id>/<string:course_id>/quizzes/<string:quiz_id>/attempt')
+    api.add_resource(HeartbeatResource, '/api/progress/<string:user_id>/<string:course_id>/heartbeat')
+    api.add_resource(ProgressSyncResource, '/api/progress/<string:user_id>/sync')
     api.add_resource(UserProgressListResource, '/api/progress/<string:user_id>')
@@ -1,24 +1,13 @@
-from flask import request, jsonify, session
+from flask import request, jsonify
 from flask_restful import Resource, Api
 from data.storage import storage
-from utils.helpers import paginate_results
+from data.course_cache import course_cache
+from utils.responses import RawJSON, merge_json
+from utils.auth import get_current_user
 import logging
 
 logger = logging.getLogger(__name__)
 
-def get_current_user():
-    """Get current authenticated user"""
-    user_id = session.get('user_id')
-    if not user_id:
-        token = request.headers.get('Authorization')
-        if token and token.startswith('Bearer '):
-            token = token[7:]
-            user = storage.get_user_by_token(token)
-            return user
-    else:
-        return storage.get_user(user_id)
-    return None
-
 class UsersResource(Resource):
     def get(self):
         """Get users (admin only)"""
@@ -33,30 +22,28 @@ class UsersResource(Resource):
             # Get query parameters
             page = int(request.args.get('page', 1))
             per_page = int(request.args.get('per_page', 10))
+            after = request.args.get('after')
             role = request.args.get('role')
             
-            # Get all users
-            users = list(storage.users.values())
-            
-            # Filter by role if specified
-            if role:
-                users = [u for u in users if u.role == role]
-            
-            # Convert to dict
-            users_data = [user.to_dict() for user in users]
+            # One page in creation order, filtered by role if specified, by cursor if given
+            filters = {'role': role} if role else {}
+            paginated = storage.get_user_page(filters, per_page, page, after)
+            if paginated is None:
+                return {'error': 'Invalid cursor'}, 400
             
-            # Paginate results
-            paginated = paginate_results(users_data, page, per_page)
+            # Convert only the page to dict
+            users_data = [user.to_dict() for user in paginated['items']]
             
             return {
-                'users': paginated['items'],
+                'users': users_data,
                 'pagination': {
                     'page': paginated['page'],
                     'per_page': paginated['per_page'],
                     'total': paginated['total'],
                     'pages': paginated['pages'],
                     'has_prev': paginated['has_prev'],
-                    'has_next': paginated['has_next']
+                    'has_next': paginated['has_next'],
+                    'next_cursor': paginated['items'][-1].id if paginated['has_next'] else None
                 }
             }, 200
             
@@ -142,7 +129,7 @@ class UserResource(Resource):
             if not updated_user:
                 return {'error': 'Failed to update user'}, 500
             
-            logger.info(f"User updated: {user.username} by {current_user.username}")
+            logger.info("User updated: %s by %s", user.username, current_user.username)
             
             return {
                 'message': 'User updated successfully',
@@ -173,7 +160,7 @@ class UserResource(Resource):
             
             # Delete user
             if storage.delete_user(user_id):
-                logger.info(f"User deleted: {user.username} by {current_user.username}")
+                logger.info("User deleted: %s by %s", user.username, current_user.username)
                 return {'message': 'User deleted successfully'}, 200
             else:
                 return {'error': 'Failed to delete user'}, 500
@@ -203,21 +190,17 @@ class UserCoursesResource(Resource):
             for course_id in user.enrolled_courses:
                 course = storage.get_course(course_id)
                 if course:
-                    course_data = course.to_dict()
-                    
-                    # Get user's progress for this course
+                    # Add the user's progress for this course
                     progress = storage.get_progress(user_id, course_id)
-                    if progress:
-                        course_data['progress'] = progress.to_dict()
-                    
-                    enrolled_courses.append(course_data)
+                    extra = {'progress': progress.to_dict()} if progress else {}
+                    enrolled_courses.append(merge_json(course_cache.get_json(course), extra))
             
             # Get wishlist courses
             wishlist_courses = []
             for course_id in user.wishlist:
                 course = storage.get_course(course_id)
                 if course:
-                    wishlist_courses.append(course.to_dict())
+                    wishlist_courses.append(RawJSON(course_cache.get_json(course)))
             
             return {
                 'enrolled_courses': enrolled_courses,
@@ -253,9 +236,9 @@ class UserWishlistResource(Resource):
                 return {'error': 'Course already in wishlist'}, 400
             
             # Add to wishlist
-            user.wishlist.append(course_id)
+            storage.update_user(user_id, {'wishlist': user.wishlist + [course_id]})
             
-            logger.info(f"Course added to wishlist: {course.title} by {user.username}")
+            logger.info("Course added to wishlist: %s by %s", course.title, user.username)
             
             return {'message': 'Course added to wishlist'}, 200
             
@@ -283,9 +266,9 @@ class UserWishlistResource(Resource):
                 return {'error': 'Course not in wishlist'}, 400
             
             # Remove from wishlist
-            user.wishlist.remove(course_id)
+            storage.update_user(user_id, {'wishlist': [c for c in user.wishlist if c != course_id]})
             
-            logger.info(f"Course removed from wishlist: {course_id} by {user.username}")
+            logger.info("Course removed from wishlist: %s by %s", course_id, user.username)
             
             return {'message': 'Course removed from wishlist'}, 200
             
@@ -0,0 +1,20 @@
+import logging
+import sys
+
+import pytest
+
+from data.storage import InMemoryStorage
+
+logging.disable(logging.CRITICAL)
+
+@pytest.fixture
+def fast_switching():
+    """Switch threads far more often than the default 5ms, so races show up in short runs"""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+@pytest.fixture
+def memory_storage():
+    return InMemoryStorage()
@@ -0,0 +1,15 @@
+"""Builders for the storage objects tests share"""
+from models import Course, Section, Subsection, User
+
+def build_course(storage, lessons: int = 10, sections: int = 1):
+    """A course with sections of lessons; returns the course and its subsection ids per section"""
+    course = storage.create_course(Course('Seerah', 'Description', 'instructor', 'Islamic History'))
+    tree = []
+    for s in range(sections):
+        section = storage.create_section(Section(f'Section {s}', 'Description', course.id))
+        tree.append([storage.create_subsection(Subsection(f'Lesson {i}', 'video', section.id)).id
+                     for i in range(lessons)])
+    return course, tree
+
+def create_users(storage, count: int):
+    return [storage.create_user(User(f'learner{i}', f'learner{i}@example.com', 'x')) for i in range(count)]
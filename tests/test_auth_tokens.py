@@ -0,0 +1,69 @@
+import time
+import uuid
+
+import pytest
+
+from app import app
+from config import Config
+from data.storage import storage
+from models import User
+from utils.auth import SIGNED_TOKEN_PREFIX, issue_signed_token, issue_token
+from utils.media import STREAM_TOKEN_PURPOSE
+from utils.signing import sign_payload
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+@pytest.fixture
+def user():
+    name = f'learner{uuid.uuid4().hex[:8]}'
+    user = storage.create_user(User(name, f'{name}@example.com', 'x'))
+    yield user
+    storage.delete_user(user.id)
+
+@pytest.fixture
+def signed_mode(monkeypatch):
+    monkeypatch.setattr(Config, 'AUTH_TOKENS', 'signed')
+
+def profile_status(client, token: str) -> int:
+    return client.get('/api/auth/profile', headers={'Authorization': f'Bearer {token}'}).status_code
+
+def test_signed_tokens_are_accepted_in_signed_mode(client, user, signed_mode):
+    token = issue_token(user.id)
+
+    assert token.startswith(SIGNED_TOKEN_PREFIX)
+    response = client.get('/api/auth/profile', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    assert response.get_json()['user']['id'] == user.id
+
+def test_signed_tokens_are_refused_in_session_mode(client, user, monkeypatch):
+    monkeypatch.setattr(Config, 'AUTH_TOKENS', 'session')
+
+    assert profile_status(client, issue_signed_token(user.id)) == 401
+
+def test_session_tokens_stop_working_after_logout(client, user, monkeypatch):
+    monkeypatch.setattr(Config, 'AUTH_TOKENS', 'session')
+    token = issue_token(user.id)
+    assert profile_status(client, token) == 200
+
+    client.post('/api/auth/logout', headers={'Authorization': f'Bearer {token}'})
+
+    assert profile_status(client, token) == 401
+
+def test_expired_signed_tokens_are_refused(client, user, signed_mode):
+    assert profile_status(client, issue_signed_token(user.id, ttl=-1)) == 401
+
+def test_tokens_signed_for_another_purpose_are_refused(client, user, signed_mode):
+    now = int(time.time())
+    payload = {'sub': user.id, 'iat': now, 'exp': now + 60}
+
+    assert profile_status(client, sign_payload(payload, SIGNED_TOKEN_PREFIX, STREAM_TOKEN_PURPOSE)) == 401
+    assert profile_status(client, sign_payload(payload, SIGNED_TOKEN_PREFIX)) == 401
+
+def test_tampered_signed_tokens_are_refused(client, user, signed_mode):
+    token = issue_signed_token(user.id)
+    signature = token.rpartition('.')[2]
+    forged_body = issue_signed_token(user.id, ttl=10 ** 6)[len(SIGNED_TOKEN_PREFIX):].partition('.')[0]
+
+    assert profile_status(client, f'{SIGNED_TOKEN_PREFIX}{forged_body}.{signature}') == 401
@@ -0,0 +1,72 @@
+from data.course_stats import CourseStats
+from models import Review
+from tests.helpers import build_course, create_users
+from tests.test_storage_concurrency import THREADS, run_threads
+
+def test_stats_follow_concurrent_enrollments_completions_and_reviews(memory_storage, fast_switching):
+    storage = memory_storage
+    course, tree = build_course(storage, lessons=4)
+    lessons = tree[0]
+    users = create_users(storage, THREADS * 4)
+
+    def learn(i):
+        for n, user in enumerate(users[i::THREADS]):
+            storage.enroll(user.id, course.id)
+            # Every other learner finishes the course, the rest stop halfway
+            for lesson in lessons if n % 2 == 0 else lessons[:2]:
+                storage.complete_subsection(user.id, course.id, lesson)
+            storage.create_review(Review(user.id, course.id, n % 5 + 1, 'Comment'))
+
+    run_threads(learn)
+
+    assert storage.check_course_stats() == {}
+    stats = storage.get_course_stats(course.id).to_dict()
+    assert stats['total_students'] == len(users)
+    assert stats['completed_students'] == len(users) // 2
+    assert stats['completion_rate'] == 50.0
+    assert stats['average_progress'] == 75.0
+    assert stats['total_reviews'] == len(users)
+    assert sum(stats['rating_distribution'].values()) == len(users)
+
+def test_stats_follow_concurrent_unenrollments(memory_storage, fast_switching):
+    storage = memory_storage
+    course, tree = build_course(storage, lessons=2)
+    users = create_users(storage, THREADS * 4)
+    for user in users:
+        storage.enroll(user.id, course.id)
+        storage.complete_subsection(user.id, course.id, tree[0][0])
+
+    run_threads(lambda i: [storage.unenroll(user.id, course.id) for user in users[i::THREADS]])
+
+    assert storage.check_course_stats() == {}
+    stats = storage.get_course_stats(course.id)
+    assert stats.enrolled_count == 0
+    # Progress outlives the enrollment so a learner who comes back keeps their place
+    assert stats.progress_count == len(users)
+
+def test_deleting_a_user_takes_their_records_out_of_the_stats(memory_storage):
+    storage = memory_storage
+    course, tree = build_course(storage, lessons=1)
+    stays, leaves = create_users(storage, 2)
+    for user, rating in ((stays, 5), (leaves, 1)):
+        storage.enroll(user.id, course.id)
+        storage.complete_subsection(user.id, course.id, tree[0][0])
+        storage.create_review(Review(user.id, course.id, rating, 'Comment'))
+
+    storage.delete_user(leaves.id)
+
+    assert storage.check_course_stats() == {}
+    stats = storage.get_course_stats(course.id).to_dict()
+    assert stats['total_students'] == 1
+    assert stats['average_rating'] == 5
+    assert stats['rating_distribution'][1] == 0
+
+def test_diff_names_the_fields_that_drifted(memory_storage):
+    course, _ = build_course(memory_storage)
+    stats = CourseStats.from_records(course, [], [])
+    drifted = CourseStats.from_records(course, [], [])
+    drifted.add_review(4)
+    drifted.progress_sum += 0.5
+
+    assert stats.diff(CourseStats.from_records(course, [], [])) == []
+    assert stats.diff(drifted) == ['review_count', 'rating_sum', 'rating_histogram', 'progress_sum']
@@ -0,0 +1,131 @@
+import threading
+import time
+
+import pytest
+
+from data.sql_storage import SQLStorage
+from tests.helpers import build_course, create_users
+
+THREADS = 8
+
+def run_threads(target, count: int = THREADS, timeout: float = 60):
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def worker(i):
+        barrier.wait()
+        try:
+            target(i)
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + timeout
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+    assert not any(thread.is_alive() for thread in threads), 'threads deadlocked'
+    if errors:
+        raise errors[0]
+
+def test_no_quiz_attempts_lost_on_a_shared_record(memory_storage, fast_switching):
+    storage = memory_storage
+    course, _ = build_course(storage)
+    user, = create_users(storage, 1)
+    progress = storage.enroll(user.id, course.id)
+
+    run_threads(lambda i: [storage.record_quiz_attempt(progress.id, 'quiz', {'thread': i, 'n': n})
+                           for n in range(200)])
+
+    attempts = storage.get_progress(user.id, course.id).quiz_attempts['quiz']
+    assert len(attempts) == THREADS * 200
+    assert len({(a['thread'], a['n']) for a in attempts}) == THREADS * 200
+
+def test_concurrent_completions_reach_every_lesson(memory_storage, fast_switching):
+    storage = memory_storage
+    course, tree = build_course(storage, lessons=THREADS * 5, sections=2)
+    user, = create_users(storage, 1)
+    storage.enroll(user.id, course.id)
+    lessons = [lesson for section in tree for lesson in section]
+
+    run_threads(lambda i: [storage.complete_subsection(user.id, course.id, lesson)
+                           for lesson in lessons[i::THREADS]])
+
+    progress = storage.get_progress(user.id, course.id)
+    assert progress.completed_subsections == frozenset(lessons)
+    assert len(progress.completed_sections) == 2
+    assert progress.progress_percentage == 100.0
+    assert storage.check_course_stats() == {}
+
+def test_enroll_churn_keeps_indexes_and_stats_consistent(memory_storage, fast_switching):
+    storage = memory_storage
+    course, _ = build_course(storage)
+    users = create_users(storage, THREADS)
+
+    def churn(i):
+        for n in range(100):
+            if n % 2:
+                storage.unenroll(users[i].id, course.id)
+            else:
+                storage.enroll(users[(i + n) % THREADS].id, course.id)
+
+    run_threads(churn)
+
+    enrolled = set(storage.get_course(course.id).enrolled_students)
+    assert enrolled == {user.id for user in users if course.id in storage.get_user(user.id).enrolled_courses}
+    assert storage.get_course_stats(course.id).enrolled_count == len(enrolled)
+    assert storage.check_course_stats() == {}
+
+def test_modify_progress_cannot_move_a_record(memory_storage):
+    storage = memory_storage
+    course, _ = build_course(storage)
+    user, other = create_users(storage, 2)
+    storage.enroll(user.id, course.id)
+
+    with pytest.raises(ValueError):
+        storage.modify_progress(user.id, course.id, lambda progress: {'user_id': other.id})
+    assert storage.get_progress(user.id, course.id) is not None
+
+def test_moving_a_record_does_not_deadlock_with_modify_progress(memory_storage, fast_switching):
+    storage = memory_storage
+    course, _ = build_course(storage)
+    user, = create_users(storage, 1)
+    progress = storage.enroll(user.id, course.id)
+
+    def work(i):
+        for n in range(200):
+            if i % 2:
+                # Takes the index lock, then the record's stripe
+                storage.update_progress(progress.id, {'user_id': user.id, 'total_time_spent': n})
+            else:
+                # Holds the stripe; moving the record from here would need the index lock second.
+                # It may also find no record while the move above has it unindexed
+                try:
+                    storage.modify_progress(user.id, course.id, lambda p: {'user_id': user.id})
+                except ValueError:
+                    pass
+
+    run_threads(work, timeout=30)
+    assert storage.get_progress(user.id, course.id).id == progress.id
+
+def test_sqlite_loses_no_read_modify_writes(tmp_path):
+    storage = SQLStorage(f"sqlite:///{tmp_path / 'store.db'}")
+    course, tree = build_course(storage, lessons=4 * 10)
+    user, = create_users(storage, 1)
+    progress = storage.enroll(user.id, course.id)
+    lessons = tree[0]
+
+    def work(i):
+        for n in range(20):
+            storage.record_quiz_attempt(progress.id, 'quiz', {'thread': i, 'n': n})
+            if n % 2:
+                storage.complete_subsection(user.id, course.id, lessons[i * 10 + n // 2])
+
+    run_threads(work, count=4)
+
+    progress = storage.get_progress(user.id, course.id)
+    assert len(progress.quiz_attempts['quiz']) == 4 * 20
+    assert progress.completed_subsections == frozenset(lessons)
+    assert progress.progress_percentage == 100.0
+    storage.engine.dispose()
@@ -0,0 +1,137 @@
+import uuid
+
+import pytest
+
+from data import sync
+from data.sql_storage import SQLStorage
+from data.storage import InMemoryStorage
+from data.sync import sync_progress
+from tests.helpers import build_course, create_users
+
+@pytest.fixture(params=['memory', 'sql'])
+def storage(request, tmp_path):
+    if request.param == 'memory':
+        return InMemoryStorage()
+    return SQLStorage(f"sqlite:///{tmp_path / 'store.db'}")
+
+def enrolled(storage, lessons: int = 3, sections: int = 1):
+    course, tree = build_course(storage, lessons=lessons, sections=sections)
+    user, = create_users(storage, 1)
+    storage.enroll(user.id, course.id)
+    return user, course, tree
+
+def completion(course, subsection_id: str, event_id: str = None) -> dict:
+    return {'id': event_id or str(uuid.uuid4()), 'type': 'complete_subsection',
+            'course_id': course.id, 'subsection_id': subsection_id}
+
+def statuses(results) -> list:
+    return [result['status'] for result in results]
+
+def test_a_retried_batch_applies_nothing_twice(storage):
+    user, course, tree = enrolled(storage)
+    events = [completion(course, tree[0][0]),
+              {'id': str(uuid.uuid4()), 'type': 'time_spent', 'course_id': course.id, 'seconds': 90}]
+
+    first, _ = sync_progress(storage, user.id, events)
+    retry, merged = sync_progress(storage, user.id, events)
+
+    assert statuses(first) == ['applied', 'applied']
+    assert statuses(retry) == ['duplicate', 'duplicate']
+    progress = merged[course.id]
+    assert progress.completed_subsections == {tree[0][0]}
+    assert progress.total_time_spent == 1
+    assert progress.sync_seconds == 30
+
+def test_duplicate_ids_within_a_batch_apply_once(storage):
+    user, course, _ = enrolled(storage)
+    event = {'id': 'e1', 'type': 'time_spent', 'course_id': course.id, 'seconds': 120}
+
+    results, merged = sync_progress(storage, user.id, [event, event])
+
+    assert statuses(results) == ['applied', 'duplicate']
+    assert merged[course.id].total_time_spent == 2
+
+def test_seconds_short_of_a_minute_carry_over_between_batches(storage):
+    user, course, _ = enrolled(storage)
+    for _ in range(3):
+        sync_progress(storage, user.id, [{'id': str(uuid.uuid4()), 'type': 'time_spent',
+                                          'course_id': course.id, 'seconds': 20}])
+
+    progress = storage.get_progress(user.id, course.id)
+    assert progress.total_time_spent == 1
+    assert progress.sync_seconds == 0
+
+def test_completing_every_lesson_completes_the_section_and_course(storage):
+    user, course, tree = enrolled(storage, lessons=2)
+
+    results, merged = sync_progress(storage, user.id, [completion(course, lesson) for lesson in tree[0]])
+
+    assert statuses(results) == ['applied', 'applied']
+    progress = merged[course.id]
+    assert progress.progress_percentage == 100.0
+    assert len(progress.completed_sections) == 1
+    assert progress.completed_at is not None
+
+def test_events_for_unknown_courses_and_subsections_are_rejected(storage):
+    user, course, _ = enrolled(storage)
+    other, _ = build_course(storage)
+
+    results, merged = sync_progress(storage, user.id, [
+        completion(course, 'missing'),
+        completion(other, 'missing'),
+        {'id': 'e3', 'type': 'rewind', 'course_id': course.id}
+    ])
+
+    assert statuses(results) == ['rejected'] * 3
+    assert results[0]['error'] == 'Subsection not found in this course'
+    assert results[1]['error'] == 'Not enrolled in this course'
+    assert other.id not in merged
+
+def test_removed_subsections_are_rejected(memory_storage):
+    storage = memory_storage
+    user, course, tree = enrolled(storage, lessons=2)
+    kept, removed = tree[0]
+    section_id = storage.get_subsection(removed).section_id
+    storage.course_outline(course.id).remove_subsection(section_id, removed)
+
+    results, merged = sync_progress(storage, user.id, [
+        completion(course, removed),
+        {'id': str(uuid.uuid4()), 'type': 'position', 'course_id': course.id, 'subsection_id': removed},
+        completion(course, kept)
+    ])
+
+    assert statuses(results) == ['rejected', 'rejected', 'applied']
+    progress = merged[course.id]
+    assert progress.completed_subsections == {kept}
+    assert progress.current_subsection_id == kept
+
+def test_a_failed_batch_leaves_no_course_half_merged(memory_storage, monkeypatch):
+    storage = memory_storage
+    user, = create_users(storage, 1)
+    courses = []
+    for _ in range(2):
+        course, tree = build_course(storage, lessons=1)
+        storage.enroll(user.id, course.id)
+        courses.append((course, tree[0][0]))
+    events = [completion(course, lesson) for course, lesson in courses]
+
+    merge = sync._Merge.__call__
+    calls = []
+
+    def fail_second_course(self, progress):
+        calls.append(progress.course_id)
+        if len(calls) == 2:
+            raise RuntimeError('storage failure')
+        return merge(self, progress)
+
+    monkeypatch.setattr(sync._Merge, '__call__', fail_second_course)
+    with pytest.raises(RuntimeError):
+        sync_progress(storage, user.id, events)
+    monkeypatch.undo()
+
+    for course, _ in courses:
+        progress = storage.get_progress(user.id, course.id)
+        assert not progress.completed_subsections
+        assert not progress.sync_event_ids
+    results, _ = sync_progress(storage, user.id, events)
+    assert statuses(results) == ['applied', 'applied']
@@ -0,0 +1,85 @@
+"""
+Request-scoped authentication shared by every route module.
+
+The current user is resolved at most once per request and cached on flask.g.
+Bearer tokens are either opaque session tokens kept by storage, or stateless
+HMAC-signed tokens ("v1.<payload>.<signature>") that are verified without a
+session lookup. Signed tokens cannot be revoked before they expire, so they
+are only issued and accepted when AUTH_TOKENS is 'signed'.
+"""
+from typing import Optional
+import logging
+import time
+
+from flask import Flask, g, request, session
+
+from config import Config
+from data.storage import storage
+from utils.signing import load_signed, sign_payload
+
+logger = logging.getLogger(__name__)
+
+SIGNED_TOKEN_PREFIX = 'v1.'
+SIGNED_TOKEN_PURPOSE = 'auth'
+
+_UNRESOLVED = object()
+
+def issue_signed_token(user_id: str, ttl: Optional[float] = None) -> str:
+    """Create a stateless bearer token for a user"""
+    now = int(time.time())
+    payload = {'sub': user_id, 'iat': now, 'exp': now + int(ttl or Config.SIGNED_TOKEN_TTL)}
+    return sign_payload(payload, SIGNED_TOKEN_PREFIX, SIGNED_TOKEN_PURPOSE)
+
+def verify_signed_token(token: str) -> Optional[str]:
+    """Return the user id of a valid, unexpired signed token"""
+    payload = load_signed(token, SIGNED_TOKEN_PREFIX, SIGNED_TOKEN_PURPOSE)
+    return payload.get('sub') if payload else None
+
+def issue_token(user_id: str) -> str:
+    """Issue a bearer token of the configured kind"""
+    if Config.AUTH_TOKENS == 'signed':
+        return issue_signed_token(user_id)
+    from utils.helpers import generate_token
+    token = generate_token()
+    storage.create_session(token, user_id)
+    return token
+
+def bearer_token() -> Optional[str]:
+    header = request.headers.get('Authorization')
+    if header and header.startswith('Bearer '):
+        return header[7:]
+    return None
+
+def _user_for_token(token: str):
+    if Config.AUTH_TOKENS == 'signed' and token.startswith(SIGNED_TOKEN_PREFIX):
+        user_id = verify_signed_token(token)
+        return storage.get_user(user_id) if user_id else None
+    return storage.get_user_by_token(token)
+
+def _resolve_user():
+    # The session cookie carries the login token, so logout and expiry apply to it too
+    for token in (session.get('token'), bearer_token()):
+        if token:
+            user = _user_for_token(token)
+            if user:
+                return user
+    return None
+
+def get_current_user():
+    """Get current authenticated user, resolved once per request"""
+    user = g.get('current_user', _UNRESOLVED)
+    if user is _UNRESOLVED:
+        start = time.perf_counter()
+        user = _resolve_user()
+        g.auth_ms = (time.perf_counter() - start) * 1000
+        g.current_user = user
+    return user
+
+def init_auth(app: Flask):
+    """Report the auth step's duration in a Server-Timing header"""
+    @app.after_request
+    def add_auth_timing(response):
+        auth_ms = g.get('auth_ms')
+        if auth_ms is not None:
+            response.headers.add('Server-Timing', f'auth;dur={auth_ms:.3f}')
+        return response
@@ -0,0 +1,90 @@
+"""
+Conditional GET for catalog resources built entirely from storage version
+counters.
+
+The strong ETag is a hash of the versions a payload is built from, so a
+revalidation is answered from those numbers before anything is serialized.
+When output_json compresses a body it appends the content coding to the tag
+("<tag>-gzip"), because representations with different bytes need different
+strong validators. The suffix is ignored when matching.
+
+Last-Modified is the time this process first served the resource's current
+ETag. That is never earlier than the change itself. If-Modified-Since is
+compared with that exact time, so one-second HTTP dates cannot hide a change
+made in the same second.
+
+Catalog data is the same for every caller. Anonymous requests get a public
+Cache-Control so a reverse proxy can cache them. Requests that carry
+credentials get "private, no-cache", so browsers revalidate and shared caches
+do not store them.
+"""
+from typing import Dict, Optional, Tuple
+import hashlib
+import threading
+import time
+
+from flask import Response, request
+from werkzeug.http import http_date, quote_etag
+
+from config import Config
+
+CONTENT_CODINGS = ('gzip', 'br')
+
+_first_seen: Dict[str, Tuple[str, float]] = {}
+_first_seen_lock = threading.Lock()
+_FIRST_SEEN_MAX = 100_000
+
+def entity_tag(*versions) -> str:
+    """Strong validator (unquoted) for a payload fully determined by versions"""
+    return hashlib.blake2b(repr(versions).encode(), digest_size=12).hexdigest()
+
+def coded_tag(tag: str, encoding: str) -> str:
+    return f'{tag}-{encoding}'
+
+def _base_tag(tag: str) -> str:
+    for encoding in CONTENT_CODINGS:
+        if tag.endswith('-' + encoding):
+            return tag[:-len(encoding) - 1]
+    return tag
+
+def _modified_at(key: str, tag: str) -> float:
+    entry = _first_seen.get(key)
+    if entry is not None and entry[0] == tag:
+        return entry[1]
+    with _first_seen_lock:
+        entry = _first_seen.get(key)
+        if entry is None or entry[0] != tag:
+            if entry is None and len(_first_seen) >= _FIRST_SEEN_MAX:
+                del _first_seen[next(iter(_first_seen))]
+            entry = _first_seen[key] = (tag, time.time())
+    return entry[1]
+
+def cache_policy(max_age: int) -> str:
+    if request.headers.get('Authorization') or request.cookies:
+        return 'private, no-cache'
+    return f'public, max-age={max_age}'
+
+def conditional_get(key: str, tag: str, max_age: Optional[int] = None) -> Tuple[Optional[Response], Dict[str, str]]:
+    """Validator headers for the resource named key, and a 304 response if
+    the client's copy is current"""
+    modified_at = _modified_at(key, tag)
+    headers = {
+        'ETag': quote_etag(tag),
+        'Last-Modified': http_date(modified_at),
+        'Cache-Control': cache_policy(Config.CATALOG_CACHE_MAX_AGE if max_age is None else max_age)
+    }
+
+    # If-None-Match takes precedence; If-Modified-Since is only consulted without it
+    if 'If-None-Match' in request.headers:
+        if request.if_none_match.star_tag:
+            return Response(status=304, headers=headers), headers
+        for client_tag in request.if_none_match.as_set(include_weak=True):
+            if _base_tag(client_tag) == tag:
+                # Echo the validator the client holds, including any content-coding suffix
+                return Response(status=304, headers={**headers, 'ETag': quote_etag(client_tag)}), headers
+        return None, headers
+
+    since = request.if_modified_since
+    if since is not None and modified_at <= since.timestamp():
+        return Response(status=304, headers=headers), headers
+    return None, headers
@@ -0,0 +1,82 @@
+"""
+Password hashing on a bounded worker pool.
+
+The KDF is deliberately slow, so running it inline lets a burst of logins
+occupy every request thread. Here at most HASH_WORKERS hashes run at once,
+at most HASH_QUEUE_DEPTH more wait, and anything beyond that is rejected
+immediately with PasswordPoolBusy so the route can answer 503.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+import logging
+import threading
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class PasswordPoolBusy(Exception):
+    """Raised when the hashing queue is full"""
+
+    def __init__(self, retry_after: int):
+        super().__init__('Password hashing queue is full')
+        self.retry_after = retry_after
+
+def needs_rehash(password_hash: str, method: Optional[str] = None) -> bool:
+    """True if a hash was made with other cost parameters than configured"""
+    return password_hash.split('$', 1)[0] != (method or Config.PASSWORD_HASH_METHOD)
+
+class PasswordHashingPool:
+    def __init__(self, workers: int, queue_depth: int, timeout: float = 30.0, retry_after: int = 1):
+        self.workers = workers
+        self.timeout = timeout
+        self.retry_after = retry_after
+        # Running plus queued jobs; a non-blocking acquire is the backpressure check
+        self._slots = threading.BoundedSemaphore(workers + queue_depth) if workers else None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash') if workers else None
+        self.rejected = 0
+
+    def submit(self, fn: Callable, *args) -> Future:
+        if self._executor is None:
+            future = Future()
+            future.set_result(fn(*args))
+            return future
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PasswordPoolBusy(self.retry_after)
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash(self, password: str) -> str:
+        return self.submit(generate_password_hash, password, Config.PASSWORD_HASH_METHOD).result(self.timeout)
+
+    def verify(self, password: str, password_hash: str) -> bool:
+        return self.submit(check_password_hash, password_hash, password).result(self.timeout)
+
+    def rehash_later(self, password: str, on_done: Callable[[str], None]):
+        """Rehash in the background with the current parameters; skipped when busy"""
+        try:
+            future = self.submit(generate_password_hash, password, Config.PASSWORD_HASH_METHOD)
+        except PasswordPoolBusy:
+            return
+
+        def finish(done: Future):
+            try:
+                on_done(done.result())
+            except Exception as e:
+                logger.error(f"Password rehash error: {str(e)}")
+
+        future.add_done_callback(finish)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+password_pool = PasswordHashingPool(Config.HASH_WORKERS, Config.HASH_QUEUE_DEPTH)
@@ -1,8 +1,14 @@
 import secrets
 import hashlib
+import bisect
+import time
+import unicodedata
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable
 from werkzeug.security import generate_password_hash, check_password_hash
+from config import Config
+
+SEARCH_QUERY_MARKS = "'-\u2018\u2019\u02bc\u02be\u02bf`"
 
 def generate_token() -> str:
     """Generate a secure random token"""
@@ -10,7 +16,7 @@ def generate_token() -> str:
 
 def hash_password(password: str) -> str:
     """Hash a password using Werkzeug's secure method"""
-    return generate_password_hash(password)
+    return generate_password_hash(password, Config.PASSWORD_HASH_METHOD)
 
 def verify_password(password: str, password_hash: str) -> bool:
     """Verify a password against its hash"""
@@ -22,6 +28,19 @@ def calculate_progress_percentage(completed_subsections: list, total_subsections
         return 0.0
     return (len(completed_subsections) / total_subsections) * 100
 
+def completion_updates(completed_sections, completed_subsections, progress_percentage: float) -> Dict[str, Any]:
+    """Progress updates for new sets of completed sections and subsections"""
+    now = time.time()
+    updates = {
+        'completed_sections': completed_sections,
+        'completed_subsections': completed_subsections,
+        'last_accessed': now,
+        'progress_percentage': progress_percentage
+    }
+    if updates['progress_percentage'] >= 100:
+        updates['completed_at'] = now
+    return updates
+
 def format_duration(minutes: int) -> str:
     """Format duration in minutes to human readable format"""
     if minutes < 60:
@@ -37,8 +56,13 @@ def format_duration(minutes: int) -> str:
 
 def sanitize_search_query(query: str) -> str:
     """Sanitize search query to prevent injection attacks"""
-    # Remove special characters and limit length
-    sanitized = ''.join(char for char in query if char.isalnum() or char.isspace())
+    # Keep letters (including Arabic diacritics), digits and transliteration
+    # apostrophes; remove other special characters and limit length
+    sanitized = ''.join(
+        char for char in query
+        if char.isalnum() or char.isspace() or char in SEARCH_QUERY_MARKS
+        or unicodedata.category(char) == 'Mn'
+    )
     return sanitized[:100].strip()
 
 def paginate_results(items: list, page: int = 1, per_page: int = 10) -> Dict[str, Any]:
@@ -59,39 +83,44 @@ def paginate_results(items: list, page: int = 1, per_page: int = 10) -> Dict[str
         'has_next': end < total
     }
 
-def get_course_statistics(course, storage) -> Dict[str, Any]:
-    """Get comprehensive statistics for a course"""
-    # Get all progress records for this course
-    course_progress = [p for p in storage.progress.values() if p.course_id == course.id]
-    
-    # Get reviews for this course
-    course_reviews = storage.get_reviews_by_course(course.id)
-    
-    # Calculate statistics
-    total_students = len(course.enrolled_students)
-    completed_students = len([p for p in course_progress if p.completed_at])
-    avg_progress = sum(p.progress_percentage for p in course_progress) / len(course_progress) if course_progress else 0
+def paginate_after(items: list, after_key, per_page: int = 10, sort_key: Callable = None) -> Dict[str, Any]:
+    """Keyset-paginate a list sorted by sort_key, starting after after_key"""
+    total = len(items)
+    start = bisect.bisect_right(items, after_key, key=sort_key)
+    end = start + per_page
     
-    # Rating statistics
-    if course_reviews:
-        avg_rating = sum(r.rating for r in course_reviews) / len(course_reviews)
-        rating_distribution = {}
-        for i in range(1, 6):
-            rating_distribution[i] = len([r for r in course_reviews if r.rating == i])
-    else:
-        avg_rating = 0
-        rating_distribution = {i: 0 for i in range(1, 6)}
+    items_page = items[start:end]
     
     return {
-        'total_students': total_students,
-        'completed_students': completed_students,
-        'completion_rate': (completed_students / total_students * 100) if total_students > 0 else 0,
-        'average_progress': avg_progress,
-        'average_rating': avg_rating,
-        'total_reviews': len(course_reviews),
-        'rating_distribution': rating_distribution
+        'items': items_page,
+        'total': total,
+        'page': start // per_page + 1,
+        'per_page': per_page,
+        'pages': (total + per_page - 1) // per_page,
+        'has_prev': start > 0,
+        'has_next': end < total
+    }
+
+def page_of(items: list, total: int, start: int, per_page: int = 10) -> Dict[str, Any]:
+    """Pagination result for a page already cut out of total items, the first at offset start"""
+    return {
+        'items': items,
+        'total': total,
+        'page': start // per_page + 1,
+        'per_page': per_page,
+        'pages': (total + per_page - 1) // per_page,
+        'has_prev': start > 0,
+        'has_next': start + len(items) < total
     }
 
+def creation_order_key(item) -> tuple:
+    """Stable sort key for entities: creation time, ties broken by id"""
+    return (item.created_at, item.id)
+
+def get_course_statistics(course, storage) -> Dict[str, Any]:
+    """Get comprehensive statistics for a course from its precomputed aggregate"""
+    return storage.get_course_stats(course.id).to_dict()
+
 def is_token_expired(created_at: datetime, expiry_hours: int = 24) -> bool:
     """Check if a token is expired"""
     return datetime.utcnow() > created_at + timedelta(hours=expiry_hours)
@@ -0,0 +1,171 @@
+"""
+Process-wide logging: records are queued by the thread that logs them and
+written to stderr by a listener thread, one JSON object per line.
+
+Request threads only build the record and put it on a bounded queue. Message
+formatting, JSON encoding and the write all happen on the listener, so a
+slow stderr cannot stall a request. When the queue is full, records are
+dropped and counted rather than blocking, and the listener reports how many
+it lost. Log calls should pass their arguments lazily
+(logger.info("... %s", value)) so that disabled levels cost only the level
+check.
+
+High-volume loggers can be sampled with LOG_SAMPLING
+("routes.progress=0.01,werkzeug=0.1"). A sampled logger keeps every Nth
+record of each message template at INFO and below. Kept records carry
+"sample_rate" so counts can be scaled back. Warnings and errors are never
+sampled.
+"""
+from typing import Dict, Optional
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+
+from config import Config
+
+_SCALARS = (str, int, float, bool, type(None))
+
+def parse_sampling(spec: str) -> Dict[str, float]:
+    """"name=rate,name=rate" -> {name: rate}, ignoring malformed entries"""
+    rates = {}
+    for entry in (spec or '').split(','):
+        name, _, rate = entry.strip().partition('=')
+        try:
+            rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+class SamplingFilter(logging.Filter):
+    """Keep one in every 1/rate records per (logger, message template)"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._counters: Dict[tuple, itertools.count] = {}
+
+    def _rate(self, name: str) -> Optional[float]:
+        # The most specific configured ancestor wins: "routes" covers "routes.progress"
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        rate = self._rate(record.name)
+        if rate is None or rate >= 1:
+            return True
+        if rate <= 0:
+            return False
+        key = (record.name, record.msg if isinstance(record.msg, str) else type(record.msg))
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters.setdefault(key, itertools.count())
+        if next(counter) % round(1 / rate):  # next() on itertools.count is atomic
+            return False
+        record.sample_rate = rate
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName
+        }
+        sample_rate = getattr(record, 'sample_rate', None)
+        if sample_rate is not None:
+            entry['sample_rate'] = sample_rate
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener without formatting them, and drops them when it falls behind"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Tracebacks are rendered now, while the frames are still those of the failure
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        # Mutable arguments could change before the listener formats them
+        if record.args and not all(isinstance(arg, _SCALARS) for arg in record.args):
+            record.msg, record.args = record.getMessage(), None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class _Listener(logging.handlers.QueueListener):
+    def __init__(self, log_queue: queue.Queue, source: AsyncQueueHandler, *handlers: logging.Handler):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.source = source
+
+    def handle(self, record: logging.LogRecord):
+        dropped, self.source.dropped = self.source.dropped, 0
+        if dropped:
+            super().handle(logging.makeLogRecord({
+                'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': 'Log queue full: dropped %d records', 'args': (dropped,)
+            }))
+        super().handle(record)
+
+_listener: Optional[_Listener] = None
+
+def _start_listener(handler: AsyncQueueHandler, output: logging.Handler):
+    global _listener
+    handler.queue = queue.Queue(Config.LOG_QUEUE_SIZE)
+    _listener = _Listener(handler.queue, handler, output)
+    _listener.start()
+
+def stop_logging():
+    """Write out everything queued and stop the listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def configure_logging():
+    """Install the root handler: queued by default, written inline with LOG_ASYNC off"""
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if Config.LOG_FORMAT == 'json' else
+                        logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    if Config.LOG_ASYNC:
+        handler = AsyncQueueHandler(queue.Queue(Config.LOG_QUEUE_SIZE))
+        _start_listener(handler, output)
+        atexit.register(stop_logging)
+        # Threads do not survive fork: a worker forked from a preloaded app gets a fresh queue and listener
+        os.register_at_fork(after_in_child=lambda: _start_listener(handler, output))
+    else:
+        handler = output
+    rates = parse_sampling(Config.LOG_SAMPLING)
+    if rates:
+        handler.addFilter(SamplingFilter(rates))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(Config.LOG_LEVEL.upper())
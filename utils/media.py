@@ -0,0 +1,116 @@
+"""
+Signed stream tokens and byte-range serving for locally stored media.
+
+A stream token is a stateless HMAC-signed grant for one media file. It names
+the subsection, the access type and the byte window the viewer may read,
+and it expires after STREAM_TOKEN_TTL. Previews get a window covering only
+their available duration. The streaming endpoint checks the token and reads
+the file without touching storage.
+"""
+from typing import Iterator, Optional
+import math
+import mmap
+import os
+import time
+
+from flask import Response, request
+from werkzeug.wsgi import ClosingIterator
+
+from config import Config
+from utils.signing import load_signed, sign_payload
+
+STREAM_TOKEN_PREFIX = 'm1.'
+STREAM_TOKEN_PURPOSE = 'media-stream'
+
+def local_media_path(url: str) -> Optional[str]:
+    """Path relative to MEDIA_ROOT for a local media URL, or None if remote or outside it"""
+    if not Config.MEDIA_ROOT or not url or not url.startswith(Config.MEDIA_URL_PREFIX):
+        return None
+    relative = url[len(Config.MEDIA_URL_PREFIX):]
+    if not _resolve(relative):
+        return None
+    return relative
+
+def _resolve(relative: str) -> Optional[str]:
+    root = os.path.realpath(Config.MEDIA_ROOT)
+    path = os.path.realpath(os.path.join(root, relative))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        return None
+    return path
+
+def preview_byte_limit(size: int, duration_seconds: int, available_seconds: int) -> Optional[int]:
+    """Bytes covering the first available_seconds, assuming a constant bitrate"""
+    if not duration_seconds or available_seconds >= duration_seconds:
+        return None  # unknown length or the whole video is available
+    return min(size, math.ceil(size * available_seconds / duration_seconds))
+
+def issue_stream_token(subsection_id: str, access_type: str, relative_path: str, available_seconds: int,
+                       duration_seconds: Optional[int] = None, ttl: Optional[float] = None) -> str:
+    """Grant access to one media file; given the file's duration, only its first available_seconds"""
+    limit = None
+    if duration_seconds:
+        limit = preview_byte_limit(os.path.getsize(_resolve(relative_path)), duration_seconds, available_seconds)
+    now = int(time.time())
+    payload = {
+        'sub': subsection_id,
+        'acc': access_type,
+        'src': relative_path,
+        'end': limit,
+        'dur': available_seconds,
+        'exp': now + int(ttl or Config.STREAM_TOKEN_TTL)
+    }
+    return sign_payload(payload, STREAM_TOKEN_PREFIX, STREAM_TOKEN_PURPOSE)
+
+def verify_stream_token(token: str) -> Optional[dict]:
+    return load_signed(token, STREAM_TOKEN_PREFIX, STREAM_TOKEN_PURPOSE)
+
+def stream_url(token: str) -> str:
+    return f'/api/media/{token}'
+
+def _mmap_chunks(file, size: int, start: int, stop: int) -> Iterator[bytes]:
+    """Yield the range straight from the page cache, without read() buffering"""
+    with mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ) as mapped:
+        for offset in range(start, stop, Config.MEDIA_CHUNK_SIZE):
+            yield mapped[offset:min(offset + Config.MEDIA_CHUNK_SIZE, stop)]
+
+def range_response(grant: dict, mimetype: str) -> Response:
+    """Serve the granted file, honouring a single Range header within the granted window"""
+    path = _resolve(grant['src'])
+    if path is None:
+        return Response(status=404)
+    file = open(path, 'rb')
+    try:
+        size = os.fstat(file.fileno()).st_size
+        length = size if grant.get('end') is None else min(size, grant['end'])
+
+        status, start, stop = 200, 0, length
+        byte_range = request.range
+        if byte_range is not None:
+            bounds = byte_range.range_for_length(length)
+            if bounds is None:
+                file.close()
+                return Response(status=416, headers={'Content-Range': f'bytes */{length}'})
+            status, (start, stop) = 206, bounds
+
+        if stop > start and 'wsgi.file_wrapper' in request.environ:
+            # Servers send at most Content-Length bytes from the current offset,
+            # with sendfile() where they can (gunicorn does)
+            file.seek(start)
+            body = request.environ['wsgi.file_wrapper'](file, Config.MEDIA_CHUNK_SIZE)
+        elif stop > start:
+            # Closed by the server even if never iterated, e.g. for HEAD
+            body = ClosingIterator(_mmap_chunks(file, size, start, stop), file.close)
+        else:
+            file.close()
+            body = []
+    except Exception:
+        file.close()
+        raise
+
+    response = Response(body, status=status, mimetype=mimetype, direct_passthrough=True)
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['Content-Length'] = str(stop - start)
+    if status == 206:
+        response.headers['Content-Range'] = f'bytes {start}-{stop - 1}/{length}'
+    response.headers['Cache-Control'] = f"private, max-age={max(0, int(grant['exp'] - time.time()))}"
+    return response
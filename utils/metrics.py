@@ -0,0 +1,296 @@
+"""
+In-process metrics exported on /metrics in the Prometheus text format.
+
+Recorded when METRICS_ENABLED is set:
+- requests per route template, method and status, with a latency histogram
+- calls, errors and a latency histogram per storage interface method
+- time spent waiting for the in-memory store's index lock
+
+Histograms use HDR-style log-linear buckets over integer nanoseconds: each
+power of two is split into a fixed number of linear sub-buckets, so a
+value's bucket comes from int.bit_length() and a shift, and the relative
+error stays bounded across the whole range. Observations go through a deque
+and are folded into the counts under a per-series lock, so threaded workers
+never lose updates. Each worker process keeps and exports its own values.
+
+When metrics are disabled (the default) nothing is installed: no request
+hooks, no storage wrappers and no /metrics route. When enabled, /metrics
+answers a bearer METRICS_TOKEN for scrapers or a signed-in admin.
+"""
+from typing import Callable, Dict, List, Tuple
+import functools
+import hmac
+import math
+import threading
+import time
+from collections import deque
+
+from flask import Flask, Response, g, jsonify, request
+
+from config import Config
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _CounterSeries:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+class _HistogramSeries:
+    """Observations are appended to a deque (atomic, no lock on the hot path)
+    and folded into the bucket counts in batches, or when scraped"""
+    __slots__ = ('buckets', 'counts', 'sum', '_pending', '_lock')
+
+    FOLD_EVERY = 1024
+
+    def __init__(self, buckets: 'LogLinearBuckets'):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets.bounds) + 1)  # the last slot is +Inf
+        self.sum = 0
+        self._pending = deque()
+        self._lock = threading.Lock()
+
+    def observe(self, nanoseconds: int):
+        self._pending.append(nanoseconds)
+        if len(self._pending) >= self.FOLD_EVERY:
+            self.fold()
+
+    def fold(self):
+        with self._lock:
+            pending, index, counts = self._pending, self.buckets.index, self.counts
+            total = 0
+            for _ in range(len(pending)):
+                value = pending.popleft()
+                counts[index(value)] += 1
+                total += value
+            self.sum += total
+
+class LogLinearBuckets:
+    """Upper bounds in nanoseconds from 2**min_exp to 2**max_exp, with
+    2**sub_bits of them per power of two"""
+
+    def __init__(self, min_exp: int, max_exp: int, sub_bits: int = 1):
+        self.min_exp = min_exp
+        self.sub_bits = sub_bits
+        steps = 1 << sub_bits
+        self.bounds: List[int] = [1 << min_exp]
+        for exp in range(min_exp, max_exp):
+            self.bounds += [(1 << exp) + (sub + 1) * (1 << (exp - sub_bits)) for sub in range(steps)]
+
+    def index(self, value: int) -> int:
+        # Bounds are inclusive ("le"), so bucket value - 1 against half-open ranges
+        value -= 1
+        exp = value.bit_length()
+        if exp <= self.min_exp:
+            return 0
+        index = ((exp - self.min_exp - 1) << self.sub_bits) + 1 + \
+            ((value >> (exp - 1 - self.sub_bits)) & ((1 << self.sub_bits) - 1))
+        return min(index, len(self.bounds))
+
+class _Family:
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.get(values)
+                if series is None:
+                    series = self._series[values] = self._new_series()
+        return series
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def snapshot(self) -> List[Tuple[Tuple[str, ...], object]]:
+        with self._lock:
+            return sorted(self._series.items())
+
+class Counter(_Family):
+    kind = 'counter'
+
+    def _new_series(self):
+        return _CounterSeries()
+
+    def render(self) -> List[str]:
+        return [f'{self.name}{_labels(self.label_names, values)} {_number(series.value)}'
+                for values, series in self.snapshot()]
+
+class Histogram(_Family):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets: LogLinearBuckets):
+        super().__init__(name, help_text, label_names)
+        self.buckets = buckets
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def render(self) -> List[str]:
+        lines = []
+        bounds = [bound / 1e9 for bound in self.buckets.bounds] + [math.inf]
+        for values, series in self.snapshot():
+            series.fold()
+            with series._lock:
+                counts, total = list(series.counts), series.sum / 1e9
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f'{self.name}_bucket{_labels(self.label_names, values, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.label_names, values)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.label_names, values)} {cumulative}')
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self.families: List[_Family] = []
+
+    def counter(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        family = Counter(name, help_text, label_names)
+        self.families.append(family)
+        return family
+
+    def histogram(self, name: str, help_text: str, label_names: Tuple[str, ...],
+                  buckets: LogLinearBuckets) -> Histogram:
+        family = Histogram(name, help_text, label_names, buckets)
+        self.families.append(family)
+        return family
+
+    def render(self) -> str:
+        lines = []
+        for family in self.families:
+            lines.append(f'# HELP {family.name} {family.help}')
+            lines.append(f'# TYPE {family.name} {family.kind}')
+            lines.extend(family.render())
+        return '\n'.join(lines) + '\n'
+
+# Requests take from ~65us to a minute; storage calls and lock waits from ~1us to a second
+REQUEST_BUCKETS = LogLinearBuckets(16, 36)
+STORAGE_BUCKETS = LogLinearBuckets(10, 30)
+
+registry = MetricsRegistry()
+request_count = registry.counter(
+    'http_requests_total', 'Requests handled, by route template, method and status', ('route', 'method', 'status'))
+request_seconds = registry.histogram(
+    'http_request_duration_seconds', 'Time to produce a response', ('route', 'method'), REQUEST_BUCKETS)
+storage_seconds = registry.histogram(
+    'storage_call_duration_seconds', 'Storage method call time, including nested storage calls',
+    ('method',), STORAGE_BUCKETS)
+storage_errors = registry.counter(
+    'storage_call_errors_total', 'Storage method calls that raised', ('method',))
+lock_wait_seconds = registry.histogram(
+    'storage_lock_wait_seconds', 'Time spent waiting to acquire the in-memory storage index lock',
+    ('lock',), STORAGE_BUCKETS)
+
+class TimedLock:
+    """Wraps a lock (or RLock) and records how long each acquire waited"""
+
+    def __init__(self, lock, series: _HistogramSeries):
+        self._inner = lock
+        self._series = series
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        start = time.perf_counter_ns()
+        acquired = self._inner.acquire(blocking, timeout)
+        self._series.observe(time.perf_counter_ns() - start)
+        return acquired
+
+    def release(self):
+        self._inner.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self._inner.release()
+
+def _timed(name: str, method: Callable) -> Callable:
+    series = storage_seconds.labels(name)
+    errors = storage_errors.labels(name)
+
+    @functools.wraps(method)
+    def call(*args, **kwargs):
+        start = time.perf_counter_ns()
+        try:
+            return method(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            series.observe(time.perf_counter_ns() - start)
+    return call
+
+def instrument_storage(store, method_names: List[str]):
+    """Time the storage interface methods on this instance, and its index lock if it has one"""
+    for name in method_names:
+        method = getattr(store, name, None)
+        if method is not None and not hasattr(method, '__wrapped__'):
+            setattr(store, name, _timed(name, method))
+    lock = getattr(store, '_lock', None)
+    if lock is not None and not isinstance(lock, TimedLock):
+        store._lock = TimedLock(lock, lock_wait_seconds.labels('index'))
+
+def init_metrics(app: Flask, store):
+    """Record request and storage metrics and serve them on /metrics"""
+    if not Config.METRICS_ENABLED:
+        return
+    from data.base import Storage
+    from utils.auth import bearer_token, get_current_user
+    # transaction() returns a context manager, so timing the call would measure nothing
+    method_names = [name for name, value in vars(Storage).items()
+                    if callable(value) and not name.startswith('_') and name != 'transaction']
+    instrument_storage(store, method_names)
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter_ns()
+
+    @app.after_request
+    def record_request(response):
+        start = g.get('request_start')
+        if start is not None:
+            rule = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            request_seconds.labels(rule, request.method).observe(time.perf_counter_ns() - start)
+            request_count.labels(rule, request.method, str(response.status_code)).inc()
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        token = bearer_token()
+        if not (Config.METRICS_TOKEN and token
+                and hmac.compare_digest(token.encode(), Config.METRICS_TOKEN.encode())):
+            user = get_current_user()
+            if not user:
+                return jsonify({'error': 'Authentication required'}), 401
+            if user.role != 'admin':
+                return jsonify({'error': 'Insufficient permissions'}), 403
+        return Response(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,184 @@
+"""
+Opt-in sampling profiles of slow requests.
+
+A request is profiled when it carries a valid X-Profile-Token header (a
+signed, expiring token issued to admins) or is picked at PROFILE_SAMPLE_RATE.
+While it runs, a background thread samples its stack every
+PROFILE_INTERVAL_MS. If it took at least PROFILE_THRESHOLD_MS, the samples are
+kept as collapsed stacks ("outer;inner;leaf count", the input format of
+flamegraph.pl and speedscope), and the newest PROFILE_KEEP profiles can be
+fetched from the admin endpoints.
+
+The sampler needs the GIL to read another thread's stack, so while any
+request is being profiled the interpreter's switch interval is lowered to
+the sampling interval; otherwise a CPU-bound request would be sampled only
+once per 5ms. Requests that are not profiled pay one header lookup.
+"""
+from collections import Counter, deque
+from typing import Dict, List, Optional
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+from flask import Flask, g, request
+
+from config import Config
+from utils.signing import load_signed, sign_payload
+
+PROFILE_HEADER = 'X-Profile-Token'
+PROFILE_TOKEN_PREFIX = 'p1.'
+PROFILE_TOKEN_PURPOSE = 'request-profile'
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def issue_profile_token(user_id: str, ttl: Optional[float] = None) -> str:
+    """Allow the holder to have their requests profiled until the token expires"""
+    now = int(time.time())
+    payload = {'sub': user_id, 'exp': now + int(ttl or Config.PROFILE_TOKEN_TTL)}
+    return sign_payload(payload, PROFILE_TOKEN_PREFIX, PROFILE_TOKEN_PURPOSE)
+
+def verify_profile_token(token: str) -> Optional[dict]:
+    return load_signed(token, PROFILE_TOKEN_PREFIX, PROFILE_TOKEN_PURPOSE)
+
+_labels: Dict[object, str] = {}
+
+def _frame_label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        path = code.co_filename
+        if path.startswith(ROOT + os.sep):
+            path = path[len(ROOT) + 1:]
+        else:
+            path = os.path.join(*path.split(os.sep)[-2:])
+        label = _labels[code] = f'{code.co_name} ({path}:{code.co_firstlineno})'
+    return label
+
+def collapse(frame) -> str:
+    """The frame's stack, outermost call first, as one collapsed-stack line"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return ';'.join(labels)
+
+class StackSampler:
+    """One daemon thread that samples the stacks of the threads registered with it"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._targets: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._thread = None
+        self._switch_interval = None
+
+    def start(self, thread_id: int) -> Counter:
+        stacks = Counter()
+        with self._lock:
+            if not self._targets:
+                self._switch_interval = sys.getswitchinterval()
+                sys.setswitchinterval(min(self._switch_interval, self.interval))
+            self._targets[thread_id] = stacks
+            self._active.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+                self._thread.start()
+        return stacks
+
+    def stop(self, thread_id: int):
+        # Samples are written under the lock, so none arrive after this returns
+        with self._lock:
+            if self._targets.pop(thread_id, None) is not None and not self._targets:
+                self._active.clear()
+                sys.setswitchinterval(self._switch_interval)
+
+    def _run(self):
+        while True:
+            self._active.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._targets:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self._targets.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[collapse(frame)] += 1
+
+class ProfileStore:
+    """The newest profiles, oldest dropped first"""
+
+    def __init__(self, keep: int):
+        self._profiles = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def add(self, profile: dict):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            profiles = list(self._profiles)
+        return [{key: value for key, value in profile.items() if key != 'stacks'}
+                for profile in reversed(profiles)]
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        with self._lock:
+            return next((profile for profile in self._profiles if profile['id'] == profile_id), None)
+
+sampler = StackSampler(Config.PROFILE_INTERVAL_MS / 1000)
+profiles = ProfileStore(Config.PROFILE_KEEP)
+
+def collapsed_stacks(profile: dict) -> str:
+    return ''.join(f'{stack} {count}\n' for stack, count in profile['stacks'].most_common())
+
+def _wanted() -> Optional[str]:
+    """Why this request should be profiled, if it should"""
+    token = request.headers.get(PROFILE_HEADER)
+    if token is not None and verify_profile_token(token):
+        return 'token'
+    if Config.PROFILE_SAMPLE_RATE and random.random() < Config.PROFILE_SAMPLE_RATE:
+        return 'sampled'
+    return None
+
+def init_profiling(app: Flask):
+    """Sample the stacks of opted-in requests and keep the slow ones"""
+
+    @app.before_request
+    def start_profile():
+        trigger = _wanted()
+        if trigger:
+            g.profile = (trigger, time.time(), time.perf_counter(), sampler.start(threading.get_ident()))
+
+    @app.after_request
+    def finish_profile(response):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+        sampler.stop(threading.get_ident())
+        trigger, started_at, start, stacks = profile
+        duration_ms = (time.perf_counter() - start) * 1000
+        if duration_ms >= Config.PROFILE_THRESHOLD_MS:
+            profiles.add({
+                'id': str(uuid.uuid4()),
+                'method': request.method,
+                'path': request.path,
+                'route': request.url_rule.rule if request.url_rule is not None else None,
+                'status': response.status_code,
+                'duration_ms': round(duration_ms, 2),
+                'started_at': started_at,
+                'trigger': trigger,
+                'samples': sum(stacks.values()),
+                'stacks': stacks
+            })
+        return response
+
+    @app.teardown_request
+    def discard_profile(exc):
+        # after_request is skipped when the response could not be built
+        if g.pop('profile', None) is not None:
+            sampler.stop(threading.get_ident())
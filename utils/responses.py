@@ -0,0 +1,147 @@
+"""
+JSON response representation for the API: a fast encoder when one is
+installed, splicing of pre-encoded JSON fragments from caches, and gzip/brotli
+compression negotiated from Accept-Encoding.
+"""
+from typing import Any, Callable, Dict, List, Optional
+import gzip
+import json
+import os
+import re
+
+from flask import make_response, request
+from werkzeug.http import quote_etag, unquote_etag
+
+from config import Config
+from utils.conditional import coded_tag
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional compression
+    brotli = None
+
+class RawJSON:
+    """Already-encoded JSON that the encoder inserts verbatim"""
+    __slots__ = ('data',)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+def merge_json(raw: bytes, extra: Dict[str, Any]) -> RawJSON:
+    """Add keys to an encoded JSON object without decoding it; raw must not
+    already contain any of them, since the object would then repeat a key"""
+    if not extra:
+        return RawJSON(raw)
+    encoded_extra = encode_json(extra)
+    if raw == b'{}':
+        return RawJSON(encoded_extra)
+    return RawJSON(raw[:-1] + b',' + encoded_extra[1:])
+
+def _stdlib_dumps(data, default: Callable) -> bytes:
+    return json.dumps(data, default=default, separators=(',', ':')).encode()
+
+def _orjson_dumps(data, default: Callable) -> bytes:
+    return orjson.dumps(data, default=default, option=orjson.OPT_NON_STR_KEYS)
+
+ENCODERS = {'json': _stdlib_dumps}
+if orjson is not None:
+    ENCODERS['orjson'] = _orjson_dumps
+
+# Random per process, so user content cannot collide with a placeholder
+_PLACEHOLDER_PREFIX = f'\x00rawjson-{os.urandom(8).hex()}-'
+
+def _placeholder_pattern(dumps) -> 're.Pattern[bytes]':
+    """Match an encoded placeholder string, capturing its fragment number"""
+    return re.compile(re.escape(dumps(_PLACEHOLDER_PREFIX, None)[:-1]) + rb'(\d+)'
+                      + re.escape(dumps('\x00', None)[1:]))
+
+_dumps = ENCODERS['json']
+_placeholder = _placeholder_pattern(_dumps)
+
+def use_encoder(name: str = 'auto'):
+    """Select the JSON encoder; 'auto' picks the fastest installed one"""
+    global _dumps, _placeholder
+    if name == 'auto':
+        name = 'orjson' if 'orjson' in ENCODERS else 'json'
+    if name not in ENCODERS:
+        raise ValueError(f"JSON encoder {name!r} is not available")
+    _dumps = ENCODERS[name]
+    _placeholder = _placeholder_pattern(_dumps)
+
+def encode_json(data: Any) -> bytes:
+    """Encode data compactly, splicing in any RawJSON fragments"""
+    fragments: List[bytes] = []
+
+    def default(value):
+        if isinstance(value, RawJSON):
+            fragments.append(value.data)
+            return f'{_PLACEHOLDER_PREFIX}{len(fragments) - 1}\x00'
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+    if isinstance(data, RawJSON):
+        return data.data
+    encoded = _dumps(data, default)
+    if not fragments:
+        return encoded
+    # One pass over the small skeleton instead of rescanning the spliced output
+    parts = _placeholder.split(encoded)
+    for i in range(1, len(parts), 2):
+        parts[i] = fragments[int(parts[i])]
+    return b''.join(parts)
+
+def _accepted_encodings() -> Dict[str, float]:
+    accepted = {}
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        name, _, params = part.strip().partition(';')
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+def choose_content_encoding() -> Optional[str]:
+    """Best compression the client accepts, or None for identity"""
+    accepted = _accepted_encodings()
+    candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_quality = None, 0.0
+    for name in candidates:
+        quality = accepted.get(name, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=Config.BROTLI_LEVEL)
+    return gzip.compress(body, compresslevel=Config.GZIP_LEVEL)
+
+def output_json(data, code, headers=None):
+    """Flask-RESTful representation for application/json"""
+    body = encode_json(data)
+    resp = make_response(body, code)
+    resp.headers.extend(headers or {})
+    resp.headers['Content-Type'] = 'application/json'
+    resp.headers.add('Vary', 'Accept-Encoding')
+
+    if len(body) >= Config.COMPRESSION_MIN_BYTES:
+        encoding = choose_content_encoding()
+        if encoding:
+            resp.set_data(compress(body, encoding))
+            resp.headers['Content-Encoding'] = encoding
+            tag, weak = unquote_etag(resp.headers.get('ETag'))
+            if tag and not weak:
+                resp.headers['ETag'] = quote_etag(coded_tag(tag, encoding))
+    return resp
+
+use_encoder(Config.JSON_ENCODER)
@@ -0,0 +1,48 @@
+"""
+HMAC-signed, expiring tokens of the form "<prefix><payload>.<signature>",
+where the payload is base64url JSON. Each kind of token signs with its own
+key derived from TOKEN_SIGNING_KEY (or SECRET_KEY), so a token issued for
+one purpose never verifies as another.
+"""
+from typing import Any, Dict, Optional
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+from config import Config
+
+def b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+def b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+def _key(purpose: str) -> bytes:
+    key = (Config.TOKEN_SIGNING_KEY or Config.SECRET_KEY).encode()
+    if purpose:
+        key = hmac.new(key, purpose.encode(), hashlib.sha256).digest()
+    return key
+
+def signature(body: str, purpose: str = '') -> str:
+    return b64encode(hmac.new(_key(purpose), body.encode(), hashlib.sha256).digest())
+
+def sign_payload(payload: Dict[str, Any], prefix: str, purpose: str = '') -> str:
+    body = b64encode(json.dumps(payload, separators=(',', ':')).encode())
+    return f'{prefix}{body}.{signature(body, purpose)}'
+
+def load_signed(token: str, prefix: str, purpose: str = '') -> Optional[Dict[str, Any]]:
+    """Return the payload of a valid, unexpired token"""
+    if not token.startswith(prefix):
+        return None
+    body, _, token_signature = token[len(prefix):].partition('.')
+    if not hmac.compare_digest(token_signature.encode(), signature(body, purpose).encode()):
+        return None
+    try:
+        payload = json.loads(b64decode(body))
+    except ValueError:
+        return None
+    if not isinstance(payload, dict) or payload.get('exp', 0) <= time.time():
+        return None
+    return payload